@@ -0,0 +1,449 @@
+import csv
+import difflib
+import json
+import os
+import re
+
+from core import dir_squadre, nomi_squadre
+from file_cache import load_json
+from season_stats import normalizza_nome
+from storage import lock_squadra, scrittura_atomica, scrivi_json
+
+# Registro unico dei giocatori: un id intero stabile per persona, per tutte le squadre
+ANAGRAFICA_PATH = os.path.join(dir_squadre, "anagrafica.json")
+ANAGRAFICA_VERSION = 1
+
+# Somiglianza minima (difflib) per riconoscere un nome scritto male durante la migrazione
+SOGLIA_FUZZY = 0.88
+
+# Lock del registro (vedi storage.lock_squadra). Ordine: prima la squadra, poi il registro
+LOCK_ANAGRAFICA = "anagrafica"
+# Indice alias -> id, ricostruito solo quando il registro cambia su disco
+_indice = (None, {})
+
+
+def _registro_vuoto():
+    return {"versione": ANAGRAFICA_VERSION, "prossimo_id": 1, "giocatori": {}}
+
+
+def carica():
+    """
+    Player registry
+
+    Returns:
+        dict: {"prossimo_id": int, "giocatori": {"<id>": {"nome", "anno",
+            "squadre", "alias"}}}; shared and cached, do not modify
+    """
+    try:
+        return load_json(ANAGRAFICA_PATH)
+    except FileNotFoundError:
+        return _registro_vuoto()
+
+
+def _carica_modificabile():
+    try:
+        with open(ANAGRAFICA_PATH, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return _registro_vuoto()
+
+
+def indice_alias():
+    """
+    Normalized name (see season_stats.normalizza_nome) -> player id
+
+    Every known spelling of a player is an alias, so "FERRAUTI Matteo "
+    and "Matteo FERRAUTI" resolve to the same id.
+    """
+    global _indice
+    registro = carica()
+    if _indice[0] is not registro:
+        indice = {}
+        for id_str, giocatore in registro["giocatori"].items():
+            for alias in [giocatore["nome"]] + giocatore.get("alias", []):
+                indice.setdefault(normalizza_nome(alias), int(id_str))
+        _indice = (registro, indice)
+    return _indice[1]
+
+
+def nome_giocatore(id_giocatore):
+    """Current display name of a player id, None if unknown"""
+    giocatore = carica()["giocatori"].get(str(id_giocatore))
+    return giocatore["nome"] if giocatore else None
+
+
+def ids(nomi):
+    """
+    Ids of a list of names, exact match on the normalized name
+
+    Returns:
+        list: One int per name, None for empty or unknown names (JSON-friendly)
+    """
+    indice = indice_alias()
+    return [indice.get(normalizza_nome(nome)) if nome else None for nome in nomi]
+
+
+def array_ids(nomi):
+    """Like ids, as an int64 NumPy array with 0 for empty or unknown names"""
+    import numpy as np
+
+    return np.array([i or 0 for i in ids(nomi)], dtype=np.int64)
+
+
+def identita(nome):
+    """Join key of a player: the registry id if known, else the normalized name"""
+    id_giocatore = indice_alias().get(normalizza_nome(nome))
+    return id_giocatore if id_giocatore is not None else normalizza_nome(nome)
+
+
+def chiave_giocatore(nome, id_giocatore=None):
+    """
+    Key of a player in the aggregates and indexes built from the stored files
+
+    Args:
+        nome (str): Name as written in the document
+        id_giocatore (int): Id stored next to the name, if the document has one
+
+    Returns:
+        str: The id as a string; without a stored id the registry id of the
+            name (see identita), else a file-system safe form of the
+            normalized name, the same for every spelling
+    """
+    if id_giocatore is None:
+        id_giocatore = identita(nome or "")
+    if isinstance(id_giocatore, int):
+        return str(id_giocatore)
+    return re.sub(r"[^a-z0-9]+", "_", id_giocatore).strip("_")
+
+
+def nome_chiave(chiave, nome=None):
+    """Display name of a key from chiave_giocatore: the registry name, else nome, else the key"""
+    if chiave.isdigit():
+        registrato = nome_giocatore(int(chiave))
+        if registrato:
+            return registrato
+    return " ".join(nome.split()) if nome else chiave
+
+
+def chiavi_partita(dati):
+    """
+    Keys of the players of a match document, from its stored id fields
+
+    Names without a stored id (files saved before the migration, unknown
+    names) are not in the result: callers fall back to chiave_giocatore(nome).
+
+    Args:
+        dati (dict): Match data, see aggiungi_id_partita
+
+    Returns:
+        dict: Name -> key (see chiave_giocatore)
+    """
+    coppie = list(zip(dati.get("formazione", []), dati.get("formazione_id", [])))
+    coppie += zip(dati.get("ammonizioni", []), dati.get("ammonizioni_id", []))
+    coppie += zip(dati.get("goal", []), dati.get("goal_id", []))
+    for sub in dati.get("substitutions", []):
+        coppie += [(sub.get("sub_in"), sub.get("sub_in_id")), (sub.get("sub_out"), sub.get("sub_out_id"))]
+    for espulsione in dati.get("espulsioni", []):
+        if isinstance(espulsione, dict):
+            coppie.append((espulsione.get("esp_player"), espulsione.get("esp_player_id")))
+    for nc in dati.get("non_convocati", []):
+        coppie.append((nc.get("giocatore"), nc.get("giocatore_id")))
+    return {nome: str(id_giocatore) for nome, id_giocatore in coppie if nome and id_giocatore is not None}
+
+
+def chiavi_nomi(nomi, id_salvati=None):
+    """
+    Keys of a list of names (see chiave_giocatore), using the ids stored
+    alongside when the file has them (e.g. id_giocatori of an attendance month)
+
+    Returns:
+        list: One key per name
+    """
+    if not id_salvati or len(id_salvati) != len(nomi):
+        id_salvati = [None] * len(nomi)
+    return [chiave_giocatore(nome, id_giocatore) for nome, id_giocatore in zip(nomi, id_salvati)]
+
+
+def _leggi_rosa(path):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter=";")
+        return list(reader.fieldnames or []), list(reader)
+
+
+def _intero(valore):
+    try:
+        return int(float(valore))
+    except (TypeError, ValueError):
+        return None
+
+
+def sincronizza_squadra(squadra):
+    """
+    Assign ids to the roster of a squad and keep the registry in sync
+
+    Rows are matched by their ID column; rows without one are matched by
+    name against every known alias (a player moving between squads keeps
+    the same id), otherwise they get a new id. A renamed row keeps its id
+    and the old name becomes an alias. The ID column is written back to
+    squadre/<squadra>.csv.
+
+    Args:
+        squadra (str): Squad code
+
+    Returns:
+        dict: Display name -> id for the roster
+    """
+    path = os.path.join(dir_squadre, f"{squadra}.csv")
+    if not os.path.exists(path):
+        return {}
+
+    with lock_squadra(squadra), lock_squadra(LOCK_ANAGRAFICA):
+        colonne, righe = _leggi_rosa(path)
+        registro = _carica_modificabile()
+        giocatori = registro["giocatori"]
+        indice = {}
+        for id_str, giocatore in giocatori.items():
+            for alias in [giocatore["nome"]] + giocatore.get("alias", []):
+                indice.setdefault(normalizza_nome(alias), int(id_str))
+
+        rosa = {}
+        csv_modificato = "ID" not in colonne
+        for riga in righe:
+            nome = " ".join(f"{riga.get('NOME') or ''} {riga.get('COGNOME') or ''}".split())
+            if not nome:
+                continue
+            id_giocatore = _intero(riga.get("ID"))
+            if id_giocatore is None or str(id_giocatore) not in giocatori:
+                id_giocatore = indice.get(normalizza_nome(nome))
+            if id_giocatore is None:
+                id_giocatore = registro["prossimo_id"]
+                registro["prossimo_id"] += 1
+                giocatori[str(id_giocatore)] = {"nome": nome, "anno": None, "squadre": [], "alias": []}
+            if riga.get("ID") != str(id_giocatore):
+                riga["ID"] = str(id_giocatore)
+                csv_modificato = True
+
+            giocatore = giocatori[str(id_giocatore)]
+            if giocatore["nome"] != nome:
+                # Rinominato (o scritto diversamente): il vecchio nome resta come alias
+                if giocatore["nome"] not in giocatore["alias"]:
+                    giocatore["alias"].append(giocatore["nome"])
+                giocatore["nome"] = nome
+            giocatore["anno"] = _intero(riga.get("ANNO")) or giocatore.get("anno")
+            if squadra not in giocatore["squadre"]:
+                giocatore["squadre"].append(squadra)
+            indice[normalizza_nome(nome)] = id_giocatore
+            rosa[nome] = id_giocatore
+
+        scrivi_json(ANAGRAFICA_PATH, registro, LOCK_ANAGRAFICA, indent=2)
+
+        if csv_modificato:
+            if "ID" not in colonne:
+                colonne.append("ID")
+
+            def scrivi_rosa(f):
+                writer = csv.DictWriter(f, fieldnames=colonne, delimiter=";", extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(righe)
+
+            scrittura_atomica(path, scrivi_rosa, squadra)
+    return rosa
+
+
+def _candidati(squadra):
+    # Prima i giocatori della squadra, così due omonimi di squadre diverse non si confondono
+    registro = carica()
+    candidati = {}
+    for id_str, giocatore in registro["giocatori"].items():
+        if squadra is None or squadra in giocatore.get("squadre", []):
+            for alias in [giocatore["nome"]] + giocatore.get("alias", []):
+                candidati.setdefault(normalizza_nome(alias), int(id_str))
+    return candidati
+
+
+def risolvi_fuzzy(nome, squadra=None, soglia=SOGLIA_FUZZY):
+    """
+    Id of a possibly misspelled name
+
+    Exact matches win; otherwise the closest alias of the squad's players is
+    accepted if its similarity is at least soglia and no other player is as
+    close.
+
+    Returns:
+        tuple: (id or None, similarity)
+    """
+    chiave = normalizza_nome(nome)
+    esatto = indice_alias().get(chiave)
+    if esatto is not None:
+        return esatto, 1.0
+
+    candidati = _candidati(squadra) or _candidati(None)
+    punteggi = sorted(
+        ((difflib.SequenceMatcher(None, chiave, alias).ratio(), id_giocatore) for alias, id_giocatore in candidati.items()),
+        reverse=True
+    )
+    if not punteggi or punteggi[0][0] < soglia:
+        return None, punteggi[0][0] if punteggi else 0.0
+    migliore, id_giocatore = punteggi[0]
+    if any(p == migliore and i != id_giocatore for p, i in punteggi[1:]):
+        return None, migliore
+    return id_giocatore, migliore
+
+
+def aggiungi_id_partita(dati):
+    """
+    Add the id fields to a match document, next to the names
+
+    formazione_id, ammonizioni_id and goal_id are aligned with their name
+    lists; substitutions, espulsioni and non_convocati entries get
+    sub_in_id/sub_out_id, esp_player_id and giocatore_id. Unknown names
+    (and "autogol") get None.
+
+    Returns:
+        dict: dati, modified in place
+    """
+    dati["formazione_id"] = ids(dati.get("formazione", []))
+    dati["ammonizioni_id"] = ids(dati.get("ammonizioni", []))
+    dati["goal_id"] = ids(g if g != "autogol" else "" for g in dati.get("goal", []))
+    for sub in dati.get("substitutions", []):
+        sub["sub_in_id"], sub["sub_out_id"] = ids([sub.get("sub_in"), sub.get("sub_out")])
+    for espulsione in dati.get("espulsioni", []):
+        if isinstance(espulsione, dict):
+            espulsione["esp_player_id"] = ids([espulsione.get("esp_player")])[0]
+    for nc in dati.get("non_convocati", []):
+        nc["giocatore_id"] = ids([nc.get("giocatore")])[0]
+    return dati
+
+
+def aggiungi_id_convocazione(dati):
+    """Add componenti_squadra_id and non_convocati_id to a convocation; returns dati"""
+    dati["componenti_squadra_id"] = ids(dati.get("componenti_squadra", []))
+    non_convocati = [n.strip() for n in dati.get("non_convocati", "").split(",") if n.strip()]
+    dati["non_convocati_id"] = ids(non_convocati)
+    return dati
+
+
+def _nomi_documento(dati, tipo):
+    if tipo == "partita":
+        nomi = list(dati.get("formazione", [])) + list(dati.get("ammonizioni", [])) + list(dati.get("goal", []))
+        for sub in dati.get("substitutions", []):
+            nomi += [sub.get("sub_in"), sub.get("sub_out")]
+        nomi += [e.get("esp_player") for e in dati.get("espulsioni", []) if isinstance(e, dict)]
+        nomi += [nc.get("giocatore") for nc in dati.get("non_convocati", [])]
+    elif tipo == "convocazione":
+        nomi = list(dati.get("componenti_squadra", []))
+        nomi += [n.strip() for n in dati.get("non_convocati", "").split(",")]
+    else:
+        nomi = list(dati.get("giocatori", []))
+    return [n for n in nomi if n and n != "autogol"]
+
+
+def migra(squadre=None, soglia=SOGLIA_FUZZY, scrivi=True):
+    """
+    Add id fields to every stored match, convocation and attendance month
+
+    Rosters are synced first. Names not found exactly are matched with
+    risolvi_fuzzy; accepted matches are recorded as aliases so the next
+    lookups are exact. Names still unknown (e.g. players no longer in the
+    roster) are registered as new players.
+
+    Args:
+        squadre (list): Squad codes, default all
+        soglia (float): Minimum similarity for fuzzy matches
+        scrivi (bool): False for a dry run (rosters are still synced)
+
+    Returns:
+        dict: "file" (files updated), "fuzzy" ([(file, name, registry name,
+            similarity)]) and "nuovi" ({name: squad} registered as new players)
+    """
+    from presenze_store import migra_presenze
+
+    squadre = squadre or nomi_squadre
+    for squadra in squadre:
+        sincronizza_squadra(squadra)
+        # Le presenze nel vecchio file unico vanno prima divise per mese
+        if scrivi:
+            migra_presenze(squadra)
+
+    report = {"file": 0, "fuzzy": [], "nuovi": {}}
+    documenti = []
+    for squadra in squadre:
+        for directory, tipo in (("convocazioni", "convocazione"), ("partita", "partita"), ("presenze", "presenze")):
+            dir_squadra = os.path.join(directory, squadra)
+            if not os.path.isdir(dir_squadra):
+                continue
+            for nome_file in sorted(os.listdir(dir_squadra)):
+                if nome_file.endswith(".json"):
+                    documenti.append((squadra, tipo, os.path.join(dir_squadra, nome_file)))
+
+    # Primo passaggio: nomi non riconosciuti esattamente
+    indice = indice_alias()
+    alias = {}
+    nuovi = {}
+    for squadra, tipo, path in documenti:
+        with open(path, "r", encoding="utf-8") as f:
+            dati = json.load(f)
+        for nome in set(_nomi_documento(dati, tipo)):
+            chiave = normalizza_nome(nome)
+            if chiave in indice or chiave in alias or chiave in nuovi:
+                continue
+            id_giocatore, somiglianza = risolvi_fuzzy(nome, squadra, soglia)
+            if id_giocatore is None:
+                nuovi[chiave] = (" ".join(nome.split()), squadra)
+            else:
+                alias[chiave] = (id_giocatore, nome)
+                report["fuzzy"].append((path, nome, nome_giocatore(id_giocatore), round(somiglianza, 3)))
+    report["nuovi"] = {nome: squadra for nome, squadra in nuovi.values()}
+
+    if not scrivi:
+        return report
+
+    if alias or nuovi:
+        with lock_squadra(LOCK_ANAGRAFICA):
+            registro = _carica_modificabile()
+            for id_giocatore, nome in alias.values():
+                registro["giocatori"][str(id_giocatore)].setdefault("alias", []).append(nome)
+            for nome, squadra in nuovi.values():
+                registro["giocatori"][str(registro["prossimo_id"])] = {
+                    "nome": nome, "anno": None, "squadre": [squadra], "alias": [], "fuori_rosa": True
+                }
+                registro["prossimo_id"] += 1
+            scrivi_json(ANAGRAFICA_PATH, registro, LOCK_ANAGRAFICA, indent=2)
+
+    # Secondo passaggio: scrittura dei campi id
+    for squadra, tipo, path in documenti:
+        # Lettura e riscrittura sotto il lock della squadra: un salvataggio dall'app non va perso
+        with lock_squadra(squadra):
+            with open(path, "r", encoding="utf-8") as f:
+                dati = json.load(f)
+            if tipo == "partita":
+                aggiungi_id_partita(dati)
+                scrivi_json(path, dati, squadra, indent=2)
+            elif tipo == "convocazione":
+                aggiungi_id_convocazione(dati)
+                scrivi_json(path, dati, squadra, indent=2)
+            elif "giocatori" in dati:
+                dati["id_giocatori"] = ids(dati["giocatori"])
+                scrivi_json(path, dati, squadra, separators=(",", ":"))
+            else:
+                continue
+        report["file"] += 1
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Registro giocatori: assegna gli id e migra i file salvati")
+    parser.add_argument("squadre", nargs="*", help="Squadre (default: tutte)")
+    parser.add_argument("--soglia", type=float, default=SOGLIA_FUZZY, help="Somiglianza minima per i nomi scritti male")
+    parser.add_argument("--prova", action="store_true", help="Mostra le corrispondenze senza modificare partite, convocazioni e presenze")
+    args = parser.parse_args()
+
+    report = migra(args.squadre, soglia=args.soglia, scrivi=not args.prova)
+    for path, nome, registro, somiglianza in report["fuzzy"]:
+        print(f"{path}: '{nome}' -> '{registro}' ({somiglianza})")
+    for nome, squadra in sorted(report["nuovi"].items()):
+        esito = "da registrare" if args.prova else "registrato"
+        print(f"{squadra}: '{nome}' non è in rosa, {esito} come nuovo giocatore")
+    print(f"{report['file']} file aggiornati")
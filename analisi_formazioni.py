@@ -0,0 +1,304 @@
+import os
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from anagrafica import ANAGRAFICA_PATH, chiave_giocatore, chiavi_partita, nome_chiave
+from file_cache import load_json
+from interval_engine import DEFAULT_DURATION, match_intervals
+from profilazione import cronometra
+from season_stats import dir_partite, durata_partita
+
+# Analisi già calcolate, per squadra, valide finché i file delle partite non cambiano
+_analisi = {}
+
+
+def _firma_partite(squadra):
+    firma = []
+    directory = os.path.join(dir_partite, squadra)
+    if os.path.isdir(directory):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    firma.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(firma))
+
+
+def _firma_anagrafica():
+    # Un alias aggiunto o un nome cambiato nel registro cambia i join tra le partite
+    try:
+        stat = os.stat(ANAGRAFICA_PATH)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+def _gol_partita(match_data):
+    """Goals scored and conceded from the result, scored first ("2-1" -> (2, 1))"""
+    try:
+        fatti, subiti = match_data.get("risultato", "0-0").split("-")
+        return int(fatti.strip()), int(subiti.strip())
+    except Exception:
+        return 0, 0
+
+
+def _conta(minuti_gol, start, end, ultimo):
+    # Il gol al fischio finale conta nell'ultimo tratto
+    fine = bisect_right(minuti_gol, end) if ultimo else bisect_left(minuti_gol, end)
+    return fine - bisect_left(minuti_gol, start)
+
+
+def segmenti_partita(match_data, squadra):
+    """
+    Split a match into stretches with the same players on the pitch
+
+    Goals are assigned to the stretch they were scored in when the match has
+    goal minutes (live mode); otherwise the result is spread over the match
+    in proportion to each stretch's length.
+
+    Args:
+        match_data (dict): Match data
+        squadra (str): Squad code, used for the match duration
+
+    Returns:
+        tuple: (giocatori, presenze, minuti, fatti, subiti) where presenze is a
+            float array (stretches x giocatori) with 1 where the player is on,
+            and minuti/fatti/subiti are float arrays with one value per stretch
+    """
+    index = match_intervals(match_data, squadra)
+    segmenti = [s for s in index.segments() if s[2]]
+    giocatori = [p for p in index.players if index.intervals[p]]
+    colonne = {p: i for i, p in enumerate(giocatori)}
+
+    presenze = np.zeros((len(segmenti), len(giocatori)), dtype=np.float64)
+    minuti = np.zeros(len(segmenti), dtype=np.float64)
+    for r, (start, end, in_campo) in enumerate(segmenti):
+        presenze[r, [colonne[p] for p in in_campo]] = 1.0
+        minuti[r] = end - start
+
+    if "goal_dettaglio" in match_data:
+        fatti = np.array([
+            _conta(index.goals_for, start, end, end == index.duration) for start, end, _ in segmenti
+        ], dtype=np.float64)
+        subiti = np.array([
+            _conta(index.goals_against, start, end, end == index.duration) for start, end, _ in segmenti
+        ], dtype=np.float64)
+    else:
+        gol_fatti, gol_subiti = _gol_partita(match_data)
+        quota = minuti / index.duration if index.duration else minuti
+        fatti = gol_fatti * quota
+        subiti = gol_subiti * quota
+
+    return giocatori, presenze, minuti, fatti, subiti
+
+
+@cronometra()
+def analizza_squadra(squadra):
+    """
+    Minutes together and goals for/against of every player pair of a squad
+
+    Each match adds presenze.T @ (w * presenze) to the season matrices, so
+    the diagonal holds the individual totals and the off-diagonal cells the
+    pair totals.
+
+    Args:
+        squadra (str): Squad code
+
+    Returns:
+        dict: 'giocatori' (names), 'minuti', 'fatti' and 'subiti' (square
+            float arrays), 'formazioni' (frozenset of player indexes ->
+            [minuti, fatti, subiti]), season totals 'minuti_squadra',
+            'fatti_squadra', 'subiti_squadra', 'partite', 'durata'
+            (regular match duration of the category) and 'errori' (file
+            name -> error message for the matches left out)
+    """
+    firma = _firma_partite(squadra)
+    anagrafica = _firma_anagrafica()
+    if squadra in _analisi and _analisi[squadra][0] == (firma, anagrafica):
+        return _analisi[squadra][1]
+
+    giocatori = []
+    indice = {}
+    contributi = []
+    formazioni = {}
+    errori = {}
+    minuti_squadra = fatti_squadra = subiti_squadra = 0.0
+
+    for nome_file, _, _ in firma:
+        try:
+            match_data = load_json(os.path.join(dir_partite, squadra, nome_file))
+            nomi, presenze, minuti, fatti, subiti = segmenti_partita(match_data, squadra)
+        except Exception as e:
+            # La partita resta fuori dall'analisi: l'errore viene mostrato in Reportistica
+            errori[nome_file] = str(e)
+            continue
+
+        # Join sull'id salvato nella partita: stesso giocatore anche se il nome è scritto in modi diversi
+        id_salvati = chiavi_partita(match_data)
+        righe = []
+        for nome in nomi:
+            chiave = id_salvati.get(nome) or chiave_giocatore(nome)
+            if chiave not in indice:
+                indice[chiave] = len(giocatori)
+                giocatori.append(nome_chiave(chiave, nome))
+            righe.append(indice[chiave])
+        righe, colonne = np.unique(np.array(righe, dtype=np.intp), return_inverse=True)
+        if len(righe) < len(nomi):
+            # Stesso id sotto due nomi: una sola colonna, in campo se lo è con uno dei due.
+            # Con indici ripetuti il += su np.ix_ terrebbe un solo contributo
+            unite = np.zeros((presenze.shape[0], len(righe)), dtype=presenze.dtype)
+            for colonna, riga in enumerate(colonne):
+                unite[:, riga] = np.maximum(unite[:, riga], presenze[:, colonna])
+            presenze = unite
+
+        contributi.append((
+            righe,
+            presenze.T @ (minuti[:, None] * presenze),
+            presenze.T @ (fatti[:, None] * presenze),
+            presenze.T @ (subiti[:, None] * presenze),
+        ))
+
+        for r in range(len(minuti)):
+            unita = frozenset(righe[presenze[r] > 0].tolist())
+            totali = formazioni.setdefault(unita, [0.0, 0.0, 0.0])
+            totali[0] += minuti[r]
+            totali[1] += fatti[r]
+            totali[2] += subiti[r]
+
+        minuti_squadra += minuti.sum()
+        fatti_squadra += fatti.sum()
+        subiti_squadra += subiti.sum()
+
+    n = len(giocatori)
+    risultato = {
+        "giocatori": giocatori,
+        "minuti": np.zeros((n, n)),
+        "fatti": np.zeros((n, n)),
+        "subiti": np.zeros((n, n)),
+        "formazioni": formazioni,
+        "minuti_squadra": minuti_squadra,
+        "fatti_squadra": fatti_squadra,
+        "subiti_squadra": subiti_squadra,
+        "partite": len(contributi),
+        "durata": durata_partita(squadra) or DEFAULT_DURATION,
+        "errori": errori,
+    }
+    for righe, m, f, s in contributi:
+        blocco = np.ix_(righe, righe)
+        risultato["minuti"][blocco] += m
+        risultato["fatti"][blocco] += f
+        risultato["subiti"][blocco] += s
+
+    _analisi[squadra] = ((firma, anagrafica), risultato)
+    return risultato
+
+
+def analizza_squadre(squadre, jobs=None):
+    """Analyze several squads concurrently; returns {squadra: analizza_squadra result}"""
+    with ThreadPoolExecutor(max_workers=jobs or max(len(squadre), 1)) as executor:
+        return dict(zip(squadre, executor.map(analizza_squadra, squadre)))
+
+
+def _per_partita(differenza, minuti, durata):
+    return np.divide(differenza * durata, minuti, out=np.zeros_like(differenza), where=minuti > 0)
+
+
+def on_off_rows(analisi):
+    """
+    On/off splits of the team's results for every player
+
+    The +/- rates are goal difference per regular match duration; "On-Off"
+    is the rate with the player on minus the rate with the player off.
+
+    Returns:
+        list: One dictionary per player, sorted by On-Off descending
+    """
+    minuti_on = np.diag(analisi["minuti"])
+    fatti_on = np.diag(analisi["fatti"])
+    subiti_on = np.diag(analisi["subiti"])
+    minuti_off = analisi["minuti_squadra"] - minuti_on
+    diff_on = fatti_on - subiti_on
+    diff_off = (analisi["fatti_squadra"] - fatti_on) - (analisi["subiti_squadra"] - subiti_on)
+
+    rate_on = _per_partita(diff_on, minuti_on, analisi["durata"])
+    rate_off = _per_partita(diff_off, minuti_off, analisi["durata"])
+
+    rows = [
+        {
+            "Giocatore": nome,
+            "Minuti in campo": int(round(minuti_on[i])),
+            "Gol fatti in campo": round(float(fatti_on[i]), 1),
+            "Gol subiti in campo": round(float(subiti_on[i]), 1),
+            "+/- in campo": round(float(diff_on[i]), 1),
+            "+/- per partita (in campo)": round(float(rate_on[i]), 2),
+            "+/- per partita (fuori)": round(float(rate_off[i]), 2),
+            "On-Off": round(float(rate_on[i] - rate_off[i]), 2),
+        }
+        for i, nome in enumerate(analisi["giocatori"])
+        if minuti_on[i] > 0
+    ]
+    rows.sort(key=lambda r: r["On-Off"], reverse=True)
+    return rows
+
+
+def coppie_rows(analisi, minuti_minimi=0):
+    """
+    Results of every player pair that shared the pitch
+
+    Args:
+        analisi (dict): Result of analizza_squadra
+        minuti_minimi (int): Skip pairs with fewer minutes together
+
+    Returns:
+        list: One dictionary per pair, sorted by +/- per partita descending
+    """
+    i, j = np.triu_indices(len(analisi["giocatori"]), k=1)
+    minuti = analisi["minuti"][i, j]
+    tenere = (minuti > 0) & (minuti >= minuti_minimi)
+    i, j, minuti = i[tenere], j[tenere], minuti[tenere]
+    fatti = analisi["fatti"][i, j]
+    subiti = analisi["subiti"][i, j]
+    rate = _per_partita(fatti - subiti, minuti, analisi["durata"])
+
+    nomi = analisi["giocatori"]
+    rows = [
+        {
+            "Giocatore 1": nomi[a],
+            "Giocatore 2": nomi[b],
+            "Minuti insieme": int(round(m)),
+            "Gol fatti": round(float(f), 1),
+            "Gol subiti": round(float(s), 1),
+            "+/-": round(float(f - s), 1),
+            "+/- per partita": round(float(r), 2),
+        }
+        for a, b, m, f, s, r in zip(i.tolist(), j.tolist(), minuti, fatti, subiti, rate)
+    ]
+    rows.sort(key=lambda r: (r["+/- per partita"], r["Minuti insieme"]), reverse=True)
+    return rows
+
+
+def formazioni_rows(analisi, minuti_minimi=0):
+    """
+    Results of every group of players that was on the pitch together
+
+    Returns:
+        list: One dictionary per unit, sorted by minutes descending
+    """
+    nomi = analisi["giocatori"]
+    durata = analisi["durata"]
+    rows = []
+    for unita, (minuti, fatti, subiti) in analisi["formazioni"].items():
+        if minuti < max(minuti_minimi, 1):
+            continue
+        rows.append({
+            "Giocatori in campo": ", ".join(sorted(nomi[k] for k in unita)),
+            "N": len(unita),
+            "Minuti": int(round(minuti)),
+            "Gol fatti": round(float(fatti), 1),
+            "Gol subiti": round(float(subiti), 1),
+            "+/- per partita": round(float((fatti - subiti) * durata / minuti), 2),
+        })
+    rows.sort(key=lambda r: r["Minuti"], reverse=True)
+    return rows
@@ -0,0 +1,208 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from anagrafica import ANAGRAFICA_PATH, chiavi_nomi, nome_chiave
+from presenze_matrice import CODICI
+from presenze_store import elenco_mesi, get_presenze_dir, get_presenze_legacy_path, load_matrice_mese
+from profilazione import cronometra
+
+CODICE_PRESENTE = CODICI.index("P")
+CODICI_ASSENZA = ["AI", "MS", "ML", "I", "MP"]
+
+
+# Archivi già impilati, per squadra, validi finché i file dei mesi non cambiano
+_archivi = {}
+
+
+def _firma_archivio(squadra):
+    firma = []
+    directory = get_presenze_dir(squadra)
+    if os.path.isdir(directory):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    firma.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    legacy_path = get_presenze_legacy_path(squadra)
+    if os.path.exists(legacy_path):
+        stat = os.stat(legacy_path)
+        firma.append(("", stat.st_mtime_ns, stat.st_size))
+    # Il registro giocatori decide quali righe dei vari mesi sono la stessa persona
+    if os.path.exists(ANAGRAFICA_PATH):
+        stat = os.stat(ANAGRAFICA_PATH)
+        firma.append((ANAGRAFICA_PATH, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(firma))
+
+
+@cronometra()
+def carica_archivio(squadra):
+    """
+    Stack every saved month of a squad into one players x days matrix
+
+    Rows are joined by registry id (see anagrafica), so a player renamed
+    between months keeps a single row; unregistered names are joined as is.
+
+    Args:
+        squadra (str): Squad code
+
+    Returns:
+        tuple: (giocatori, date, matrice) with date sorted ascending and
+            matrice a uint8 array (0 where nothing was recorded)
+    """
+    firma = _firma_archivio(squadra)
+    if squadra in _archivi and _archivi[squadra][0] == firma:
+        return _archivi[squadra][1]
+
+    mesi = []
+    for chiave_mese in elenco_mesi(squadra):
+        encoded = load_matrice_mese(squadra, chiave_mese, con_id=True)
+        if encoded is None:
+            continue
+        anno = int(chiave_mese[:4])
+        giocatori, giorni, matrice, id_giocatori = encoded
+        date_mese = [date(anno, int(g[3:5]), int(g[0:2])) for g in giorni]
+        # Righe unite sugli id salvati nel mese; il registro solo per i mesi senza id
+        chiavi = chiavi_nomi(giocatori, id_giocatori)
+        mesi.append((giocatori, chiavi, date_mese, matrice))
+
+    indice_giocatori = {}
+    giocatori = []
+    for giocatori_mese, chiavi, _, _ in mesi:
+        for g, chiave in zip(giocatori_mese, chiavi):
+            if chiave not in indice_giocatori:
+                indice_giocatori[chiave] = len(giocatori)
+                giocatori.append(nome_chiave(chiave, g))
+    date_archivio = sorted(set(d for mese in mesi for d in mese[2]))
+    indice_date = {d: idx for idx, d in enumerate(date_archivio)}
+
+    archivio = np.zeros((len(giocatori), len(date_archivio)), dtype=np.uint8)
+    for _, chiavi, date_mese, matrice in mesi:
+        righe = np.array([indice_giocatori[c] for c in chiavi], dtype=np.intp)
+        colonne = np.array([indice_date[d] for d in date_mese], dtype=np.intp)
+        if righe.size and colonne.size:
+            archivio[np.ix_(righe, colonne)] = matrice
+    _archivi[squadra] = (firma, (giocatori, date_archivio, archivio))
+    return giocatori, date_archivio, archivio
+
+
+def serie_massima(assenze):
+    """
+    Longest run of True values along each row
+
+    Args:
+        assenze (numpy.ndarray): Boolean matrix (players x sessions)
+
+    Returns:
+        numpy.ndarray: Longest run length per row
+    """
+    if assenze.size == 0:
+        return np.zeros(assenze.shape[0], dtype=np.int64)
+    progressivo = np.cumsum(assenze, axis=1)
+    # Valore del contatore all'ultima interruzione, propagato in avanti
+    azzeramenti = np.maximum.accumulate(np.where(assenze, 0, progressivo), axis=1)
+    return (progressivo - azzeramenti).max(axis=1)
+
+
+@cronometra()
+def analizza(giocatori, date_archivio, archivio, data_inizio=None, data_fine=None):
+    """
+    Presence rates, absence breakdown, streaks and monthly trend
+
+    Only team session days (days where at least one code was recorded for
+    the squad) count; a streak is a run of consecutive sessions in which
+    the player was absent with any of the absence codes.
+
+    Args:
+        giocatori (list): Row labels
+        date_archivio (list): Sorted dates, one per column
+        archivio (numpy.ndarray): uint8 codes (players x days)
+        data_inizio (date): First day included, no lower bound if omitted
+        data_fine (date): Last day included, no upper bound if omitted
+
+    Returns:
+        tuple: (riepilogo, andamento, andamento_squadra) where riepilogo has
+            one row per player, andamento is the presence percentage per
+            player and month and andamento_squadra the team percentage per month
+    """
+    date_np = np.array(date_archivio, dtype="datetime64[D]")
+    filtro = np.ones(len(date_archivio), dtype=bool)
+    if data_inizio is not None:
+        filtro &= date_np >= np.datetime64(data_inizio, "D")
+    if data_fine is not None:
+        filtro &= date_np <= np.datetime64(data_fine, "D")
+
+    # Solo i giorni in cui la squadra ha registrato qualcosa
+    if archivio.size:
+        filtro &= (archivio != 0).any(axis=0)
+    matrice = archivio[:, filtro]
+    date_sedute = date_np[filtro]
+
+    n_giocatori = len(giocatori)
+    conteggi = np.bincount(
+        (np.arange(n_giocatori)[:, None] * len(CODICI) + matrice).ravel(),
+        minlength=n_giocatori * len(CODICI)
+    ).reshape(n_giocatori, len(CODICI))
+
+    registrate = conteggi[:, 1:].sum(axis=1)
+    presenze = conteggi[:, CODICE_PRESENTE]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percentuale = np.where(registrate > 0, presenze / registrate * 100, np.nan)
+
+    riepilogo = pd.DataFrame({
+        "Giocatore": giocatori,
+        "Sedute registrate": registrate,
+        "Presenze": presenze,
+        "% Presenza": np.round(percentuale, 1),
+    })
+    for codice in CODICI_ASSENZA:
+        riepilogo[codice] = conteggi[:, CODICI.index(codice)]
+    riepilogo["Serie assenze max"] = serie_massima(matrice >= CODICI.index(CODICI_ASSENZA[0]))
+
+    # Andamento mensile: somme per blocchi di colonne contigue dello stesso mese
+    mesi = date_sedute.astype("datetime64[M]")
+    if mesi.size:
+        inizi = np.flatnonzero(np.r_[True, mesi[1:] != mesi[:-1]])
+        presenti_mese = np.add.reduceat(matrice == CODICE_PRESENTE, inizi, axis=1)
+        registrate_mese = np.add.reduceat(matrice != 0, inizi, axis=1)
+        etichette = [str(m) for m in mesi[inizi]]
+    else:
+        presenti_mese = registrate_mese = np.zeros((n_giocatori, 0))
+        etichette = []
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        andamento = pd.DataFrame(
+            np.round(presenti_mese / registrate_mese * 100, 1),
+            index=giocatori, columns=etichette
+        )
+        andamento_squadra = pd.Series(
+            np.round(presenti_mese.sum(axis=0) / registrate_mese.sum(axis=0) * 100, 1),
+            index=etichette, name="% Presenza"
+        )
+
+    riepilogo = riepilogo[riepilogo["Sedute registrate"] > 0]
+    andamento = andamento.loc[riepilogo["Giocatore"]]
+    return riepilogo.sort_values("% Presenza", ascending=False), andamento, andamento_squadra
+
+
+def analizza_squadra(squadra, data_inizio=None, data_fine=None):
+    """analizza() over the whole attendance archive of one squad"""
+    return analizza(*carica_archivio(squadra), data_inizio=data_inizio, data_fine=data_fine)
+
+
+def analizza_squadre(squadre, data_inizio=None, data_fine=None):
+    """
+    Per-player summary for several squads in one table
+
+    Returns:
+        pandas.DataFrame: analizza() summaries with an extra "Squadra" column
+    """
+    riepiloghi = []
+    for squadra in squadre:
+        riepilogo, _, _ = analizza_squadra(squadra, data_inizio, data_fine)
+        riepiloghi.append(riepilogo.assign(Squadra=squadra))
+    if not riepiloghi:
+        return pd.DataFrame()
+    return pd.concat(riepiloghi, ignore_index=True)
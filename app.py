@@ -1,194 +1,307 @@
 import streamlit as st
-import pandas as pd
 import os
+import hmac
 import calendar
 import json
 from datetime import datetime, time
-from streamlit_extras.add_vertical_space import add_vertical_space
 import locale
-from openpyxl import load_workbook
-
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from io import BytesIO
-
-import plotly.express as px
-import plotly.graph_objects as go
 
 
 import logging
 import glob
 
+# Le dipendenze pesanti (pandas, plotly, reportlab, openpyxl) sono importate
+# solo nelle sezioni che le usano: Streamlit riesegue lo script a ogni interazione
+from core import nomi_squadre, prepara_cartelle, load_squad, save_squad, get_squadra_descrizione
+from anagrafica import aggiungi_id_convocazione, aggiungi_id_partita, sincronizza_squadra
+from file_cache import load_json
+from lineup_editor import NUM_SLOT, editor_formazione
+from storage import NUOVO, ConflittoVersione, scrivi_json, versione
+import profilazione
+from profilazione import misura
 
+# Tempi di questo rerun (solo con MANAGETEAM_PROFILING=1)
+profilazione.inizia_rerun()
+
+# Backend SQLite opzionale (MANAGETEAM_BACKEND=sqlite): le sezioni leggono dal database
+# indicizzato invece di scorrere le cartelle; i salvataggi lo aggiornano (vedi storage)
+if os.environ.get("MANAGETEAM_BACKEND") == "sqlite":
+    import sqlite_store
+else:
+    sqlite_store = None
 
-# Imposta la localizzazione italiana per i nomi dei mesi
 
-# Percorsi base
-dir_squadre = "squadre"
-dir_presenze = "presenze"
-nomi_squadre = ["PP", "U19", "U18", "U17R", "U17P", "U16R", "U16P", "U15R", "U15P", "U14R", "U14P"]
+
+# Imposta la localizzazione italiana per i nomi dei mesi
 
 # Crea directory se non esistono
-os.makedirs(dir_squadre, exist_ok=True)
-os.makedirs(dir_presenze, exist_ok=True)
-
-# Funzione per caricare la squadra
-def load_squad(squadra):
-    path = os.path.join(dir_squadre, f"{squadra}.csv")
-    if os.path.exists(path):
-        return pd.read_csv(path, sep=';')
-    else:
-        return pd.DataFrame(columns=["NOME", "COGNOME", "ANNO", "RUOLO"])
-
-# Funzione per salvare la squadra
-def save_squad(squadra, df):
-    path = os.path.join(dir_squadre, f"{squadra}.csv")
-    df.to_csv(path, sep=';', index=False)
-
-# Funzione per ottenere descrizione squadra
-def get_squadra_descrizione(codice):
-    if codice == "PP":
-        return "Prima Squadra"
-    elif codice.startswith("U"):
-        livello = ""
-        if codice.endswith("R"):
-            livello = "Regionale"
-        elif codice.endswith("P"):
-            livello = "Provinciale"
-        categoria = codice[1:3]  # U19 -> 19
-        return f"Under {categoria} {livello}".strip()
-    return codice
-
-# Funzioni per gestire presenze JSON
-def get_presenze_path(squadra):
-    return os.path.join(dir_presenze, f"{squadra}.json")
-
-def load_presenze(squadra):
-    path = get_presenze_path(squadra)
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_presenze(squadra, data):
-    path = get_presenze_path(squadra)
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
-
-# Funzione per esportare in Excel
-def salva_excel_convocazione(dir_path, squadra_sel, squadra_avversaria, data_incontro, ora_incontro, campo, ora_raduno, convocati, non_convocati, mister, dirigente):
+prepara_cartelle()
+
+# Watcher in background, uno per processo: i file copiati a mano nelle cartelle delle squadre
+# vengono rielaborati subito (MANAGETEAM_WATCH=0 per disattivarlo, es. se gira già cli.py watch)
+if os.environ.get("MANAGETEAM_WATCH", "1") == "1":
+    import watcher
+    watcher.avvia()
+
+# Funzione per esportare in Excel: il file viene generato in background (vedi coda_export)
+def salva_excel_convocazione(dir_path, squadra_sel, squadra_avversaria, data_incontro, ora_incontro, campo, ora_raduno, convocati, non_convocati, mister, dirigente, contesto=None):
     modello_path = "Convocazione.xlsx"
     if not os.path.exists(modello_path):
         st.error("File modello Convocazione.xlsx non trovato nella root del progetto.")
         return
 
-    wb = load_workbook(modello_path)
-    ws = wb.active
-
-    ws["C10"] = squadra_avversaria
-    ws["C14"] = f"{data_incontro.strftime('%d/%m/%Y')} - {ora_incontro.strftime('%H:%M')}"
-
-    if "," in campo:
-        parte1, parte2 = campo.split(",", 1)
-        ws["C16"] = parte1.strip()
-        ws["C17"] = parte2.strip()
-    else:
-        ws["C16"] = campo.strip()
-        ws["C17"] = ""
-
-    ws["C19"] = ora_raduno
-
-    for idx, giocatore in enumerate(convocati[:22]):
-        ws[f"C{22 + idx}"] = giocatore
-
-    ws["C45"] = non_convocati
-    ws["C50"] = mister
-    ws["C52"] = dirigente
-
-    dir_squadra = os.path.join(dir_path, squadra_sel)
-    os.makedirs(dir_squadra, exist_ok=True)
-    nome_file = f"Convocazione_{squadra_sel}_{squadra_avversaria.replace(' ', '_')}.xlsx"
-    percorso_file = os.path.join(dir_squadra, nome_file)
-    wb.save(percorso_file)
-
-    with open(percorso_file, "rb") as f:
-        st.download_button("Scarica convocazione in Excel", data=f, file_name=nome_file, mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-
-
-def genera_pdf_partita(dati, logo_path="logo.png"):
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    y = height - 50
-
-    # Inserisci logo in alto a sinistra se esiste
-    if os.path.exists(logo_path):
-        try:
-            c.drawImage(ImageReader(logo_path), 40, height - 100, width=80, preserveAspectRatio=True, mask='auto')
-        except Exception as e:
-            print("Errore caricamento logo:", e)
-
-    y -= 100  # Spazio sotto al logo
-
-    def scrivi_riga(testo, gap=16, bold=False):
-        nonlocal y
-        if y < 100:
-            c.showPage()
-            y = height - 50
-        if bold:
-            c.setFont("Helvetica-Bold", 11)
-        else:
-            c.setFont("Helvetica", 10)
-        c.drawString(50, y, testo)
-        y -= gap
-
-    scrivi_riga(f"📄 REPORT PARTITA", bold=True)
-    scrivi_riga(f"Giornata: {dati['giornata']} - Squadra: {dati['squadra']}")
-    scrivi_riga(f"In casa: {dati['home_away']} - Risultato: {dati['risultato']} - Recupero: {dati['recupero']} min")
-    scrivi_riga("-" * 90)
-
-    scrivi_riga("🧤 Formazione:", bold=True)
-    for i, giocatore in enumerate(dati["formazione"], 1):
-        ruolo = "Titolare" if i <= 11 else "Panchina"
-        scrivi_riga(f"{i}. {giocatore} ({ruolo})")
-    scrivi_riga("-" * 90)
-
-    if dati["substitutions"]:
-        scrivi_riga("🔁 Sostituzioni:", bold=True)
-        for s in dati["substitutions"]:
-            scrivi_riga(f"Min {s['time_sub']}: {s['sub_out']} → {s['sub_in']}")
-        scrivi_riga("-" * 90)
-
-    if dati["goal"]:
-        scrivi_riga("⚽ Gol:", bold=True)
-        for i, g in enumerate(dati["goal"], 1):
-            scrivi_riga(f"{i}. {g}")
-        scrivi_riga("-" * 90)
-
-    if dati["ammonizioni"]:
-        scrivi_riga("🟨 Ammoniti:", bold=True)
-        for a in dati["ammonizioni"]:
-            scrivi_riga(f"- {a}")
-        scrivi_riga("-" * 90)
-
-    if dati["espulsioni"]:
-        scrivi_riga("🟥 Espulsioni:", bold=True)
-        for e in dati["espulsioni"]:
-            scrivi_riga(f"- {e['esp_player']} al minuto {e['time_esp']}")
-        scrivi_riga("-" * 90)
-
-    if dati["non_convocati"]:
-        scrivi_riga("🚫 Non convocati:", bold=True)
-        for nc in dati["non_convocati"]:
-            scrivi_riga(f"- {nc['giocatore']} ({nc['motivo']})")
-        scrivi_riga("-" * 90)
-
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer
+    import coda_export
+    from export_excel import MIME_XLSX, nome_file_convocazione
+
+    dati = {
+        "squadra": squadra_sel,
+        "squadra_avversaria": squadra_avversaria,
+        "data_ora_incontro": datetime.combine(data_incontro, ora_incontro).strftime("%Y-%m-%dT%H:%M"),
+        "denominazione_campo": campo,
+        "ora_raduno": ora_raduno,
+        "componenti_squadra": convocati,
+        "non_convocati": non_convocati,
+        "nome_mister": mister,
+        "nome_dirigente": dirigente
+    }
+    nome_file = nome_file_convocazione(squadra_sel, squadra_avversaria)
+    st.session_state.export_convocazione = {
+        "lavoro": coda_export.accoda(
+            "xlsx_convocazione", dati, copie=[os.path.join(dir_path, squadra_sel, nome_file)]
+        ),
+        "contesto": contesto or (st.session_state.sezione, squadra_sel),
+        "etichetta": "Scarica convocazione in Excel",
+        "nome_file": nome_file,
+        "mime": MIME_XLSX
+    }
+
+
+# Download di un export in coda: il frammento si aggiorna da solo finché il file non è pronto
+def mostra_export(chiave_sessione, contesto):
+    export = st.session_state.get(chiave_sessione)
+    if not export or export["contesto"] != contesto:
+        return
+
+    import coda_export
+
+    in_attesa = coda_export.stato(export["lavoro"])["stato"] in ("in_coda", "in_corso")
+
+    @st.fragment(run_every=1 if in_attesa else None)
+    def stato_export():
+        stato = coda_export.stato(export["lavoro"])
+        if stato["stato"] in ("in_coda", "in_corso"):
+            st.info(f"⏳ {export['nome_file']} in preparazione...")
+        elif stato["stato"] == "pronto":
+            if in_attesa:
+                # Rerun completo: il frammento viene ridisegnato senza aggiornamento periodico
+                st.rerun()
+            st.download_button(
+                export["etichetta"],
+                data=coda_export.leggi(export["lavoro"]),
+                file_name=export["nome_file"],
+                mime=export["mime"]
+            )
+        elif stato["stato"] == "errore":
+            st.error(f"❌ Errore nella generazione di {export['nome_file']}: {stato['errore']}")
+
+    stato_export()
+
+
+# Rosa della squadra, dal database se il backend SQLite è attivo
+def carica_rosa(squadra):
+    return sqlite_store.load_squad(squadra) if sqlite_store else load_squad(squadra)
+
+
+# Area dei non convocati, disegnata dentro l'editor dei convocati per restare aggiornata
+def area_non_convocati(nomi_giocatori):
+    def disegna(convocati):
+        scelti = set(p for p in convocati if p)
+        non_convocati = [g for g in nomi_giocatori if g not in scelti]
+        st.subheader("Giocatori non convocati")
+        st.session_state.non_convocati_text = st.text_area(
+            "Non convocati (separati da virgola)",
+            value=", ".join(non_convocati),
+            height=100
+        )
+    return disegna
+
+
+# Sostituzioni della partita, disegnate dentro l'editor della formazione: le scelte di chi entra
+# ed esce seguono subito la formazione, senza aspettare il prossimo rerun completo
+def area_sostituzioni(formazione):
+    st.markdown("---")
+    st.markdown("### Sostituzioni")
+
+    # Reset sostituzioni
+    if st.button("🔄 Reset sostituzioni"):
+        st.session_state.sostituzioni = []
+        st.rerun()
+
+    col_sost, _ = st.columns([1, 5])
+    with col_sost:
+        num_sost = st.number_input(
+            "Numero di sostituzioni",
+            min_value=0, max_value=9999, step=1,
+            label_visibility="visible"
+        )
+    if "sostituzioni" not in st.session_state or len(st.session_state.sostituzioni) != num_sost:
+        st.session_state.sostituzioni = [{"in": "", "out": "", "minuto": ""} for _ in range(num_sost)]
+
+    # Formazione dinamica aggiornata dopo ogni sostituzione
+    formazione_dinamica = formazione[:11]
+    panchina_dinamica = formazione[11:]
+
+    for i in range(num_sost):
+        st.markdown(f"**Sostituzione {i+1}**")
 
+        # Disponibili aggiornati: nessun doppione
+        disponibili_in = [p for p in panchina_dinamica if p and p not in [s["in"] for s in st.session_state.sostituzioni[:i]]]
+        disponibili_out = [p for p in formazione_dinamica if p and p not in [s["out"] for s in st.session_state.sostituzioni[:i]]]
+
+        col_in, col_out, col_min = st.columns(3)
+
+        with col_in:
+            st.session_state.sostituzioni[i]["in"] = st.selectbox(
+                "Entra", [""] + disponibili_in,
+                index=([""] + disponibili_in).index(st.session_state.sostituzioni[i]["in"]) if st.session_state.sostituzioni[i]["in"] in disponibili_in else 0,
+                key=f"sost_in_{i}"
+            )
+
+        with col_out:
+            st.session_state.sostituzioni[i]["out"] = st.selectbox(
+                "Esce", [""] + disponibili_out,
+                index=([""] + disponibili_out).index(st.session_state.sostituzioni[i]["out"]) if st.session_state.sostituzioni[i]["out"] in disponibili_out else 0,
+                key=f"sost_out_{i}"
+            )
+
+        with col_min:
+            min_prev = int(st.session_state.sostituzioni[i-1]["minuto"]) if i > 0 and st.session_state.sostituzioni[i-1]["minuto"].isdigit() else 0
+            current_val = st.session_state.sostituzioni[i]["minuto"]
+            nuovo_minuto = st.text_input("Minuto", value=current_val, key=f"sost_min_{i}")
+            if nuovo_minuto.isdigit() and int(nuovo_minuto) < min_prev:
+                st.warning(f"Il minuto della sostituzione {i+1} deve essere ≥ {min_prev}")
+            st.session_state.sostituzioni[i]["minuto"] = nuovo_minuto
+
+        # Applica dinamicamente la sostituzione alla formazione
+        in_player = st.session_state.sostituzioni[i]["in"]
+        out_player = st.session_state.sostituzioni[i]["out"]
+        if in_player and out_player and out_player in formazione_dinamica:
+            formazione_dinamica = [p if p != out_player else in_player for p in formazione_dinamica]
+            panchina_dinamica = [p for p in panchina_dinamica if p != in_player]
+
+
+# Minuto proposto per il prossimo evento live
+CHIAVE_MINUTO_LIVE = "live_minuto"
+
+
+# Aggiunge un evento al registro della partita live, mostrando l'errore se non è coerente
+def registra_evento_live(log_path, tipo, **campi):
+    import partita_live
+
+    try:
+        partita_live.registra_evento(log_path, tipo, **campi)
+        # Il prossimo evento riparte dal minuto dell'orologio
+        st.session_state.pop(CHIAVE_MINUTO_LIVE, None)
+        return True
+    except ValueError as e:
+        st.error(str(e))
+        return False
+
+
+# Versione del file su cui l'utente sta lavorando: viene aggiornata finché l'editor
+# non ha modifiche, poi resta quella su cui le modifiche sono state fatte
+def versione_caricata(path, chiave_editor=None):
+    chiave = f"versione::{path}"
+    modifiche = st.session_state.get(chiave_editor) if chiave_editor else None
+    in_corso = isinstance(modifiche, dict) and any(
+        modifiche.get(k) for k in ("edited_rows", "added_rows", "deleted_rows")
+    )
+    if chiave not in st.session_state or (chiave_editor and not in_corso):
+        st.session_state[chiave] = versione(path) or NUOVO
+    return st.session_state[chiave]
+
+
+# Salva solo se il file non è cambiato dal caricamento (vedi storage.ConflittoVersione)
+def salva_con_versione(path, salva, chiave_editor=None):
+    try:
+        st.session_state[f"versione::{path}"] = salva(versione_caricata(path, chiave_editor))
+        st.session_state.pop(f"conflitto::{path}", None)
+        return True
+    except ConflittoVersione:
+        st.session_state[f"conflitto::{path}"] = True
+        return False
+
+
+# Avviso di salvataggio rifiutato, con il pulsante per ricaricare i dati aggiornati
+def avviso_conflitto(path, chiavi_widget=()):
+    if not st.session_state.get(f"conflitto::{path}"):
+        return
+    st.error(
+        "Salvataggio non eseguito: i dati sono stati modificati da un altro utente dopo che li hai aperti. "
+        "Ricarica per vedere la versione aggiornata (le modifiche non salvate andranno perse)."
+    )
+    if st.button("🔄 Ricarica", key=f"ricarica::{path}"):
+        for chiave in (f"conflitto::{path}", f"versione::{path}", *chiavi_widget):
+            st.session_state.pop(chiave, None)
+        st.rerun()
+
+
+# Pannelli di amministrazione: solo aprendo l'app con ?admin=<MANAGETEAM_ADMIN_TOKEN>. Il flag
+# MANAGETEAM_PROFILING accende solo la raccolta dei tempi, non decide chi li vede
+def amministratore():
+    token = os.environ.get("MANAGETEAM_ADMIN_TOKEN")
+    if not token:
+        return False
+    if not st.session_state.get("admin"):
+        fornito = st.query_params.get("admin", "")
+        st.session_state.admin = hmac.compare_digest(fornito.encode(), token.encode())
+    return st.session_state.admin
+
+
+# Pannello "Performance" nella sidebar: tempi del rerun appena eseguito e medie per sezione
+def pannello_performance(rerun, etichetta):
+    with st.sidebar.expander("⏱️ Performance"):
+        if rerun:
+            st.metric("Ultimo rerun", f"{rerun['totale'] * 1000:.0f} ms", help=etichetta)
+            st.dataframe(
+                [
+                    {"Blocco": nome, "Chiamate": voce["chiamate"], "ms": round(voce["secondi"] * 1000, 1)}
+                    for nome, voce in sorted(rerun["tempi"].items(), key=lambda v: v[1]["secondi"], reverse=True)
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+            if rerun["contatori"]:
+                st.caption(" · ".join(f"{nome}: {n}" for nome, n in sorted(rerun["contatori"].items())))
+
+        # Lo storico è del processo e condiviso tra gli utenti: "Azzera" nasconde solo i rerun
+        # già visti in questa sessione
+        per_sezione = {}
+        for r in profilazione.storico(st.session_state.get("profilazione_da", 0)):
+            per_sezione.setdefault(r["etichetta"], []).append(r["totale"])
+        st.caption("Rerun recenti per sezione")
+        st.dataframe(
+            [
+                {
+                    "Sezione": sezione,
+                    "Rerun": len(tempi),
+                    "Media ms": round(sum(tempi) / len(tempi) * 1000, 1),
+                    "Max ms": round(max(tempi) * 1000, 1)
+                }
+                for sezione, tempi in per_sezione.items()
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+
+        st.download_button(
+            "💾 Esporta JSON",
+            data=profilazione.esporta_json(),
+            file_name=f"profilazione_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json"
+        )
+        if st.button("🧹 Azzera"):
+            st.session_state.profilazione_da = rerun["n"] if rerun else 0
 
 
 # Pagina iniziale
@@ -214,9 +327,20 @@ if st.session_state.pagina == "home":
         st.rerun()
 
 elif st.session_state.pagina == "dashboard":
+    import pandas as pd
+    from streamlit_extras.add_vertical_space import add_vertical_space
+
     squadra_sel = st.session_state.squadra_sel
     squadra_descrizione = get_squadra_descrizione(squadra_sel)
-    df = load_squad(squadra_sel)
+    df = carica_rosa(squadra_sel)
+    if len(df) and "ID" not in df.columns:
+        # Rosa mai registrata nell'anagrafica: gli id si assegnano solo su richiesta (o con
+        # anagrafica.migra), mai durante una lettura che riscriverebbe il CSV
+        st.info("La rosa non è ancora registrata nell'anagrafica giocatori: le statistiche la uniscono per nome.")
+        if st.button("🆔 Registra la rosa nell'anagrafica"):
+            sincronizza_squadra(squadra_sel)
+            st.session_state.pop(f"versione::{os.path.join('squadre', f'{squadra_sel}.csv')}", None)
+            st.rerun()
 
     with st.sidebar:
         st.title("Menu")
@@ -230,6 +354,10 @@ elif st.session_state.pagina == "dashboard":
             st.session_state.sezione = "Presenze"
             st.rerun()
 
+        if st.button("📈 Analisi Presenze"):  # statistiche presenze
+            st.session_state.sezione = "Analisi Presenze"
+            st.rerun()
+
         if st.button("📣 Convocazioni"):  # nuova convocazione
             st.session_state.sezione = "Convocazioni"
             st.rerun()
@@ -246,6 +374,14 @@ elif st.session_state.pagina == "dashboard":
             st.session_state.sezione = "Reportistica"
             st.rerun()
 
+        if st.button("🧑 Scheda Giocatore"):  # presenze di un singolo giocatore
+            st.session_state.sezione = "Scheda Giocatore"
+            st.rerun()
+
+        if st.button("🏟️ Report Società"):  # tutte le squadre
+            st.session_state.sezione = "Report Società"
+            st.rerun()
+
 
         add_vertical_space(1)
         if st.button("🔙 Torna alla selezione squadra"):
@@ -265,20 +401,30 @@ elif st.session_state.pagina == "dashboard":
 
 
     if st.session_state.sezione == "Squadra":
+        path_rosa = os.path.join("squadre", f"{squadra_sel}.csv")
+        chiave_editor = f"data_editor_modifica_{squadra_sel}"
+        # Versione presa prima di rileggere la rosa: un salvataggio nel mezzo risulta come conflitto
+        versione_caricata(path_rosa, chiave_editor)
+        df = carica_rosa(squadra_sel)
         edited_df = st.data_editor(
             df.copy(),
             num_rows="dynamic",
             use_container_width=True,
-            key=f"data_editor_modifica_{squadra_sel}",
-            disabled=False
+            key=chiave_editor,
+            # L'ID viene assegnato dal registro giocatori al salvataggio
+            disabled=["ID"]
         )
 
         if st.button("Salva lista giocatori"):
-            save_squad(squadra_sel, edited_df)
-            st.success("Lista salvata con successo!")
-            st.rerun()
+            if salva_con_versione(path_rosa, lambda v: save_squad(squadra_sel, edited_df, v), chiave_editor):
+                st.success("Lista salvata con successo!")
+                st.rerun()
+        avviso_conflitto(path_rosa, [chiave_editor])
 
     elif st.session_state.sezione == "Presenze":
+        from presenze_store import get_presenze_mese_path, load_matrice_mese, save_matrice_mese
+        from presenze_matrice import CODICI, codifica_dataframe, codifica_mese, decodifica_dataframe
+
         col1, col2 = st.columns(2)
 
         # Nomi mesi italiani hardcoded per evitare locale
@@ -297,11 +443,17 @@ elif st.session_state.pagina == "dashboard":
         date_colonne = [f"{giorno:02d}/{mese_numero:02d}" for giorno in range(1, giorni_mese + 1)]
 
         nomi_giocatori = df[["NOME", "COGNOME"]].apply(lambda x: f"{x['NOME']} {x['COGNOME']}", axis=1).tolist()
-        presenze_data = load_presenze(squadra_sel)
         chiave_mese = f"{anno}-{mese_numero:02d}"
+        path_mese = get_presenze_mese_path(squadra_sel, chiave_mese)
+        versione_caricata(path_mese, f"presenze_{chiave_mese}")
+        if sqlite_store:
+            dati_mese = sqlite_store.load_presenze_mese(squadra_sel, chiave_mese)
+            presenze_mese = codifica_mese(dati_mese) if dati_mese else None
+        else:
+            presenze_mese = load_matrice_mese(squadra_sel, chiave_mese)
 
-        if chiave_mese in presenze_data:
-            data_presenze = pd.DataFrame(presenze_data[chiave_mese])
+        if presenze_mese is not None:
+            data_presenze = decodifica_dataframe(*presenze_mese)
         else:
             data_presenze = pd.DataFrame(index=nomi_giocatori, columns=date_colonne)
 
@@ -316,17 +468,62 @@ elif st.session_state.pagina == "dashboard":
             column_config={
                 col: st.column_config.SelectboxColumn(
                     label=col,
-                    options=["", "P", "AI", "MS", "ML", "I", "MP"]
+                    options=CODICI
                 ) for col in data_presenze.columns
             },
         )
 
         if st.button("Salva presenze"):
-            presenze_data[chiave_mese] = edited_df.where(pd.notnull(edited_df), "").to_dict()
-            save_presenze(squadra_sel, presenze_data)
-            st.success("Presenze salvate correttamente.")
+            if salva_con_versione(
+                path_mese,
+                lambda v: save_matrice_mese(squadra_sel, chiave_mese, *codifica_dataframe(edited_df), versione_attesa=v),
+                f"presenze_{chiave_mese}"
+            ):
+                st.success("Presenze salvate correttamente.")
+        avviso_conflitto(path_mese, [f"presenze_{chiave_mese}"])
 
 
+    elif st.session_state.sezione == "Analisi Presenze":
+        import plotly.express as px
+        from analisi_presenze import analizza_squadra, analizza_squadre
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            data_inizio = st.date_input("Dal", value=None, format="DD/MM/YYYY")
+        with col2:
+            data_fine = st.date_input("Al", value=None, format="DD/MM/YYYY")
+        with col3:
+            tutte_le_squadre = st.toggle("Tutte le squadre")
+
+        if tutte_le_squadre:
+            riepilogo_societa = analizza_squadre(nomi_squadre, data_inizio, data_fine)
+            if riepilogo_societa.empty:
+                st.info("Nessuna presenza registrata nel periodo selezionato.")
+            else:
+                st.dataframe(riepilogo_societa, use_container_width=True, hide_index=True)
+        else:
+            riepilogo, andamento, andamento_squadra = analizza_squadra(squadra_sel, data_inizio, data_fine)
+
+            if riepilogo.empty:
+                st.info("Nessuna presenza registrata nel periodo selezionato.")
+            else:
+                st.markdown("### 👥 Presenze per Giocatore")
+                st.dataframe(riepilogo, use_container_width=True, hide_index=True)
+
+                st.divider()
+                st.markdown("### 📈 Andamento Mensile")
+                with misura("grafico: andamento presenze"):
+                    fig = px.line(
+                        x=andamento_squadra.index,
+                        y=andamento_squadra.values,
+                        markers=True,
+                        labels={"x": "Mese", "y": "% Presenza"},
+                        title="Percentuale di presenza della squadra",
+                        height=400
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                st.dataframe(andamento, use_container_width=True)
+
     elif st.session_state.sezione == "Convocazioni":
         # Crea directory convocazioni per la squadra se non esiste
         dir_convocazioni_squadra = os.path.join("convocazioni", squadra_sel)
@@ -354,76 +551,28 @@ elif st.session_state.pagina == "dashboard":
         st.subheader("Selezione Giocatori")
         
         # Carica la lista dei giocatori
-        df_squadra = load_squad(squadra_sel)
+        df_squadra = carica_rosa(squadra_sel)
         nomi_giocatori = df_squadra[["NOME", "COGNOME"]].apply(lambda x: f"{x['NOME']} {x['COGNOME']}", axis=1).tolist()
         
-        # Layout a due colonne
-        col_disponibili, col_convocati = st.columns([1, 1])
-        
         # Inizializza la lista dei convocati nella session state
         if 'convocati' not in st.session_state:
-            st.session_state.convocati = [""] * 20
-        
-        # Lista dei giocatori disponibili
-        with col_disponibili:
-            st.markdown("**Giocatori disponibili**")
-            convocati_attuali = [p for p in st.session_state.convocati if p]
-            disponibili = [g for g in nomi_giocatori if g not in convocati_attuali]
-
-            for giocatore in disponibili:
-                if st.button(giocatore, key=f"disp_{giocatore}"):
-                    for i in range(len(st.session_state.convocati)):
-                        if st.session_state.convocati[i] == "":
-                            st.session_state.convocati[i] = giocatore
-                            st.rerun()
-
-
-        
-        with col_convocati:
-            st.markdown("**Giocatori convocati (max 20)**")
-
-            if "convocati" not in st.session_state:
-                st.session_state.convocati = [""] * 20
+            st.session_state.convocati = [""] * NUM_SLOT
 
-            # Salva una copia dello stato iniziale per confronto
-            vecchi_convocati = st.session_state.convocati.copy()
-
-            for i in range(20):
-                current_player = st.session_state.convocati[i]
-
-                # Calcola occupati: tutti tranne quello corrente
-                occupati = [st.session_state.convocati[j] for j in range(20) if j != i and st.session_state.convocati[j]]
-
-                # Opzioni disponibili: tutti i giocatori meno quelli occupati
-                opzioni = [""] + [p for p in nomi_giocatori if p not in occupati or p == current_player]
+        # Editor isolato: la scelta di un giocatore non riesegue tutto lo script
+        editor_formazione(
+            "convocati", nomi_giocatori, "conv",
+            "Giocatori disponibili", "Giocatori convocati (max 20)",
+            dopo=area_non_convocati(nomi_giocatori)
+        )
+        non_convocati_text = st.session_state.non_convocati_text
 
-                cols = st.columns([0.1, 0.9])
-                with cols[0]:
-                    st.markdown(f"**{i+1}.**")
-                with cols[1]:
-                    selezionato = st.selectbox(
-                        "", options=opzioni,
-                        index=opzioni.index(current_player) if current_player in opzioni else 0,
-                        key=f"conv_select_{i}",
-                        label_visibility="collapsed"
-                    )
+        filename = f"{giornata}_{squadra_avversaria.replace(' ', '_')}.json"
+        filepath = os.path.join(dir_convocazioni_squadra, filename)
+        # Se il file non esiste ancora il salvataggio lo crea (NUOVO): la convocazione salvata
+        # nel frattempo da un altro allenatore per la stessa giornata non viene sovrascritta
+        if squadra_avversaria:
+            versione_caricata(filepath)
 
-                    # Aggiorna lo stato solo se c'è stato un cambiamento
-                    if selezionato != current_player:
-                        st.session_state.convocati[i] = selezionato
-                        st.rerun()  # Rerun immediato per ricalcolare tutti gli slot
-                
-        # Calcola i non convocati
-        non_convocati = [g for g in nomi_giocatori if g not in st.session_state.convocati]
-        
-        # Textarea per i non convocati
-        st.subheader("Giocatori non convocati")
-        non_convocati_text = st.text_area(
-            "Non convocati (separati da virgola)", 
-            value=", ".join(non_convocati),
-            height=100
-        )
-        
         # Pulsante salva
         if st.button("Salva Convocazione"):
             if not squadra_avversaria:
@@ -444,27 +593,36 @@ elif st.session_state.pagina == "dashboard":
                 }
                 
                 # Salva il file
-                filename = f"{giornata}_{squadra_avversaria.replace(' ', '_')}.json"
-                filepath = os.path.join(dir_convocazioni_squadra, filename)
-                
-                with open(filepath, "w") as f:
-                    json.dump(convocazione_data, f, indent=2, ensure_ascii=False)
-                st.success(f"Convocazione salvata correttamente in {filename}")
-
-                # Salvataggio Excel + download
-                salva_excel_convocazione(
-                    dir_path = dir_convocazioni_squadra,
-                    squadra_sel=squadra_sel,
-                    squadra_avversaria=squadra_avversaria,
-                    data_incontro=data_incontro,
-                    ora_incontro=ora_incontro,
-                    campo=denominazione_campo,
-                    ora_raduno=ora_raduno,
-                    convocati=[p for p in st.session_state.convocati if p],
-                    non_convocati=non_convocati_text,
-                    mister=nome_mister,
-                    dirigente=nome_dirigente
-                )
+                aggiungi_id_convocazione(convocazione_data)
+                if salva_con_versione(
+                    filepath, lambda v: scrivi_json(filepath, convocazione_data, squadra_sel, v, indent=2)
+                ):
+                    st.success(f"Convocazione salvata correttamente in {filename}")
+
+                    # Backend colonnare opzionale (MANAGETEAM_COLUMNAR=1)
+                    if os.environ.get("MANAGETEAM_COLUMNAR") == "1":
+                        import columnar_store
+                        if columnar_store.abilitato():
+                            columnar_store.append_convocation(squadra_sel, convocazione_data, filename[:-5])
+
+                    # Salvataggio Excel + download
+                    salva_excel_convocazione(
+                        dir_path = dir_convocazioni_squadra,
+                        squadra_sel=squadra_sel,
+                        squadra_avversaria=squadra_avversaria,
+                        data_incontro=data_incontro,
+                        ora_incontro=ora_incontro,
+                        campo=denominazione_campo,
+                        ora_raduno=ora_raduno,
+                        convocati=[p for p in st.session_state.convocati if p],
+                        non_convocati=non_convocati_text,
+                        mister=nome_mister,
+                        dirigente=nome_dirigente
+                    )
+        if squadra_avversaria:
+            avviso_conflitto(filepath)
+
+        mostra_export("export_convocazione", ("Convocazioni", squadra_sel))
 
     # Sezione per modificare una convocazione esistente
     elif st.session_state.sezione == "Modifica Convocazione":
@@ -472,10 +630,13 @@ elif st.session_state.pagina == "dashboard":
 
         dir_convocazioni_squadra = os.path.join("convocazioni", squadra_sel)
 
-        convocazioni_esistenti = [
-            f for f in os.listdir(dir_convocazioni_squadra)
-            if f.endswith(".json")
-        ]
+        if sqlite_store:
+            convocazioni_esistenti = sqlite_store.elenco_convocazioni(squadra_sel)
+        else:
+            convocazioni_esistenti = [
+                f for f in os.listdir(dir_convocazioni_squadra)
+                if f.endswith(".json")
+            ]
 
         # Ordina i file per numero di giornata all'inizio del nome
         def estrai_numero(file):
@@ -489,13 +650,27 @@ elif st.session_state.pagina == "dashboard":
         if not convocazioni_esistenti:
             st.info("Nessuna convocazione salvata per questa squadra.")
         else:
+            if st.button("📦 Esporta tutte le convocazioni in Excel (ZIP)"):
+                from export_excel import esporta_convocazioni_zip
+
+                # jobs=1: niente pool di processi (fork) dentro il server Streamlit, che ha già
+                # altri thread attivi (watcher, coda degli export, SQLite); il pool resta per cli.py
+                st.download_button(
+                    "Scarica archivio ZIP",
+                    data=esporta_convocazioni_zip([squadra_sel], jobs=1),
+                    file_name=f"Convocazioni_{squadra_sel}.zip",
+                    mime="application/zip"
+                )
+
             file_scelto = st.selectbox("Seleziona convocazione da modificare", [""] + convocazioni_esistenti)
 
             if file_scelto:  # Mostra il resto solo se un file è selezionato
                 percorso = os.path.join(dir_convocazioni_squadra, file_scelto)
 
-                with open(percorso, "r") as f:
-                    dati = json.load(f)
+                if file_scelto != st.session_state.get("convocazione_corrente"):
+                    st.session_state.pop(f"versione::{percorso}", None)
+                versione_caricata(percorso)
+                dati = sqlite_store.carica_convocazione(squadra_sel, file_scelto) if sqlite_store else load_json(percorso)
 
                 data_str, ora_str = dati["data_ora_incontro"].split("T")
                 data_incontro = datetime.strptime(data_str, "%Y-%m-%d").date()
@@ -523,61 +698,23 @@ elif st.session_state.pagina == "dashboard":
                 st.markdown("---")
                 st.subheader("Selezione Giocatori")
 
-                df_squadra = load_squad(squadra_sel)
+                df_squadra = carica_rosa(squadra_sel)
                 nomi_giocatori = df_squadra[["NOME", "COGNOME"]].apply(lambda x: f"{x['NOME']} {x['COGNOME']}", axis=1).tolist()
 
-                col_disponibili, col_convocati = st.columns([1, 1])
-
                 convocati_caricati = dati.get("componenti_squadra", [])
                 if 'convocati' not in st.session_state or file_scelto != st.session_state.get("convocazione_corrente"):
-                    st.session_state.convocati = convocati_caricati + [""] * (20 - len(convocati_caricati))
+                    st.session_state.convocati = convocati_caricati + [""] * (NUM_SLOT - len(convocati_caricati))
                     st.session_state.convocazione_corrente = file_scelto
 
-                with col_disponibili:
-                    st.markdown("**Giocatori disponibili**")
-                    convocati_attuali = [p for p in st.session_state.convocati if p]
-                    disponibili = [g for g in nomi_giocatori if g not in convocati_attuali]
-
-                    for giocatore in disponibili:
-                        if st.button(giocatore, key=f"disp_mod_{giocatore}"):
-                            for i in range(len(st.session_state.convocati)):
-                                if st.session_state.convocati[i] == "":
-                                    st.session_state.convocati[i] = giocatore
-                                    st.rerun()
-
-                with col_convocati:
-                    st.markdown("**Giocatori convocati (max 20)**")
-                    for i in range(20):
-                        current_player = st.session_state.convocati[i]
-                        occupati = [st.session_state.convocati[j] for j in range(20) if j != i and st.session_state.convocati[j]]
-                        opzioni = [""] + [p for p in nomi_giocatori if p not in occupati or p == current_player]
-
-                        cols = st.columns([0.1, 0.9])
-                        with cols[0]:
-                            st.markdown(f"**{i+1}.**")
-                        with cols[1]:
-                            selezionato = st.selectbox(
-                                "", options=opzioni,
-                                index=opzioni.index(current_player) if current_player in opzioni else 0,
-                                key=f"conv_select_mod_{i}",
-                                label_visibility="collapsed"
-                            )
-
-                            if selezionato != current_player:
-                                st.session_state.convocati[i] = selezionato
-                                st.rerun()
-
-                st.subheader("Giocatori non convocati")
-
-                convocati_attuali = [p for p in st.session_state.convocati if p]
-                non_convocati = [g for g in nomi_giocatori if g not in convocati_attuali]
-                non_convocati_text = st.text_area(
-                    "Non convocati (separati da virgola)",
-                    value=", ".join(non_convocati),
-                    height=100
+                editor_formazione(
+                    "convocati", nomi_giocatori, "conv_mod",
+                    "Giocatori disponibili", "Giocatori convocati (max 20)",
+                    dopo=area_non_convocati(nomi_giocatori)
                 )
+                non_convocati_text = st.session_state.non_convocati_text
 
                 if st.button("Salva modifiche convocazione"):
+                    data_ora_incontro = datetime.combine(data_incontro, ora_incontro).strftime("%Y-%m-%dT%H:%M")
                     nuovi_dati = {
                         "giornata": giornata,
                         "squadra": squadra_sel,
@@ -591,23 +728,27 @@ elif st.session_state.pagina == "dashboard":
                         "nome_dirigente": nome_dirigente
                     }
 
-                    with open(percorso, "w") as f:
-                        json.dump(nuovi_dati, f, indent=2, ensure_ascii=False)
-
-                    st.success("Convocazione modificata con successo!")
+                    aggiungi_id_convocazione(nuovi_dati)
+                    if salva_con_versione(percorso, lambda v: scrivi_json(percorso, nuovi_dati, squadra_sel, v, indent=2)):
+                        st.success("Convocazione modificata con successo!")
+
+                        salva_excel_convocazione(
+                            dir_path=dir_convocazioni_squadra,
+                            squadra_sel=squadra_sel,
+                            squadra_avversaria=squadra_avversaria,
+                            data_incontro=data_incontro,
+                            ora_incontro=ora_incontro,
+                            campo=denominazione_campo,
+                            ora_raduno=ora_raduno,
+                            convocati=[p for p in st.session_state.convocati if p],
+                            non_convocati=non_convocati_text,
+                            mister=nome_mister,
+                            dirigente=nome_dirigente,
+                            contesto=percorso
+                        )
 
-                    salva_excel_convocazione(
-                        squadra_sel=squadra_sel,
-                        squadra_avversaria=squadra_avversaria,
-                        data_incontro=data_incontro,
-                        ora_incontro=ora_incontro,
-                        campo=denominazione_campo,
-                        ora_raduno=ora_raduno,
-                        convocati=[p for p in st.session_state.convocati if p],
-                        non_convocati=non_convocati_text,
-                        mister=nome_mister,
-                        dirigente=nome_dirigente
-                    )
+                avviso_conflitto(percorso, ["convocazione_corrente"])
+                mostra_export("export_convocazione", percorso)
 
 
 
@@ -615,13 +756,18 @@ elif st.session_state.pagina == "dashboard":
         st.subheader("Gestione Partita")
 
         dir_conv_squadra = os.path.join("convocazioni", squadra_sel)
-        convocazioni = sorted([f for f in os.listdir(dir_conv_squadra) if f.endswith(".json")])
+        if sqlite_store:
+            convocazioni = sorted(sqlite_store.elenco_convocazioni(squadra_sel))
+        else:
+            convocazioni = sorted([f for f in os.listdir(dir_conv_squadra) if f.endswith(".json")])
 
         file_conv = st.selectbox("Seleziona convocazione", [""] + convocazioni, index=0)
 
         if file_conv:
-            with open(os.path.join(dir_conv_squadra, file_conv), "r") as f:
-                dati_conv = json.load(f)
+            if sqlite_store:
+                dati_conv = sqlite_store.carica_convocazione(squadra_sel, file_conv)
+            else:
+                dati_conv = load_json(os.path.join(dir_conv_squadra, file_conv))
 
             # Tutto il contenuto della scheda parte da qui
             st.markdown("---")
@@ -631,200 +777,220 @@ elif st.session_state.pagina == "dashboard":
             squadra_avversaria = dati_conv["squadra_avversaria"]
             giocatori_convocati = dati_conv["componenti_squadra"]
 
+            squadra_nome = squadra_avversaria.replace(" ", "_").upper()
+            nome_file = f"{giornata}_{squadra_nome}.json"
+            path_file = os.path.join("partita", squadra_sel, nome_file)
+            # Partita non ancora salvata: il salvataggio la crea (NUOVO) e non sovrascrive
+            # quella registrata nel frattempo da un altro allenatore
+            versione_caricata(path_file)
+
+            # In modalità live ogni evento viene aggiunto al registro della partita man mano che accade
+            live = st.radio("Modalità", ["Dopo la partita", "Live"], horizontal=True) == "Live"
+            if live:
+                import partita_live
+                log_path = partita_live.get_log_path(squadra_sel, nome_file[:-5])
+                stato_live = partita_live.stato_partita(log_path)
+
             col1, col2 = st.columns(2)
             with col1:
                 st.text_input("Giornata", value=str(giornata), disabled=True)
                 st.text_input("Squadra avversaria", value=squadra_avversaria, disabled=True)
                 home_away = st.selectbox("Casa/Fuori", ["Casa", "Fuori casa"])
-                risultato = st.text_input("Risultato (es. 2-1, lo scrivi come se giocassi sempre in casa)")
+                if not live:
+                    risultato = st.text_input("Risultato (es. 2-1, lo scrivi come se giocassi sempre in casa)")
             with col2:
                 recupero = st.number_input("Minuti di recupero", min_value=0, max_value=20, value=5)
 
             st.markdown("### Formazione")
 
             if "formazione" not in st.session_state:
-                st.session_state.formazione = [""] * 20
-
-            col_disp, col_form = st.columns([1, 1])
-            with col_disp:
-                st.markdown("**Convocati disponibili**")
-                occupati = [g for g in st.session_state.formazione if g]
-                disponibili = [g for g in giocatori_convocati if g not in occupati]
-                for g in disponibili:
-                    if st.button(g, key=f"disp_partita_{g}"):
-                        for i in range(20):
-                            if st.session_state.formazione[i] == "":
-                                st.session_state.formazione[i] = g
-                                st.rerun()
-
-            with col_form:
-                st.markdown("**Formazione**")
-                for i in range(20):
-                    current = st.session_state.formazione[i]
-                    opzioni = [""] + [g for g in giocatori_convocati if g not in st.session_state.formazione or g == current]
-                    cols = st.columns([0.1, 0.9])
-                    with cols[0]:
-                        st.markdown(f"{i+1}.")
-                    with cols[1]:
-                        selezionato = st.selectbox("", opzioni, index=opzioni.index(current) if current in opzioni else 0,
-                                                key=f"form_slot_{i}", label_visibility="collapsed")
-                        if selezionato != current:
-                            st.session_state.formazione[i] = selezionato
-                            st.rerun()
+                st.session_state.formazione = [""] * NUM_SLOT
+
+            if live and stato_live:
+                # A partita iniziata la formazione cambia solo con le sostituzioni registrate
+                formazione_live = [p for p in stato_live["dati"]["formazione"] if p]
+                col_campo, col_panchina = st.columns(2)
+                with col_campo:
+                    st.markdown("**In campo**")
+                    for p in formazione_live:
+                        if p in stato_live["in_campo"]:
+                            st.markdown(p)
+                with col_panchina:
+                    st.markdown("**Fuori dal campo**")
+                    for p in formazione_live:
+                        if p not in stato_live["in_campo"]:
+                            st.markdown(p)
+            else:
+                editor_formazione(
+                    "formazione", giocatori_convocati, "partita", "Convocati disponibili", "Formazione",
+                    dopo=None if live else area_sostituzioni
+                )
 
             st.markdown("---")
 
-            st.markdown("### Sostituzioni")
-
-            # Reset sostituzioni
-            if st.button("🔄 Reset sostituzioni"):
-                st.session_state.sostituzioni = []
-                st.rerun()
-
-            col_sost, _ = st.columns([1, 5])
-            with col_sost:
-                num_sost = st.number_input(
-                    "Numero di sostituzioni",
-                    min_value=0, max_value=9999, step=1,
-                    label_visibility="visible"
-    )
-            if "sostituzioni" not in st.session_state or len(st.session_state.sostituzioni) != num_sost:
-                st.session_state.sostituzioni = [{"in": "", "out": "", "minuto": ""} for _ in range(num_sost)]
-
-            # Formazione dinamica aggiornata dopo ogni sostituzione
-            formazione_dinamica = st.session_state.formazione[:11]
-            panchina_dinamica = st.session_state.formazione[11:]
-
-            for i in range(num_sost):
-                st.markdown(f"**Sostituzione {i+1}**")
-
-                # Disponibili aggiornati: nessun doppione
-                disponibili_in = [p for p in panchina_dinamica if p and p not in [s["in"] for s in st.session_state.sostituzioni[:i]]]
-                disponibili_out = [p for p in formazione_dinamica if p and p not in [s["out"] for s in st.session_state.sostituzioni[:i]]]
-
-                col_in, col_out, col_min = st.columns(3)
-
-                with col_in:
-                    st.session_state.sostituzioni[i]["in"] = st.selectbox(
-                        "Entra", [""] + disponibili_in,
-                        index=([""] + disponibili_in).index(st.session_state.sostituzioni[i]["in"]) if st.session_state.sostituzioni[i]["in"] in disponibili_in else 0,
-                        key=f"sost_in_{i}"
-                    )
-
-                with col_out:
-                    st.session_state.sostituzioni[i]["out"] = st.selectbox(
-                        "Esce", [""] + disponibili_out,
-                        index=([""] + disponibili_out).index(st.session_state.sostituzioni[i]["out"]) if st.session_state.sostituzioni[i]["out"] in disponibili_out else 0,
-                        key=f"sost_out_{i}"
-                    )
+            if live:
+                if stato_live is None:
+                    if st.button("▶️ Inizio partita"):
+                        if registra_evento_live(
+                            log_path, "inizio", giornata=giornata, squadra=squadra_nome,
+                            home_away=home_away, formazione=st.session_state.formazione
+                        ):
+                            st.rerun()
+                else:
+                    dati_live = stato_live["dati"]
+                    st.markdown(f"### Risultato: {dati_live['risultato']}")
+
+                    if not stato_live["chiusa"]:
+                        in_campo = [p for p in dati_live["formazione"] if p in stato_live["in_campo"]]
+                        # Chi è già uscito non può rientrare (vedi partita_live._valida)
+                        fuori = [
+                            p for p in dati_live["formazione"]
+                            if p and p not in stato_live["in_campo"] and p not in stato_live["espulsione"] and p not in stato_live["sub_out"]
+                        ]
+                        distinta = [p for p in dati_live["formazione"] if p]
+
+                        # Chiave stabile: il minuto scritto a mano non viene riportato a quello dell'orologio
+                        # a ogni rerun; si riallinea dopo ogni evento registrato o con il pulsante
+                        if CHIAVE_MINUTO_LIVE not in st.session_state:
+                            st.session_state[CHIAVE_MINUTO_LIVE] = partita_live.minuto_corrente(stato_live, squadra_sel)
+                        col_min, col_orologio, _ = st.columns([1, 1, 4])
+                        with col_min:
+                            minuto = st.number_input("Minuto", min_value=0, max_value=200, key=CHIAVE_MINUTO_LIVE)
+                        with col_orologio:
+                            st.button(
+                                "⏱️ Minuto attuale",
+                                on_click=lambda: st.session_state.pop(CHIAVE_MINUTO_LIVE, None),
+                            )
 
-                with col_min:
-                    min_prev = int(st.session_state.sostituzioni[i-1]["minuto"]) if i > 0 and st.session_state.sostituzioni[i-1]["minuto"].isdigit() else 0
-                    current_val = st.session_state.sostituzioni[i]["minuto"]
-                    nuovo_minuto = st.text_input("Minuto", value=current_val, key=f"sost_min_{i}")
-                    if nuovo_minuto.isdigit() and int(nuovo_minuto) < min_prev:
-                        st.warning(f"Il minuto della sostituzione {i+1} deve essere ≥ {min_prev}")
-                    st.session_state.sostituzioni[i]["minuto"] = nuovo_minuto
-
-                # Applica dinamicamente la sostituzione alla formazione
-                in_player = st.session_state.sostituzioni[i]["in"]
-                out_player = st.session_state.sostituzioni[i]["out"]
-                if in_player and out_player and out_player in formazione_dinamica:
-                    formazione_dinamica = [p if p != out_player else in_player for p in formazione_dinamica]
-                    panchina_dinamica = [p for p in panchina_dinamica if p != in_player]
+                        tab_gol, tab_subito, tab_sost, tab_amm, tab_esp = st.tabs(
+                            ["⚽ Gol", "🥅 Gol subito", "🔄 Sostituzione", "🟨 Ammonizione", "🟥 Espulsione"]
+                        )
+                        with tab_gol:
+                            marcatore = st.selectbox("Marcatore", ["autogol"] + in_campo, key="live_gol")
+                            if st.button("Registra gol") and registra_evento_live(log_path, "gol", giocatore=marcatore, minuto=minuto):
+                                st.rerun()
+                        with tab_subito:
+                            if st.button("Registra gol subito") and registra_evento_live(log_path, "gol_subito", minuto=minuto):
+                                st.rerun()
+                        with tab_sost:
+                            col_in, col_out = st.columns(2)
+                            with col_in:
+                                entra = st.selectbox("Entra", fuori, key="live_entra")
+                            with col_out:
+                                esce = st.selectbox("Esce", in_campo, key="live_esce")
+                            if st.button("Registra sostituzione") and registra_evento_live(log_path, "sostituzione", entra=entra, esce=esce, minuto=minuto):
+                                st.rerun()
+                        with tab_amm:
+                            ammonito = st.selectbox("Ammonito", distinta, key="live_ammonito")
+                            if st.button("Registra ammonizione") and registra_evento_live(log_path, "ammonizione", giocatore=ammonito, minuto=minuto):
+                                st.rerun()
+                        with tab_esp:
+                            espulso = st.selectbox("Espulso", distinta, key="live_espulso")
+                            if st.button("Registra espulsione") and registra_evento_live(log_path, "espulsione", giocatore=espulso, minuto=minuto):
+                                st.rerun()
 
-            st.markdown("---")
+                    st.markdown("### Cronaca")
+                    cronaca = partita_live.timeline(stato_live)
+                    if cronaca:
+                        st.dataframe(pd.DataFrame(cronaca).drop(columns="seq"), use_container_width=True, hide_index=True)
+                        ultimo = max(cronaca, key=lambda r: r["seq"])
+                        if not stato_live["chiusa"] and st.button(f"↩️ Annulla ultimo evento ({ultimo['evento']} {ultimo['minuto']}')"):
+                            if registra_evento_live(log_path, "annulla", evento=ultimo["seq"]):
+                                st.rerun()
+                    else:
+                        st.info("Nessun evento registrato.")
 
-            st.markdown("### Ammonizioni")
+            else:
+                st.markdown("### Ammonizioni")
 
-            if "ammoniti" not in st.session_state:
-                st.session_state.ammoniti = []
+                if "ammoniti" not in st.session_state:
+                    st.session_state.ammoniti = []
 
-            col_amm, _ = st.columns([1, 5])
-            with col_amm:
-                num_ammoniti = st.number_input(
-                    "Numero di giocatori ammoniti",
-                    min_value=0, max_value=11, step=1,
-                    label_visibility="visible")
+                col_amm, _ = st.columns([1, 5])
+                with col_amm:
+                    num_ammoniti = st.number_input(
+                        "Numero di giocatori ammoniti",
+                        min_value=0, max_value=11, step=1,
+                        label_visibility="visible")
 
 
-            # Reset automatico se cambia il numero
-            if len(st.session_state.ammoniti) != num_ammoniti:
-                st.session_state.ammoniti = [""] * num_ammoniti
+                # Reset automatico se cambia il numero
+                if len(st.session_state.ammoniti) != num_ammoniti:
+                    st.session_state.ammoniti = [""] * num_ammoniti
 
-            disponibili_ammoniti = [g for g in giocatori_convocati if g not in st.session_state.ammoniti]
+                disponibili_ammoniti = [g for g in giocatori_convocati if g not in st.session_state.ammoniti]
 
-            for i in range(num_ammoniti):
-                opzioni = [""] + [g for g in giocatori_convocati if g not in st.session_state.ammoniti or g == st.session_state.ammoniti[i]]
-                st.session_state.ammoniti[i] = st.selectbox(
-                    f"Ammonito {i+1}",
-                    options=opzioni,
-                    index=opzioni.index(st.session_state.ammoniti[i]) if st.session_state.ammoniti[i] in opzioni else 0,
-                    key=f"ammonito_{i}"
-                )
+                for i in range(num_ammoniti):
+                    opzioni = [""] + [g for g in giocatori_convocati if g not in st.session_state.ammoniti or g == st.session_state.ammoniti[i]]
+                    st.session_state.ammoniti[i] = st.selectbox(
+                        f"Ammonito {i+1}",
+                        options=opzioni,
+                        index=opzioni.index(st.session_state.ammoniti[i]) if st.session_state.ammoniti[i] in opzioni else 0,
+                        key=f"ammonito_{i}"
+                    )
 
-            st.markdown("---")
+                st.markdown("---")
 
-            st.markdown("### Espulsioni")
+                st.markdown("### Espulsioni")
 
-            if "espulsioni" not in st.session_state:
-                st.session_state.espulsioni = []
+                if "espulsioni" not in st.session_state:
+                    st.session_state.espulsioni = []
 
-            col_esp, _ = st.columns([1, 5])
-            with col_esp:
-                num_espulsioni = st.number_input(
-                    "Numero di espulsioni",
-                    min_value=0, max_value=11, step=1,
-                    label_visibility="visible")
+                col_esp, _ = st.columns([1, 5])
+                with col_esp:
+                    num_espulsioni = st.number_input(
+                        "Numero di espulsioni",
+                        min_value=0, max_value=11, step=1,
+                        label_visibility="visible")
 
-            # Inizializza/resetta se cambia il numero
-            if len(st.session_state.espulsioni) != num_espulsioni:
-                st.session_state.espulsioni = [{"giocatore": "", "minuto": ""} for _ in range(num_espulsioni)]
+                # Inizializza/resetta se cambia il numero
+                if len(st.session_state.espulsioni) != num_espulsioni:
+                    st.session_state.espulsioni = [{"giocatore": "", "minuto": ""} for _ in range(num_espulsioni)]
 
-            for i in range(num_espulsioni):
-                st.markdown(f"**Espulsione {i+1}**")
-                espulsi_precedenti = [e["giocatore"] for e in st.session_state.espulsioni[:i]]
-                opzioni = [""] + [g for g in giocatori_convocati if g not in espulsi_precedenti or g == st.session_state.espulsioni[i]["giocatore"]]
+                for i in range(num_espulsioni):
+                    st.markdown(f"**Espulsione {i+1}**")
+                    espulsi_precedenti = [e["giocatore"] for e in st.session_state.espulsioni[:i]]
+                    opzioni = [""] + [g for g in giocatori_convocati if g not in espulsi_precedenti or g == st.session_state.espulsioni[i]["giocatore"]]
 
-                col_gioc, col_min = st.columns(2)
+                    col_gioc, col_min = st.columns(2)
 
-                with col_gioc:
-                    st.session_state.espulsioni[i]["giocatore"] = st.selectbox(
-                        "Espulso",
-                        options=opzioni,
-                        index=opzioni.index(st.session_state.espulsioni[i]["giocatore"]) if st.session_state.espulsioni[i]["giocatore"] in opzioni else 0,
-                        key=f"espulsione_gioc_{i}"
-                    )
+                    with col_gioc:
+                        st.session_state.espulsioni[i]["giocatore"] = st.selectbox(
+                            "Espulso",
+                            options=opzioni,
+                            index=opzioni.index(st.session_state.espulsioni[i]["giocatore"]) if st.session_state.espulsioni[i]["giocatore"] in opzioni else 0,
+                            key=f"espulsione_gioc_{i}"
+                        )
 
-                with col_min:
-                    st.session_state.espulsioni[i]["minuto"] = st.text_input(
-                        "Minuto",
-                        value=st.session_state.espulsioni[i]["minuto"],
-                        key=f"espulsione_min_{i}"
-                    )
+                    with col_min:
+                        st.session_state.espulsioni[i]["minuto"] = st.text_input(
+                            "Minuto",
+                            value=st.session_state.espulsioni[i]["minuto"],
+                            key=f"espulsione_min_{i}"
+                        )
             
-            st.markdown("---")
+                st.markdown("---")
 
-            st.markdown("### Gol")
+                st.markdown("### Gol")
 
-            # Estrai numero gol fatti (prima del "-")
-            try:
-                gol_fatti = int(risultato.split("-")[0].strip())
-            except (IndexError, ValueError):
-                gol_fatti = 0
+                # Estrai numero gol fatti (prima del "-")
+                try:
+                    gol_fatti = int(risultato.split("-")[0].strip())
+                except (IndexError, ValueError):
+                    gol_fatti = 0
 
-            if "gol" not in st.session_state or len(st.session_state.gol) != gol_fatti:
-                st.session_state.gol = [""] * gol_fatti
+                if "gol" not in st.session_state or len(st.session_state.gol) != gol_fatti:
+                    st.session_state.gol = [""] * gol_fatti
 
-            opzioni_gol = ["autogol"] + giocatori_convocati
+                opzioni_gol = ["autogol"] + giocatori_convocati
 
-            for i in range(gol_fatti):
-                st.session_state.gol[i] = st.selectbox(
-                    f"Gol {i+1} - Marcatore",
-                    options=opzioni_gol,
-                    index=opzioni_gol.index(st.session_state.gol[i]) if st.session_state.gol[i] in opzioni_gol else 0,
-                    key=f"gol_{i}"
-                )
+                for i in range(gol_fatti):
+                    st.session_state.gol[i] = st.selectbox(
+                        f"Gol {i+1} - Marcatore",
+                        options=opzioni_gol,
+                        index=opzioni_gol.index(st.session_state.gol[i]) if st.session_state.gol[i] in opzioni_gol else 0,
+                        key=f"gol_{i}"
+                    )
 
             st.markdown("---")
             st.markdown("### Giocatori non convocati e motivazioni")
@@ -860,13 +1026,35 @@ elif st.session_state.pagina == "dashboard":
                         key=f"motivo_nonconv_{nome}"
                     )
 
+            non_convocati_motivi = [
+                {
+                    "giocatore": nome,
+                    "motivo": st.session_state.motivi_non_convocati.get(nome, "").upper()
+                }
+                for nome in st.session_state.motivi_non_convocati
+                if nome
+            ]
+
             st.markdown("---")
-            if st.button("💾 Salva partita"):
-                squadra_nome = squadra_avversaria.replace(" ", "_").upper()
-                nome_file = f"{giornata}_{squadra_nome}.json"
-                dir_partita_squadra = os.path.join("partita", squadra_sel)
-                os.makedirs(dir_partita_squadra, exist_ok=True)
-                path_file = os.path.join(dir_partita_squadra, nome_file)
+            dati_partita = None
+            if live:
+                # Il documento della partita viene scritto una sola volta, ricavato dal registro
+                if stato_live and not stato_live["chiusa"] and st.button("🏁 Fine partita"):
+                    chiusura = {}
+
+                    def chiudi(versione_attesa):
+                        chiusura["dati"], nuova = partita_live.chiudi_partita(
+                            log_path, path_file, recupero, non_convocati_motivi, versione_attesa
+                        )
+                        return nuova
+
+                    try:
+                        if salva_con_versione(path_file, chiudi):
+                            dati_partita = chiusura["dati"]
+                    except ValueError as e:
+                        st.error(str(e))
+            elif st.button("💾 Salva partita"):
+                os.makedirs(os.path.dirname(path_file), exist_ok=True)
 
                 dati_partita = {
                     "giornata": giornata,
@@ -894,142 +1082,159 @@ elif st.session_state.pagina == "dashboard":
                         if e["giocatore"] and e["minuto"].isdigit()
                     ],
                     "goal": st.session_state.gol,
-                    "non_convocati": [
-                        {
-                            "giocatore": nome,
-                            "motivo": st.session_state.motivi_non_convocati.get(nome, "").upper()
-                        }
-                        for nome in st.session_state.motivi_non_convocati
-                        if nome
-                    ]
+                    "non_convocati": non_convocati_motivi
                 }
 
-                with open(path_file, "w", encoding="utf-8") as f:
-                    json.dump(dati_partita, f, ensure_ascii=False, indent=2)
+                aggiungi_id_partita(dati_partita)
+                if not salva_con_versione(path_file, lambda v: scrivi_json(path_file, dati_partita, squadra_sel, v, indent=2)):
+                    dati_partita = None
+            avviso_conflitto(path_file)
+
+            if dati_partita is not None:
+                # Aggiorna solo le schede dei giocatori presenti in questa partita
+                from indice_giocatori import aggiorna_partita
+                aggiorna_partita(squadra_sel, nome_file)
+
+                # Backend colonnare opzionale (MANAGETEAM_COLUMNAR=1)
+                if os.environ.get("MANAGETEAM_COLUMNAR") == "1":
+                    import columnar_store
+                    if columnar_store.abilitato():
+                        data_partita = datetime.strptime(dati_conv["data_ora_incontro"], "%Y-%m-%dT%H:%M")
+                        # La partita è già salvata: un errore qui lascia solo indietro la copia colonnare
+                        try:
+                            columnar_store.append_match(squadra_sel, dati_partita, data_partita, nome_file[:-5])
+                        except Exception as e:
+                            st.warning(f"⚠️ Partita non registrata nel backend colonnare: {e}")
 
                 st.success(f"File JSON salvato in: {path_file}")
 
-                pdf_buffer = genera_pdf_partita(dati_partita)
-                st.download_button(
-                    label="📄 Scarica Report PDF",
-                    data=pdf_buffer,
-                    file_name=nome_file.replace(".json", ".pdf"),
-                    mime="application/pdf"
-                )
+                # Il PDF viene generato in background: il salvataggio ritorna subito
+                import coda_export
+
+                st.session_state.export_partita = {
+                    "lavoro": coda_export.accoda("pdf_partita", dati_partita),
+                    "contesto": path_file,
+                    "etichetta": "📄 Scarica Report PDF",
+                    "nome_file": nome_file.replace(".json", ".pdf"),
+                    "mime": "application/pdf"
+                }
+
+            mostra_export("export_partita", path_file)
+
+    elif st.session_state.sezione == "Scheda Giocatore":
+        import plotly.express as px
+        if sqlite_store:
+            from sqlite_store import elenco_giocatori, presenze_giocatore
+        else:
+            from indice_giocatori import sincronizza, elenco_giocatori, presenze_giocatore
+
+            # Vengono rilette solo le partite cambiate fuori dall'app dall'ultima visita
+            sincronizza(squadra_sel)
+        giocatori = elenco_giocatori(squadra_sel)
+
+        if not giocatori:
+            st.info("Nessuna partita registrata per questa squadra.")
+        else:
+            chiave = st.selectbox("Giocatore", list(giocatori), format_func=giocatori.get)
+            presenze = presenze_giocatore(squadra_sel, chiave)
+
+            in_distinta = [p for p in presenze if not (p["stato"] and p["stato"][0].startswith("Non Convocato"))]
+            impiegato = [p for p in in_distinta if p["minuti"] > 0]
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("📋 In distinta", len(in_distinta))
+                st.metric("⏱️ Minuti", sum(p["minuti"] for p in presenze))
+            with col2:
+                st.metric("🏃 Presenze", len(impiegato))
+                st.metric("🧤 Titolare", sum(1 for p in presenze if p["titolare"]))
+            with col3:
+                st.metric("⚽ Gol", sum(p["gol"] for p in presenze))
+                st.metric("🟨 / 🟥", f"{sum(p['ammonizioni'] for p in presenze)} / {sum(1 for p in presenze if p['minuto_espulsione'] is not None)}")
+
+            righe = [
+                {
+                    "Giornata": p["giornata"],
+                    "Avversario": p["avversario"],
+                    "Casa/Fuori": p["home_away"],
+                    "Risultato": p["risultato"],
+                    "Minuti": p["minuti"],
+                    "Gol": p["gol"],
+                    "Stato": " | ".join(p["stato"]),
+                }
+                for p in presenze
+            ]
+            st.dataframe(pd.DataFrame(righe), use_container_width=True, hide_index=True)
+
+            if impiegato:
+                with misura("grafico: minuti per giornata"):
+                    fig = px.bar(
+                        pd.DataFrame(righe),
+                        x="Giornata",
+                        y="Minuti",
+                        hover_data=["Avversario", "Risultato"],
+                        title="Minuti per giornata",
+                        height=400
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
 
     elif st.session_state.sezione == "Reportistica":
-        from calculate_minutes import main as calculate_minutes, load_match_data
+        import plotly.express as px
+        import plotly.graph_objects as go
+        from season_stats import update_aggregate, player_stats_rows, durata_partita as get_durata_partita
 
         st.markdown(f"### 📊 Statistiche Aggregate – Squadra **{squadra_sel}**")
 
-        dir_partite = os.path.join("partita", squadra_sel)
-        partite_files = [f for f in os.listdir(dir_partite) if f.endswith(".json")] if os.path.exists(dir_partite) else []
+        columnar_store = None
+        if os.environ.get("MANAGETEAM_COLUMNAR") == "1":
+            import columnar_store
+
+        if columnar_store is not None and columnar_store.abilitato():
+            # Backend colonnare: poche scansioni di colonna sulle tabelle parquet
+            aggregato = columnar_store.read_aggregate(squadra_sel)
+        elif sqlite_store:
+            # Backend SQLite: somme raggruppate sugli indici per squadra
+            aggregato = sqlite_store.read_aggregate(squadra_sel)
+        else:
+            # Aggiorna solo le partite aggiunte o modificate dall'ultimo calcolo
+            aggregato = update_aggregate(squadra_sel)
+
+        for partita_file, errore in aggregato["errori"].items():
+            st.error(f"❌ Errore processando il file {partita_file}: {errore}")
 
-        if not partite_files:
+        if not aggregato["file"]:
             st.warning("⚠️ Nessuna partita trovata per questa squadra.")
         else:
-            # Inizializza strutture per le statistiche
-            total_player_minutes = {}
-            total_player_starts = {}
-            total_player_subs_in = {}
-            total_player_subs_out = {}
-            total_player_yellow_cards = {}
-            total_player_red_cards = {}
-            total_player_goals = {}
-            total_player_matches = {}
-
-            total_yellow_cards = 0
-            total_red_cards = 0
-            total_goals = 0
-            matches_played = 0
-            total_goals_conceded = 0
+            totali_squadra = aggregato["squadra"]
+            total_yellow_cards = totali_squadra["ammonizioni"]
+            total_red_cards = totali_squadra["espulsioni"]
+            total_goals = totali_squadra["gol"]
+            matches_played = totali_squadra["partite"]
+            total_goals_conceded = totali_squadra["gol_subiti"]
 
             # Durata partita in base alla categoria
-            if squadra_sel in ["PP", "U19", "U18"] or squadra_sel.startswith("U17"):
-                durata_partita = 90
-            elif squadra_sel.startswith("U16"):
-                durata_partita = 80
-            elif squadra_sel.startswith("U15") or squadra_sel.startswith("U14"):
-                durata_partita = 70
-            else:
-                durata_partita = 0  # fallback
+            durata_partita = get_durata_partita(squadra_sel)
 
+            player_stats = player_stats_rows(aggregato, durata_partita)
 
-            for partita_file in partite_files:
-                try:
-                    partita_path = os.path.join(dir_partite, partita_file)
-                    with open(partita_path, 'r') as f:
-                        match_data = json.load(f)
-                    
-                    # Estrai i gol subiti dalla stringa risultato (es: "2-1" → prende "1")
-                    try:
-                        risultato = match_data.get("risultato", "0-0")
-                        gol_subiti = int(risultato.split("-")[1].strip())
-                    except Exception:
-                        gol_subiti = 0
-                    total_goals_conceded += gol_subiti
-
-                    player_minutes, player_status, _ = calculate_minutes(partita_path)
-                    matches_played += 1
-
-                    for player, status in player_status.items():
-                        if player not in total_player_minutes:
-                            total_player_minutes[player] = 0
-                            total_player_starts[player] = 0
-                            total_player_subs_in[player] = 0
-                            total_player_subs_out[player] = 0
-                            total_player_yellow_cards[player] = 0
-                            total_player_red_cards[player] = 0
-                            total_player_goals[player] = 0
-                            total_player_matches[player] = 0
-
-                        if player in player_minutes:
-                            total_player_minutes[player] += player_minutes[player]
-                            if player_minutes[player] > 0:
-                                total_player_matches[player] += 1
-
-                        status_parts = status.split(" | ")
-
-                        if "Titolare" in status_parts:
-                            total_player_starts[player] += 1
-                        if "Sostituito" in status_parts:
-                            total_player_subs_out[player] += 1
-                        if "Subentrato" in status_parts:
-                            total_player_subs_in[player] += 1
-                        if "Ammonito" in status_parts:
-                            total_player_yellow_cards[player] += 1
-                            total_yellow_cards += 1
-                        if "Espulso" in status_parts:
-                            total_player_red_cards[player] += 1
-                            total_red_cards += 1
-                        if "Gol" in status_parts:
-                            total_player_goals[player] += 1
-                            total_goals += 1
+            if st.button("📄 Genera libretto PDF della stagione"):
+                from report_pdf import genera_libretto_stagione
 
+                try:
+                    percorso_libretto, esclusi = genera_libretto_stagione(squadra_sel)
                 except Exception as e:
-                    st.error(f"❌ Errore processando il file {partita_file}: {str(e)}")
-
-            player_avg_minutes = {
-                player: (total_player_minutes[player] / total_player_matches[player]) if total_player_matches[player] > 0 else 0
-                for player in total_player_minutes
-            }
-
-            player_stats = [{
-                'Giocatore': player,
-                'Partite': total_player_matches[player],
-                'Minuti': total_player_minutes[player],
-                'Minuti Disponibili': total_player_matches[player] * durata_partita,
-                'Media Minuti': round(player_avg_minutes[player], 1),
-                'Titolari': total_player_starts[player],
-                'Subentri': total_player_subs_in[player],
-                'Sostituzioni': total_player_subs_out[player],
-                'Gol': total_player_goals[player],
-                'Ammonizioni': total_player_yellow_cards[player],
-                'Espulsioni': total_player_red_cards[player]
-            } for player in total_player_minutes]
-
-
-            player_stats = sorted(player_stats, key=lambda x: x['Minuti'], reverse=True)
+                    st.error(f"❌ Errore nella generazione del libretto: {e}")
+                    percorso_libretto, esclusi = None, {}
+                for partita_file, errore in esclusi.items():
+                    st.warning(f"⚠️ Partita {partita_file} esclusa dal libretto: {errore}")
+                if percorso_libretto:
+                    with open(percorso_libretto, "rb") as f:
+                        st.download_button(
+                            label="📄 Scarica libretto PDF",
+                            data=f,
+                            file_name=os.path.basename(percorso_libretto),
+                            mime="application/pdf"
+                        )
 
             st.divider()
             st.markdown("### 📈 Statistiche Generali")
@@ -1048,14 +1253,15 @@ elif st.session_state.pagina == "dashboard":
             st.divider()
             st.markdown("### 👥 Statistiche per Giocatore")
 
-            df_stats = pd.DataFrame(player_stats)
-            styled_df = df_stats.style.format({'Media Minuti': '{:.1f}'}).background_gradient(subset='Minuti', cmap='Blues')
+            with misura("tabella: statistiche giocatori (stile)"):
+                df_stats = pd.DataFrame(player_stats)
+                styled_df = df_stats.style.format({'Media Minuti': '{:.1f}'}).background_gradient(subset='Minuti', cmap='Blues')
 
-            st.dataframe(
-                styled_df,
-                use_container_width=True,
-                hide_index=True
-            )
+                st.dataframe(
+                    styled_df,
+                    use_container_width=True,
+                    hide_index=True
+                )
 
             st.divider()
 
@@ -1072,44 +1278,46 @@ elif st.session_state.pagina == "dashboard":
 
             if 2 <= len(giocatori_selezionati) <= 5:
                 metriche = ["Minuti", "Titolari", "Subentri", "Sostituzioni"]
-                fig = go.Figure()
-
-                for nome in giocatori_selezionati:
-                    g = next((p for p in player_stats if p["Giocatore"] == nome), None)
-                    if g:
-                        if visualizza_percentuale:
-                            # Calcolo percentuali
-                            minuti_disp = g["Partite"] * durata_partita if durata_partita > 0 else 1
-                            minuti_pct = (g["Minuti"] / minuti_disp) * 100 if minuti_disp else 0
-                            titolari_pct = (g["Titolari"] / g["Partite"]) * 100 if g["Partite"] else 0
-                            subentri_pct = (g["Subentri"] / g["Partite"]) * 100 if g["Partite"] else 0
-                            sostituzioni_pct = (g["Sostituzioni"] / g["Partite"]) * 100 if g["Partite"] else 0
-                            valori = [minuti_pct, titolari_pct, subentri_pct, sostituzioni_pct]
-                        else:
-                            # Valori assoluti
-                            valori = [g["Minuti"], g["Titolari"], g["Subentri"], g["Sostituzioni"]]
-
-                        fig.add_trace(go.Scatterpolar(
-                            r=valori,
-                            theta=metriche,
-                            fill='toself',
-                            name=nome
-                        ))
-
-                # Configura grafico radar
-                fig.update_layout(
-                    polar=dict(
-                        radialaxis=dict(
-                            visible=True,
-                            range=[0, 100] if visualizza_percentuale else None
-                        )
-                    ),
-                    title="Confronto Giocatori (Percentuali)" if visualizza_percentuale else "Confronto Giocatori (Valori Assoluti)",
-                    showlegend=True,
-                    height=500
-                )
+                with misura("grafico: radar"):
+                    fig = go.Figure()
+                    stats_per_nome = {p["Giocatore"]: p for p in player_stats}
+
+                    for nome in giocatori_selezionati:
+                        g = stats_per_nome.get(nome)
+                        if g:
+                            if visualizza_percentuale:
+                                # Calcolo percentuali
+                                minuti_disp = g["Partite"] * durata_partita if durata_partita > 0 else 1
+                                minuti_pct = (g["Minuti"] / minuti_disp) * 100 if minuti_disp else 0
+                                titolari_pct = (g["Titolari"] / g["Partite"]) * 100 if g["Partite"] else 0
+                                subentri_pct = (g["Subentri"] / g["Partite"]) * 100 if g["Partite"] else 0
+                                sostituzioni_pct = (g["Sostituzioni"] / g["Partite"]) * 100 if g["Partite"] else 0
+                                valori = [minuti_pct, titolari_pct, subentri_pct, sostituzioni_pct]
+                            else:
+                                # Valori assoluti
+                                valori = [g["Minuti"], g["Titolari"], g["Subentri"], g["Sostituzioni"]]
+
+                            fig.add_trace(go.Scatterpolar(
+                                r=valori,
+                                theta=metriche,
+                                fill='toself',
+                                name=nome
+                            ))
+
+                    # Configura grafico radar
+                    fig.update_layout(
+                        polar=dict(
+                            radialaxis=dict(
+                                visible=True,
+                                range=[0, 100] if visualizza_percentuale else None
+                            )
+                        ),
+                        title="Confronto Giocatori (Percentuali)" if visualizza_percentuale else "Confronto Giocatori (Valori Assoluti)",
+                        showlegend=True,
+                        height=500
+                    )
 
-                st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(fig, use_container_width=True)
 
             elif len(giocatori_selezionati) == 1:
                 st.info("⚠️ Seleziona almeno 2 giocatori per visualizzare il grafico radar.")
@@ -1132,47 +1340,140 @@ elif st.session_state.pagina == "dashboard":
             )
 
             # Crea DataFrame base
-            df_plot = pd.DataFrame(player_stats)
-            df_plot["Giocatore"] = df_plot["Giocatore"].fillna("Sconosciuto")
-
-            # Visualizzazione grafico scelto
-            if grafico_scelto == "⏱️ Minuti Giocati vs Minuti Disponibili":
-                fig = px.bar(
-                    df_plot,
-                    x="Giocatore",
-                    y=["Minuti", "Minuti Disponibili"],
-                    barmode="group",
-                    labels={"value": "Minuti", "variable": "Tipo"},
-                    title="Minuti Giocati vs Minuti Disponibili",
-                    color_discrete_map={"Minuti": "steelblue", "Minuti Disponibili": "lightgray"},
-                    height=500
-                )
+            with misura("grafico: confronto giocatori"):
+                df_plot = pd.DataFrame(player_stats)
+                df_plot["Giocatore"] = df_plot["Giocatore"].fillna("Sconosciuto")
+
+                # Visualizzazione grafico scelto
+                if grafico_scelto == "⏱️ Minuti Giocati vs Minuti Disponibili":
+                    fig = px.bar(
+                        df_plot,
+                        x="Giocatore",
+                        y=["Minuti", "Minuti Disponibili"],
+                        barmode="group",
+                        labels={"value": "Minuti", "variable": "Tipo"},
+                        title="Minuti Giocati vs Minuti Disponibili",
+                        color_discrete_map={"Minuti": "steelblue", "Minuti Disponibili": "lightgray"},
+                        height=500
+                    )
 
-            elif grafico_scelto == "🧤 Titolare vs Totale Partite":
-                fig = px.bar(
-                    df_plot,
-                    x="Giocatore",
-                    y=["Titolari", "Partite"],
-                    barmode="group",
-                    labels={"value": "Numero", "variable": "Tipo"},
-                    title="Partite da Titolare vs Totali",
-                    color_discrete_map={"Titolari": "green", "Partite": "gray"},
-                    height=500
-                )
+                elif grafico_scelto == "🧤 Titolare vs Totale Partite":
+                    fig = px.bar(
+                        df_plot,
+                        x="Giocatore",
+                        y=["Titolari", "Partite"],
+                        barmode="group",
+                        labels={"value": "Numero", "variable": "Tipo"},
+                        title="Partite da Titolare vs Totali",
+                        color_discrete_map={"Titolari": "green", "Partite": "gray"},
+                        height=500
+                    )
 
-            elif grafico_scelto == "🔁 Subentrato vs Totale Partite":
-                fig = px.bar(
-                    df_plot,
-                    x="Giocatore",
-                    y=["Subentri", "Partite"],
-                    barmode="group",
-                    labels={"value": "Numero", "variable": "Tipo"},
-                    title="Subentri vs Partite Giocate",
-                    color_discrete_map={"Subentri": "orange", "Partite": "gray"},
-                    height=500
-                )
+                elif grafico_scelto == "🔁 Subentrato vs Totale Partite":
+                    fig = px.bar(
+                        df_plot,
+                        x="Giocatore",
+                        y=["Subentri", "Partite"],
+                        barmode="group",
+                        labels={"value": "Numero", "variable": "Tipo"},
+                        title="Subentri vs Partite Giocate",
+                        color_discrete_map={"Subentri": "orange", "Partite": "gray"},
+                        height=500
+                    )
+
+                fig.update_layout(xaxis_tickangle=-45)
+                st.plotly_chart(fig, use_container_width=True)
 
-            fig.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig, use_container_width=True)
+            st.divider()
+
+            st.markdown("### 🤝 Coppie e Formazioni")
 
+            from analisi_formazioni import analizza_squadra as analizza_formazioni, on_off_rows, coppie_rows, formazioni_rows
+
+            analisi = analizza_formazioni(squadra_sel)
+            for partita_file, errore in analisi["errori"].items():
+                st.warning(f"⚠️ Partita {partita_file} esclusa dall'analisi delle formazioni: {errore}")
+            st.caption(
+                "I gol senza minuto (partite non registrate in modalità live) sono distribuiti "
+                "in proporzione ai minuti giocati da ciascuna formazione."
+            )
 
+            tab_on_off, tab_coppie, tab_unita = st.tabs(["➕➖ In campo / Fuori", "👬 Coppie", "🧩 Formazioni"])
+
+            with tab_on_off:
+                st.dataframe(pd.DataFrame(on_off_rows(analisi)), use_container_width=True, hide_index=True)
+
+            with tab_coppie:
+                minuti_minimi = st.slider("Minuti minimi insieme", min_value=0, max_value=analisi["durata"] * 10, value=analisi["durata"] * 2, step=10)
+                righe_coppie = coppie_rows(analisi, minuti_minimi)
+                if righe_coppie:
+                    st.dataframe(pd.DataFrame(righe_coppie), use_container_width=True, hide_index=True)
+                else:
+                    st.info("Nessuna coppia con abbastanza minuti insieme.")
+
+                with misura("grafico: minuti insieme"):
+                    fig = px.imshow(
+                        analisi["minuti"],
+                        x=analisi["giocatori"],
+                        y=analisi["giocatori"],
+                        color_continuous_scale="Blues",
+                        labels={"color": "Minuti insieme"},
+                        title="Minuti giocati insieme",
+                        height=700
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+
+            with tab_unita:
+                righe_unita = formazioni_rows(analisi, minuti_minimi=analisi["durata"] // 4)
+                if righe_unita:
+                    st.dataframe(pd.DataFrame(righe_unita), use_container_width=True, hide_index=True)
+                else:
+                    st.info("Nessuna formazione rimasta in campo abbastanza a lungo.")
+
+    elif st.session_state.sezione == "Report Società":
+        from season_stats import aggregate_club, club_player_rows
+
+        st.markdown("### 🏟️ Statistiche Aggregate – Tutte le squadre")
+
+        # Aggiorna in parallelo gli aggregati di tutte le squadre
+        aggregati, giocatori_societa = aggregate_club(nomi_squadre)
+
+        for squadra, aggregato in aggregati.items():
+            for partita_file, errore in aggregato["errori"].items():
+                st.error(f"❌ Errore processando il file {squadra}/{partita_file}: {errore}")
+
+        riepilogo_squadre = [{
+            'Squadra': squadra,
+            'Partite': aggregato["squadra"]["partite"],
+            'Gol': aggregato["squadra"]["gol"],
+            'Gol subiti': aggregato["squadra"]["gol_subiti"],
+            'Ammonizioni': aggregato["squadra"]["ammonizioni"],
+            'Espulsioni': aggregato["squadra"]["espulsioni"]
+        } for squadra, aggregato in aggregati.items() if aggregato["file"]]
+
+        if not riepilogo_squadre:
+            st.warning("⚠️ Nessuna partita trovata per nessuna squadra.")
+        else:
+            st.dataframe(pd.DataFrame(riepilogo_squadre), use_container_width=True, hide_index=True)
+
+            st.divider()
+            st.markdown("### 👥 Statistiche per Giocatore (tutte le squadre)")
+
+            solo_multi = st.toggle("Solo giocatori impiegati in più squadre")
+            righe = club_player_rows(giocatori_societa)
+            if solo_multi:
+                righe = [r for r in righe if "," in r["Squadre"]]
+
+            if righe:
+                st.dataframe(pd.DataFrame(righe), use_container_width=True, hide_index=True)
+            elif solo_multi:
+                st.info("Nessun giocatore impiegato in più squadre.")
+            else:
+                st.info("Nessun giocatore registrato nelle partite della società.")
+
+if profilazione.ABILITATO:
+    # I rerun di tutte le sessioni finiscono nello storico; il pannello lo vede solo l'amministratore
+    etichetta_rerun = st.session_state.sezione if st.session_state.pagina == "dashboard" else "Home"
+    rerun_profilato = profilazione.fine_rerun(etichetta_rerun)
+    if amministratore():
+        pannello_performance(rerun_profilato, etichetta_rerun)
@@ -0,0 +1,153 @@
+"""
+Import cost of each app.py section, measured in fresh interpreters
+
+Uso:
+    python benchmarks/bench_startup.py                      # stampa JSON
+    python benchmarks/bench_startup.py --output base.json
+    python benchmarks/bench_startup.py --confronta base.json --tolleranza 25
+
+Con --confronta esce con codice 1 se una sezione è più lenta del riferimento
+oltre la tolleranza (in percentuale).
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_PATH = os.path.join(ROOT, "app.py")
+
+
+def moduli_avvio(path=APP_PATH):
+    """
+    Modules imported at module level by app.py, in order
+
+    Imports inside top-level if blocks (backend, watcher) are followed
+    according to the current environment, as on a real start; imports
+    inside functions belong to the sections.
+
+    Returns:
+        list[str]: Module names
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        albero = ast.parse(f.read(), filename=path)
+
+    moduli = []
+
+    def visita(istruzioni):
+        for nodo in istruzioni:
+            if isinstance(nodo, ast.Import):
+                moduli.extend(alias.name for alias in nodo.names)
+            elif isinstance(nodo, ast.ImportFrom) and nodo.module and not nodo.level:
+                moduli.append(nodo.module)
+            elif isinstance(nodo, ast.If):
+                # Le condizioni a livello di modulo leggono solo os.environ
+                try:
+                    vero = eval(compile(ast.Expression(nodo.test), path, "eval"), {"os": os})
+                except Exception:
+                    continue
+                visita(nodo.body if vero else nodo.orelse)
+
+    visita(albero.body)
+    return list(dict.fromkeys(moduli))
+
+
+# Moduli importati all'avvio dello script, comuni a tutte le pagine: ricavati da app.py
+# così il benchmark segue gli import aggiunti in cima allo script
+BASE = moduli_avvio()
+
+# Moduli aggiuntivi importati da ciascuna sezione di app.py
+SEZIONI = {
+    "Home": [],
+    "Squadra": ["pandas", "streamlit_extras.add_vertical_space"],
+    "Presenze": ["pandas", "streamlit_extras.add_vertical_space", "presenze_store", "presenze_matrice"],
+    "Analisi Presenze": ["pandas", "streamlit_extras.add_vertical_space", "plotly.express", "analisi_presenze"],
+    "Convocazioni": ["pandas", "streamlit_extras.add_vertical_space", "export_excel", "openpyxl"],
+    "Partita": ["pandas", "streamlit_extras.add_vertical_space", "report_pdf"],
+    "Scheda Giocatore": ["pandas", "streamlit_extras.add_vertical_space", "plotly.express", "indice_giocatori"],
+    "Reportistica": [
+        "pandas", "streamlit_extras.add_vertical_space", "plotly.express", "plotly.graph_objects",
+        "season_stats", "matplotlib", "analisi_formazioni"
+    ],
+}
+
+_SCRIPT = """
+import importlib, json, sys, time
+base, extra = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+t0 = time.perf_counter()
+for m in base:
+    importlib.import_module(m)
+t1 = time.perf_counter()
+for m in extra:
+    importlib.import_module(m)
+t2 = time.perf_counter()
+print(json.dumps({"base": t1 - t0, "sezione": t2 - t1}))
+"""
+
+
+def misura_sezione(moduli, ripetizioni):
+    """
+    Median import time of a section in fresh interpreters
+
+    Returns:
+        dict: {"base": seconds, "sezione": seconds, "totale": seconds}
+    """
+    campioni = []
+    for _ in range(ripetizioni):
+        out = subprocess.run(
+            [sys.executable, "-c", _SCRIPT, json.dumps(BASE), json.dumps(moduli)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        campioni.append(json.loads(out))
+
+    base = statistics.median(c["base"] for c in campioni)
+    sezione = statistics.median(c["sezione"] for c in campioni)
+    return {"base": round(base, 4), "sezione": round(sezione, 4), "totale": round(base + sezione, 4)}
+
+
+def confronta(risultati, riferimento, tolleranza):
+    """Sections slower than the reference by more than tolleranza percent"""
+    regressioni = []
+    for sezione, valori in risultati.items():
+        rif = riferimento.get("sezioni", {}).get(sezione)
+        if rif and valori["totale"] > rif["totale"] * (1 + tolleranza / 100):
+            regressioni.append((sezione, rif["totale"], valori["totale"]))
+    return regressioni
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dei tempi di import per sezione di app.py")
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--output", help="Salva i risultati JSON su file")
+    parser.add_argument("--confronta", help="File JSON di riferimento")
+    parser.add_argument("--tolleranza", type=float, default=20.0, help="Regressione ammessa in percentuale")
+    args = parser.parse_args(argv)
+
+    risultati = {
+        "python": sys.version.split()[0],
+        "base": BASE,
+        "sezioni": {sezione: misura_sezione(moduli, args.ripetizioni) for sezione, moduli in SEZIONI.items()},
+    }
+
+    testo = json.dumps(risultati, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(testo)
+    print(testo)
+
+    if args.confronta:
+        with open(args.confronta, "r") as f:
+            riferimento = json.load(f)
+        regressioni = confronta(risultati["sezioni"], riferimento, args.tolleranza)
+        for sezione, prima, dopo in regressioni:
+            print(f"REGRESSIONE {sezione}: {prima:.3f}s -> {dopo:.3f}s", file=sys.stderr)
+        return 1 if regressioni else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
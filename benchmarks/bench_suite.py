@@ -0,0 +1,244 @@
+"""
+Timing of the app's hot paths on a synthetic archive (see genera_stagione.py)
+
+The archive is generated in a temporary directory, which becomes the working
+directory while the benchmarks run: the app's modules use relative paths.
+
+Uso:
+    python benchmarks/bench_suite.py                                  # stampa JSON
+    python benchmarks/bench_suite.py --squadre 11 --stagioni 10 --partite 40 --output base.json
+    python benchmarks/bench_suite.py --confronta base.json --tolleranza 25
+
+Con --confronta esce con codice 1 se un caso è più lento del riferimento
+oltre la tolleranza (in percentuale), confrontando le mediane.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from genera_stagione import genera  # noqa: E402
+
+
+def misura(funzione, ripetizioni, prepara=None):
+    """
+    Median and best wall time of a function
+
+    Args:
+        funzione (callable): Code to time, called without arguments
+        ripetizioni (int): Number of timed runs
+        prepara (callable): Called before every run, not timed (e.g. to drop caches)
+
+    Returns:
+        dict: {"mediana": seconds, "minimo": seconds, "ripetizioni": int}
+    """
+    tempi = []
+    for _ in range(ripetizioni):
+        if prepara:
+            prepara()
+        t0 = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - t0)
+    return {"mediana": round(statistics.median(tempi), 6), "minimo": round(min(tempi), 6), "ripetizioni": ripetizioni}
+
+
+def esegui_casi(squadre, ripetizioni, campione=20):
+    """
+    Run every benchmark in the current working directory
+
+    Args:
+        squadre (list): Squad codes present in the archive
+        ripetizioni (int): Timed runs per case
+        campione (int): Matches and convocations used for the PDF/XLSX cases
+
+    Returns:
+        dict: Case name -> misura result, plus "per_elemento" (seconds per
+            match, month or document) where it applies
+    """
+    import season_stats
+    from calculate_minutes import calculate_player_minutes, get_player_status
+    from export_excel import convocazione_xlsx_da_json
+    from file_cache import invalidate, load_json
+    from presenze_store import load_presenze, save_presenze_mese
+    from report_pdf import genera_pdf_partita
+
+    partite = sorted(glob.glob(os.path.join("partita", "*", "*.json")))
+    dati_partite = [load_json(p) for p in partite]
+    casi = {}
+
+    def per_elemento(nome, n):
+        casi[nome]["per_elemento"] = round(casi[nome]["mediana"] / max(n, 1), 9)
+
+    def tutte(funzione):
+        return lambda: [funzione(dati) for dati in dati_partite]
+
+    casi["calculate_player_minutes"] = misura(tutte(calculate_player_minutes), ripetizioni)
+    per_elemento("calculate_player_minutes", len(dati_partite))
+    casi["get_player_status"] = misura(tutte(get_player_status), ripetizioni)
+    per_elemento("get_player_status", len(dati_partite))
+
+    # Reportistica: aggregato di stagione e tabella giocatori, per ogni squadra
+    def reportistica():
+        for squadra in squadre:
+            aggregato = season_stats.update_aggregate(squadra)
+            season_stats.player_stats_rows(aggregato, season_stats.durata_partita(squadra))
+
+    def azzera_aggregati():
+        season_stats._aggregati.clear()
+        shutil.rmtree(season_stats.dir_cache_stats, ignore_errors=True)
+        invalidate()
+
+    casi["reportistica_freddo"] = misura(reportistica, ripetizioni, prepara=azzera_aggregati)
+    per_elemento("reportistica_freddo", len(dati_partite))
+    reportistica()
+    casi["reportistica_caldo"] = misura(reportistica, ripetizioni)
+
+    def modifica_partita():
+        # Una partita salvata di nuovo: l'aggiornamento rilegge solo quella
+        path = partite[-1]
+        with open(path, "r", encoding="utf-8") as f:
+            dati = json.load(f)
+        dati["recupero"] = (dati.get("recupero", 0) + 1) % 7
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(dati, f, indent=2, ensure_ascii=False)
+        invalidate(path)
+
+    casi["reportistica_incrementale"] = misura(reportistica, ripetizioni, prepara=modifica_partita)
+
+    # Backend SQLite: importazione di tutto l'archivio, poi la stessa reportistica con query indicizzate
+    import sqlite_store
+
+    def azzera_sqlite():
+        sqlite_store.chiudi()
+        for suffisso in ("", "-wal", "-shm"):
+            if os.path.exists(sqlite_store.DB_PATH + suffisso):
+                os.remove(sqlite_store.DB_PATH + suffisso)
+
+    casi["sqlite_importa"] = misura(sqlite_store.connessione, ripetizioni, prepara=azzera_sqlite)
+    per_elemento("sqlite_importa", len(dati_partite))
+    casi["sqlite_reportistica"] = misura(
+        lambda: [sqlite_store.read_aggregate(squadra) for squadra in squadre], ripetizioni
+    )
+
+    # Presenze: archivio completo letto dal disco, poi un mese riscritto per squadra
+    mesi = sum(len(glob.glob(os.path.join("presenze", squadra, "*.json"))) for squadra in squadre)
+    casi["load_presenze"] = misura(
+        lambda: [load_presenze(squadra) for squadra in squadre], ripetizioni, prepara=invalidate
+    )
+    per_elemento("load_presenze", mesi)
+
+    ultimi_mesi = {}
+    for squadra in squadre:
+        archivio = load_presenze(squadra)
+        if archivio:
+            ultimo = max(archivio)
+            ultimi_mesi[squadra] = (ultimo, archivio[ultimo])
+    casi["save_presenze"] = misura(
+        lambda: [save_presenze_mese(squadra, mese, dati) for squadra, (mese, dati) in ultimi_mesi.items()],
+        ripetizioni
+    )
+    per_elemento("save_presenze", len(ultimi_mesi))
+
+    # Export: stesso lavoro del pulsante di download (PDF) e di salva_excel_convocazione (XLSX)
+    logo = os.path.join(ROOT, "static", "logo.png")
+    campione_partite = dati_partite[:campione]
+    casi["genera_pdf_partita"] = misura(
+        lambda: [genera_pdf_partita(dati, logo_path=logo) for dati in campione_partite], ripetizioni
+    )
+    per_elemento("genera_pdf_partita", len(campione_partite))
+
+    modello = os.path.join(ROOT, "Convocazione.xlsx")
+    if os.path.exists(modello):
+        convocazioni = [load_json(p) for p in sorted(glob.glob(os.path.join("convocazioni", "*", "*.json")))[:campione]]
+        dir_export = os.path.join("export", "convocazioni")
+        os.makedirs(dir_export, exist_ok=True)
+
+        def esporta():
+            for dati in convocazioni:
+                nome_file, contenuto = convocazione_xlsx_da_json(dati, modello_path=modello)
+                with open(os.path.join(dir_export, nome_file), "wb") as f:
+                    f.write(contenuto)
+
+        casi["salva_excel_convocazione"] = misura(esporta, ripetizioni)
+        per_elemento("salva_excel_convocazione", len(convocazioni))
+
+    return casi
+
+
+def confronta(casi, riferimento, tolleranza):
+    """Cases slower than the reference by more than tolleranza percent"""
+    regressioni = []
+    for nome, valori in casi.items():
+        rif = riferimento.get("casi", {}).get(nome)
+        if rif and valori["mediana"] > rif["mediana"] * (1 + tolleranza / 100):
+            regressioni.append((nome, rif["mediana"], valori["mediana"]))
+    return regressioni
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark delle funzioni principali su un archivio sintetico")
+    parser.add_argument("--squadre", type=int, default=11)
+    parser.add_argument("--stagioni", type=int, default=10)
+    parser.add_argument("--partite", type=int, default=40, help="Partite per stagione")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--dir", help="Usa (e conserva) questa cartella invece di una temporanea")
+    parser.add_argument("--output", help="Salva i risultati JSON su file")
+    parser.add_argument("--confronta", help="File JSON di riferimento")
+    parser.add_argument("--tolleranza", type=float, default=20.0, help="Regressione ammessa in percentuale")
+    args = parser.parse_args(argv)
+
+    from core import nomi_squadre
+
+    destinazione = args.dir or tempfile.mkdtemp(prefix="manageteam-bench-")
+    output = os.path.abspath(args.output) if args.output else None
+    riferimento_path = os.path.abspath(args.confronta) if args.confronta else None
+    cwd = os.getcwd()
+    try:
+        t0 = time.perf_counter()
+        conteggi = genera(destinazione, args.squadre, args.stagioni, args.partite, seed=args.seed)
+        generazione = time.perf_counter() - t0
+
+        os.chdir(destinazione)
+        casi = esegui_casi(nomi_squadre[:args.squadre], args.ripetizioni)
+    finally:
+        os.chdir(cwd)
+        if not args.dir:
+            shutil.rmtree(destinazione, ignore_errors=True)
+
+    risultati = {
+        "python": sys.version.split()[0],
+        "scala": {"squadre": args.squadre, "stagioni": args.stagioni, "partite": args.partite, "seed": args.seed},
+        "archivio": conteggi,
+        "generazione": round(generazione, 3),
+        "casi": casi,
+    }
+
+    testo = json.dumps(risultati, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(testo)
+    print(testo)
+
+    if riferimento_path:
+        with open(riferimento_path, "r") as f:
+            riferimento = json.load(f)
+        if riferimento.get("scala") != risultati["scala"]:
+            print("ATTENZIONE: il riferimento è stato misurato con una scala diversa", file=sys.stderr)
+        regressioni = confronta(casi, riferimento, args.tolleranza)
+        for nome, prima, dopo in regressioni:
+            print(f"REGRESSIONE {nome}: {prima:.4f}s -> {dopo:.4f}s", file=sys.stderr)
+        return 1 if regressioni else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
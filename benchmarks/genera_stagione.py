@@ -0,0 +1,233 @@
+"""
+Synthetic squads, attendance, convocations and matches for benchmarks
+
+The files have the same layout and shape as the ones written by app.py
+(roster CSV, monthly attendance, convocation and match JSON with id fields),
+including the real data's mix of "COGNOME Nome" and "Nome COGNOME" spellings.
+Seasons are stored one after the other in the same squad directories, with
+giornata numbers continuing across seasons.
+
+Uso:
+    python benchmarks/genera_stagione.py DESTINAZIONE --squadre 11 --stagioni 10 --partite 40
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core import nomi_squadre  # noqa: E402
+
+NOMI = [
+    "Alessandro", "Andrea", "Davide", "Edoardo", "Emanuele", "Filippo", "Francesco", "Gabriele", "Giacomo",
+    "Giovanni", "Jacopo", "Leonardo", "Lorenzo", "Luca", "Marco", "Matteo", "Mattia", "Michele", "Nicolò",
+    "Pietro", "Riccardo", "Samuele", "Simone", "Tommaso", "Valerio",
+]
+COGNOMI = [
+    "BIANCHI", "BRUNO", "CARUSO", "COLOMBO", "CONTI", "COSTA", "DE LUCA", "ESPOSITO", "FERRARI", "FONTANA",
+    "GALLO", "GRECO", "LOMBARDI", "LO PICCOLO", "MANCINI", "MARINO", "MORETTI", "RICCI", "RINALDI", "ROMANO",
+    "RUSSO", "SANTORO", "VILLA", "DI STEFANO", "PELLEGRINI", "GENTILI", "MARCHETTI", "SERRA", "FARINA", "CAU",
+]
+AVVERSARI = [
+    "TOR SAPIENZA", "SORATTE", "SVS ROMA", "MENTANA", "VICOVARO", "GUIDONIA", "TOR LUPARA", "SETTEVILLE CASEROSSE",
+    "VIRTUS PIONIERI", "FUTBOL TALENTI", "ULTRON VILLALBA", "LEDESMA ACADEMY", "ACCADEMIA SPORTING ROMA",
+]
+MOTIVI = ["SCELTA TECNICA", "NON DISPONIBILE", "INFORTUNATO", "SQUALIFICATO"]
+RUOLI = ["P", "D", "C", "A"]
+
+# Anno di inizio dell'ultima stagione generata: fisso, così lo stesso seed dà sempre gli stessi file
+ULTIMA_STAGIONE = 2024
+
+# Codici presenza con frequenze simili ai dati reali (vedi presenze_matrice.CODICI)
+CODICI_PRESENZA = ["P"] * 14 + ["AI", "MS", "ML", "I", "MP", ""]
+
+
+def genera_rosa(rng, squadra, n_giocatori, anno):
+    """
+    Roster rows as in squadre/<squadra>.csv (NOME holds the surname)
+
+    Returns:
+        list: Dictionaries with NOME, COGNOME, ANNO, RUOLO
+    """
+    usati = set()
+    righe = []
+    while len(righe) < n_giocatori:
+        cognome, nome = rng.choice(COGNOMI), rng.choice(NOMI)
+        if (cognome, nome) in usati:
+            continue
+        usati.add((cognome, nome))
+        righe.append({"NOME": cognome, "COGNOME": nome, "ANNO": anno, "RUOLO": rng.choice(RUOLI)})
+    return righe
+
+
+def _nome_rosa(riga):
+    return f"{riga['NOME']} {riga['COGNOME']}"
+
+
+def _nome_partita(riga):
+    # Nei file delle partite il nome è scritto "Nome COGNOME"
+    return f"{riga['COGNOME']} {riga['NOME']}"
+
+
+def genera_partita(rng, rosa, giornata, avversario, durata):
+    """
+    One match document as saved by the Partita section
+
+    Substitutions follow the stored convention: 'sub_in' goes off and
+    'sub_out' comes on.
+    """
+    convocati = rng.sample(rosa, min(len(rosa), 20))
+    formazione = [_nome_partita(r) for r in convocati]
+    titolari, panchina = formazione[:11], formazione[11:]
+
+    in_campo = list(titolari)
+    substitutions = []
+    entrano = rng.sample(panchina, min(len(panchina), rng.randint(3, 5)))
+    minuti = sorted(rng.randint(durata // 2, durata - 2) for _ in entrano)
+    for entra, minuto in zip(entrano, minuti):
+        esce = rng.choice(in_campo)
+        in_campo[in_campo.index(esce)] = entra
+        substitutions.append({"sub_in": esce, "sub_out": entra, "time_sub": minuto})
+
+    espulsioni = []
+    if rng.random() < 0.1:
+        espulsioni.append({"esp_player": rng.choice(titolari), "time_esp": rng.randint(10, durata)})
+
+    gol_fatti, gol_subiti = rng.randint(0, 4), rng.randint(0, 3)
+    goal = [rng.choice(in_campo) if rng.random() < 0.95 else "autogol" for _ in range(gol_fatti)]
+
+    esclusi = [r for r in rosa if r not in convocati]
+    return {
+        "giornata": giornata,
+        "squadra": avversario,
+        "home_away": rng.choice(["Casa", "Trasferta"]),
+        "risultato": f"{gol_fatti}-{gol_subiti}",
+        "recupero": rng.randint(0, 6),
+        "formazione": formazione + [""] * (20 - len(formazione)),
+        "substitutions": substitutions,
+        "ammonizioni": rng.sample(formazione, rng.randint(0, 3)),
+        "espulsioni": espulsioni,
+        "goal": goal,
+        "non_convocati": [{"giocatore": _nome_partita(r), "motivo": rng.choice(MOTIVI)} for r in esclusi],
+    }
+
+
+def genera_convocazione(rng, squadra, rosa, giornata, avversario, giorno):
+    convocati = rng.sample(rosa, min(len(rosa), 20))
+    return {
+        "giornata": giornata,
+        "squadra": squadra,
+        "squadra_avversaria": avversario,
+        "data_ora_incontro": f"{giorno.isoformat()}T15:30",
+        "denominazione_campo": f"Campo {avversario.title()}",
+        "ora_raduno": "14:15",
+        "componenti_squadra": [_nome_rosa(r) for r in convocati],
+        "non_convocati": ", ".join(_nome_rosa(r) for r in rosa if r not in convocati),
+        "nome_mister": "",
+        "nome_dirigente": "",
+    }
+
+
+def genera_presenze_mese(rng, rosa, anno, mese):
+    """Three training days a week, {"dd/mm": {player: code}}"""
+    giorno = date(anno, mese, 1)
+    dati_mese = {}
+    while giorno.month == mese:
+        if giorno.weekday() in (0, 2, 4):
+            dati_mese[giorno.strftime("%d/%m")] = {_nome_rosa(r): rng.choice(CODICI_PRESENZA) for r in rosa}
+        giorno += timedelta(days=1)
+    return dati_mese
+
+
+def _scrivi_json(path, dati):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dati, f, indent=2, ensure_ascii=False)
+
+
+def genera(destinazione, squadre=11, stagioni=10, partite=40, giocatori=24, seed=0):
+    """
+    Write a synthetic club archive under destinazione
+
+    Args:
+        destinazione (str): Target directory (becomes the app's working directory)
+        squadre (int): Number of squads, taken from core.nomi_squadre
+        stagioni (int): Seasons per squad, September to June
+        partite (int): Matches (and convocations) per season
+        giocatori (int): Roster size
+        seed (int): Random seed, same seed gives the same files
+
+    Returns:
+        dict: Counts of the generated files
+    """
+    from anagrafica import aggiungi_id_convocazione, aggiungi_id_partita, sincronizza_squadra
+    from presenze_store import save_presenze_mese
+    from season_stats import durata_partita
+
+    rng = random.Random(seed)
+    destinazione = os.path.abspath(destinazione)
+    os.makedirs(destinazione, exist_ok=True)
+    cwd = os.getcwd()
+    # I moduli dell'app usano percorsi relativi (partita/, squadre/, ...)
+    os.chdir(destinazione)
+    conteggi = {"squadre": 0, "partite": 0, "convocazioni": 0, "mesi_presenze": 0}
+    try:
+        os.makedirs("squadre", exist_ok=True)
+        for squadra in nomi_squadre[:squadre]:
+            durata = durata_partita(squadra) or 80
+            rosa = genera_rosa(rng, squadra, giocatori, ULTIMA_STAGIONE - 15)
+            with open(os.path.join("squadre", f"{squadra}.csv"), "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=["NOME", "COGNOME", "ANNO", "RUOLO"], delimiter=";")
+                writer.writeheader()
+                writer.writerows(rosa)
+            sincronizza_squadra(squadra)
+            conteggi["squadre"] += 1
+
+            for stagione in range(stagioni):
+                anno = ULTIMA_STAGIONE - stagioni + 1 + stagione
+                mesi = [(anno, m) for m in range(9, 13)] + [(anno + 1, m) for m in range(1, 7)]
+                for anno_mese, mese in mesi:
+                    dati_mese = genera_presenze_mese(rng, rosa, anno_mese, mese)
+                    save_presenze_mese(squadra, f"{anno_mese}-{mese:02d}", dati_mese)
+                    conteggi["mesi_presenze"] += 1
+
+                inizio = date(anno, 9, 7)
+                for g in range(partite):
+                    giornata = stagione * partite + g + 1
+                    avversario = rng.choice(AVVERSARI)
+                    nome_file = f"{giornata}_{avversario.replace(' ', '_')}.json"
+                    giorno = inizio + timedelta(days=7 * g)
+
+                    convocazione = genera_convocazione(rng, squadra, rosa, giornata, avversario, giorno)
+                    _scrivi_json(os.path.join("convocazioni", squadra, nome_file), aggiungi_id_convocazione(convocazione))
+                    partita = genera_partita(rng, rosa, giornata, avversario, durata)
+                    _scrivi_json(os.path.join("partita", squadra, nome_file), aggiungi_id_partita(partita))
+                    conteggi["convocazioni"] += 1
+                    conteggi["partite"] += 1
+    finally:
+        os.chdir(cwd)
+    return conteggi
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un archivio sintetico di squadre e partite")
+    parser.add_argument("destinazione")
+    parser.add_argument("--squadre", type=int, default=11)
+    parser.add_argument("--stagioni", type=int, default=10)
+    parser.add_argument("--partite", type=int, default=40, help="Partite per stagione")
+    parser.add_argument("--giocatori", type=int, default=24, help="Giocatori per rosa")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    conteggi = genera(args.destinazione, args.squadre, args.stagioni, args.partite, args.giocatori, args.seed)
+    print(json.dumps(conteggi))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
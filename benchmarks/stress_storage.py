@@ -0,0 +1,161 @@
+"""
+Concurrent writers and readers on the storage layer (see storage.py)
+
+Writer processes increment a counter in one JSON file with read-modify-write
+cycles: half of them use optimistic versions (retrying on ConflittoVersione),
+half hold the squad lock around the whole cycle. Reader processes parse the
+file in a loop without locks. At the end the counter must equal the number
+of increments, no read may have failed and every reader must have seen the
+counter only grow.
+
+Uso:
+    python benchmarks/stress_storage.py --scrittori 8 --incrementi 200 --lettori 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SQUADRA = "U16P"
+
+
+def _percorso(destinazione):
+    return os.path.join(destinazione, "partita", SQUADRA, "contatore.json")
+
+
+def scrittore(destinazione, indice, incrementi, risultati):
+    from storage import ConflittoVersione, leggi_json, lock_squadra, scrivi_json
+
+    os.chdir(destinazione)
+    path = _percorso(".")
+    conflitti = 0
+    for _ in range(incrementi):
+        if indice % 2:
+            # Lock tenuto su lettura e scrittura: nessun conflitto possibile
+            with lock_squadra(SQUADRA):
+                dati, _ = leggi_json(path)
+                dati["contatore"] += 1
+                dati["scrittori"][str(indice)] = dati["scrittori"].get(str(indice), 0) + 1
+                scrivi_json(path, dati, SQUADRA, indent=2)
+            continue
+        while True:
+            dati, versione = leggi_json(path)
+            dati["contatore"] += 1
+            dati["scrittori"][str(indice)] = dati["scrittori"].get(str(indice), 0) + 1
+            try:
+                scrivi_json(path, dati, SQUADRA, versione, indent=2)
+                break
+            except ConflittoVersione:
+                conflitti += 1
+    risultati.put(("scrittore", indice, conflitti))
+
+
+def lettore(destinazione, indice, fine, risultati):
+    path = _percorso(destinazione)
+    letture, errori, regressioni, ultimo = 0, 0, 0, -1
+    while not fine.is_set():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                contatore = json.load(f)["contatore"]
+        except (ValueError, KeyError, OSError):
+            errori += 1
+            continue
+        letture += 1
+        if contatore < ultimo:
+            regressioni += 1
+        ultimo = contatore
+    risultati.put(("lettore", indice, (letture, errori, regressioni)))
+
+
+def esegui(destinazione, scrittori, incrementi, lettori):
+    """
+    Run the stress test in destinazione
+
+    Returns:
+        dict: Totals, conflicts, reads and failures; "ok" is False if an
+            increment was lost or a reader saw a partial or older file
+    """
+    from storage import scrivi_json
+
+    path = _percorso(destinazione)
+    scrivi_json(path, {"contatore": 0, "scrittori": {}}, indent=2)
+
+    contesto = multiprocessing.get_context("spawn")
+    risultati = contesto.Queue()
+    fine = contesto.Event()
+    processi_lettori = [
+        contesto.Process(target=lettore, args=(destinazione, i, fine, risultati)) for i in range(lettori)
+    ]
+    processi_scrittori = [
+        contesto.Process(target=scrittore, args=(destinazione, i, incrementi, risultati)) for i in range(scrittori)
+    ]
+    for p in processi_lettori:
+        p.start()
+    t0 = time.perf_counter()
+    for p in processi_scrittori:
+        p.start()
+    for p in processi_scrittori:
+        p.join()
+    durata = time.perf_counter() - t0
+    fine.set()
+    for p in processi_lettori:
+        p.join()
+
+    conflitti, letture, errori, regressioni = 0, 0, 0, 0
+    for _ in range(scrittori + lettori):
+        tipo, _, valori = risultati.get()
+        if tipo == "scrittore":
+            conflitti += valori
+        else:
+            letture += valori[0]
+            errori += valori[1]
+            regressioni += valori[2]
+
+    with open(path, "r", encoding="utf-8") as f:
+        dati = json.load(f)
+    attesi = scrittori * incrementi
+    per_scrittore_ok = all(dati["scrittori"].get(str(i)) == incrementi for i in range(scrittori))
+    return {
+        "ok": dati["contatore"] == attesi and per_scrittore_ok and errori == 0 and regressioni == 0,
+        "contatore": dati["contatore"],
+        "attesi": attesi,
+        "secondi": round(durata, 3),
+        "scritture_al_secondo": round(attesi / durata, 1),
+        "conflitti": conflitti,
+        "letture": letture,
+        "letture_fallite": errori,
+        "regressioni": regressioni,
+        "file_temporanei": len([f for f in os.listdir(os.path.dirname(path)) if f.endswith(".tmp")]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrittori e lettori concorrenti sullo storage")
+    parser.add_argument("--scrittori", type=int, default=8)
+    parser.add_argument("--incrementi", type=int, default=200, help="Incrementi per scrittore")
+    parser.add_argument("--lettori", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    destinazione = tempfile.mkdtemp(prefix="manageteam-stress-")
+    cwd = os.getcwd()
+    try:
+        # I lock sono in .cache/lock della directory di lavoro, condivisa da tutti i processi
+        os.chdir(destinazione)
+        risultato = esegui(destinazione, args.scrittori, args.incrementi, args.lettori)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(destinazione, ignore_errors=True)
+
+    print(json.dumps(risultato, indent=2))
+    return 0 if risultato["ok"] and not risultato["file_temporanei"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
-import json
+from file_cache import load_json
+from profilazione import cronometra
 
 def load_match_data(file_path):
     """
@@ -11,13 +12,70 @@ def load_match_data(file_path):
         dict: Match data as a dictionary
     """
     try:
-        with open(file_path, 'r') as file:
-            match_data = json.load(file)
-        return match_data
+        return load_json(file_path)
     except Exception as e:
         print(f"Error loading match data: {e}")
         return None
 
+def minutes_for_player(player, is_starter, sub_in_times, sub_out_times, expulsion_times, total_minutes):
+    """
+    Minutes played by a single player, given the match event times
+    
+    Args:
+        player (str): Player name
+        is_starter (bool): True if the player is in the first 11 of the formation
+        sub_in_times (dict): Minute each player came on
+        sub_out_times (dict): Minute each player went off
+        expulsion_times (dict): Minute each player was sent off
+        total_minutes (int): Match duration including recovery time
+        
+    Returns:
+        int: Minutes played
+    """
+    is_sub_in = player in sub_in_times
+    is_sub_out = player in sub_out_times
+    is_expelled = player in expulsion_times
+    minutes = 0
+    
+    # Apply the rules based on player's status
+    if is_starter:
+        # Regola 3: Starting player subbed out
+        if is_sub_out:
+            minutes = sub_out_times[player]
+        
+        # Regola 4: Starting player expelled
+        if is_expelled:
+            minutes = expulsion_times[player]
+        
+        # Regola 5: Starting player expelled and subbed out
+        if is_expelled and is_sub_out:
+            minutes = min(expulsion_times[player], sub_out_times[player])
+            
+        # Se il giocatore è titolare e non appare in nessuna sostituzione o espulsione, gioca tutti i minuti
+        if not is_sub_out and not is_expelled:
+            minutes = total_minutes
+    else:
+        # Regola 1: Bench player subbed in
+        if is_sub_in and not is_sub_out and not is_expelled:
+            minutes = total_minutes - sub_in_times[player]
+            
+        # Regola 2: Player subbed in and later subbed out
+        if is_sub_in and is_sub_out:
+            minutes = sub_out_times[player] - sub_in_times[player]
+            
+        # Regola 6: Player subbed in, subbed out, and expelled
+        if is_sub_in and is_sub_out and is_expelled:
+            # They play from sub_in to min(sub_out, expulsion)
+            end_time = min(sub_out_times[player], expulsion_times[player])
+            minutes = end_time - sub_in_times[player]
+            
+        # Player subbed in and expelled
+        elif is_sub_in and is_expelled:
+            minutes = expulsion_times[player] - sub_in_times[player]
+    
+    return minutes
+
+@cronometra()
 def calculate_player_minutes(match_data):
     """
     Calculate minutes played by each player based on the specified rules
@@ -75,58 +133,22 @@ def calculate_player_minutes(match_data):
     
     # Calculate minutes for each player based on substitutions and expulsions
     for player in player_minutes:
-        is_starter = player in starting_players
-        is_sub_in = player in sub_in_times
-        is_sub_out = player in sub_out_times
-        is_expelled = player in expulsion_times
-        
-        # Apply the rules based on player's status
-        if is_starter:
-            # Regola 3: Starting player subbed out
-            if is_sub_out:
-                player_minutes[player] = sub_out_times[player]
-            
-            # Regola 4: Starting player expelled
-            if is_expelled:
-                player_minutes[player] = expulsion_times[player]
-            
-            # Regola 5: Starting player expelled and subbed out
-            if is_expelled and is_sub_out:
-                player_minutes[player] = min(expulsion_times[player], sub_out_times[player])
-                
-            # Se il giocatore è titolare e non appare in nessuna sostituzione o espulsione, gioca tutti i minuti
-            if not is_sub_out and not is_expelled:
-                player_minutes[player] = total_minutes
-        else:
-            # Regola 1: Bench player subbed in
-            if is_sub_in and not is_sub_out and not is_expelled:
-                player_minutes[player] = total_minutes - sub_in_times[player]
-                
-            # Regola 2: Player subbed in and later subbed out
-            if is_sub_in and is_sub_out:
-                player_minutes[player] = sub_out_times[player] - sub_in_times[player]
-                
-            # Regola 6: Player subbed in, subbed out, and expelled
-            if is_sub_in and is_sub_out and is_expelled:
-                # They play from sub_in to min(sub_out, expulsion)
-                end_time = min(sub_out_times[player], expulsion_times[player])
-                player_minutes[player] = end_time - sub_in_times[player]
-                
-            # Player subbed in and expelled
-            elif is_sub_in and is_expelled:
-                player_minutes[player] = expulsion_times[player] - sub_in_times[player]
+        player_minutes[player] = minutes_for_player(
+            player, player in starting_players, sub_in_times, sub_out_times, expulsion_times, total_minutes
+        )
     
     return player_minutes
 
-def get_player_status(match_data):
+@cronometra()
+def get_player_detailed_status(match_data):
     """
-    Get the status of each player (starter, sub, not used, not called)
+    Get the list of status flags of each player (starter, sub, not used, not called)
     
     Args:
         match_data (dict): Match data
         
     Returns:
-        dict: Dictionary mapping player names to their status
+        dict: Dictionary mapping player names to their list of status flags
     """
     player_status = {}
     player_detailed_status = {}
@@ -199,11 +221,25 @@ def get_player_status(match_data):
             if len(player_detailed_status[player]) == 1 and "Panchina" in player_detailed_status[player]:
                 player_detailed_status[player].append("Non Entrato")
     
-    # Format detailed status for display
-    for player in player_detailed_status:
-        player_status[player] = " | ".join(player_detailed_status[player])
+    return player_detailed_status
+
+@cronometra()
+def get_player_status(match_data):
+    """
+    Get the status of each player (starter, sub, not used, not called)
     
-    return player_status
+    Args:
+        match_data (dict): Match data
+        
+    Returns:
+        dict: Dictionary mapping player names to their status
+    """
+    # Format detailed status for display
+    return {
+        player: " | ".join(parts)
+        for player, parts in get_player_detailed_status(match_data).items()
+    }
+
 
 def format_minutes(minutes):
     """Format minutes to handle special cases"""
@@ -230,6 +266,65 @@ def get_match_summary(match_data):
     }
     return summary
 
+def get_goals_conceded(match_data):
+    """
+    Get the goals conceded from the result string (e.g. "2-1" -> 1)
+    
+    Args:
+        match_data (dict): Match data
+        
+    Returns:
+        int: Goals conceded, 0 if the result is missing or malformed
+    """
+    try:
+        risultato = match_data.get("risultato", "0-0")
+        return int(risultato.split("-")[1].strip())
+    except Exception:
+        return 0
+
+@cronometra()
+def analyze_match(match_data):
+    """
+    Compute everything the reports need from an already parsed match,
+    without printing or reading files
+    
+    Args:
+        match_data (dict): Match data
+        
+    Returns:
+        dict: Record with 'minutes', 'detailed_status', 'status',
+            'summary' and 'goals_conceded'
+    """
+    if not match_data:
+        return {
+            'minutes': {},
+            'detailed_status': {},
+            'status': {},
+            'summary': {},
+            'goals_conceded': 0
+        }
+    
+    detailed_status = get_player_detailed_status(match_data)
+    return {
+        'minutes': calculate_player_minutes(match_data),
+        'detailed_status': detailed_status,
+        'status': {player: " | ".join(parts) for player, parts in detailed_status.items()},
+        'summary': get_match_summary(match_data),
+        'goals_conceded': get_goals_conceded(match_data)
+    }
+
+def analyze_matches(matches):
+    """
+    Analyze an iterable of already parsed matches
+    
+    Args:
+        matches (iterable): Match data dictionaries
+        
+    Returns:
+        list: One analyze_match record per match
+    """
+    return [analyze_match(match_data) for match_data in matches]
+
 def main(file_path):
     """
     Main function to calculate and display player minutes
@@ -244,9 +339,10 @@ def main(file_path):
     if not match_data:
         return {}, {}, {}
     
-    player_minutes = calculate_player_minutes(match_data)
-    player_status = get_player_status(match_data)
-    match_summary = get_match_summary(match_data)
+    record = analyze_match(match_data)
+    player_minutes = record['minutes']
+    player_status = record['status']
+    match_summary = record['summary']
     
     # Sort players by minutes played (descending)
     sorted_players = sorted(
@@ -264,6 +360,9 @@ def main(file_path):
     return player_minutes, player_status, match_summary
 
 if __name__ == "__main__":
-    # Test with the given JSON file
-    json_file = "attached_assets/22_VIRTUS_PIONIERI.json"
-    main(json_file)
+    import sys
+    
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python calculate_minutes.py partita/<squadra>/<file>.json [...]")
+    for json_file in sys.argv[1:]:
+        main(json_file)
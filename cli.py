@@ -0,0 +1,178 @@
+"""
+Headless entry point for reports and exports (cron, scripts)
+
+Esempi:
+    python cli.py stats --jobs 4
+    python cli.py stats --ricalcola
+    python cli.py pdf U16P --libretto
+    python cli.py excel --zip convocazioni.zip
+    python cli.py csv U16P U17P --output export
+    python cli.py watch --polling
+
+Non importa streamlit, plotly né reportlab (quest'ultimo solo per il comando pdf).
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+from core import nomi_squadre
+
+
+def _squadre(args):
+    return args.squadre or nomi_squadre
+
+
+def cmd_stats(args):
+    import season_stats
+
+    squadre = _squadre(args)
+    if args.ricalcola:
+        for squadra in squadre:
+            path = season_stats.get_cache_path(squadra)
+            if os.path.exists(path):
+                os.remove(path)
+            season_stats._aggregati.pop(squadra, None)
+
+    aggregati, _ = season_stats.aggregate_club(squadre, jobs=args.jobs)
+    errori = 0
+    for squadra, aggregate in aggregati.items():
+        totali = aggregate["squadra"]
+        print(
+            f"{squadra}: {totali['partite']} partite, {len(aggregate['giocatori'])} giocatori, "
+            f"{totali['gol']} gol, {totali['gol_subiti']} gol subiti"
+        )
+        for nome, errore in aggregate["errori"].items():
+            print(f"  Errore {nome}: {errore}", file=sys.stderr)
+            errori += 1
+        if args.ricalcola:
+            # Ricalcolo completo: i minuti vengono rifatti in blocco con il motore vettoriale
+            for differenza in season_stats.verifica_minuti(squadra, aggregate):
+                print(f"  Minuti diversi {differenza}", file=sys.stderr)
+                errori += 1
+    return 1 if errori else 0
+
+
+def cmd_pdf(args):
+    import report_pdf
+
+    errori = 0
+    for squadra in _squadre(args):
+        if args.libretto:
+            percorso, esclusi = report_pdf.genera_libretto_stagione(squadra, logo_path=args.logo)
+            for nome, errore in esclusi.items():
+                print(f"  Errore {squadra}/{nome}: {errore}", file=sys.stderr)
+                errori += 1
+            if percorso:
+                print(percorso)
+        else:
+            for percorso in report_pdf.genera_pdf_stagione(squadra, jobs=args.jobs, logo_path=args.logo):
+                print(percorso)
+    return 1 if errori else 0
+
+
+def cmd_excel(args):
+    import export_excel
+
+    squadre = _squadre(args)
+    if args.zip:
+        export_excel.esporta_convocazioni_zip(squadre, destinazione=args.zip, jobs=args.jobs)
+        print(args.zip)
+        return 0
+
+    for nome, contenuto in export_excel.esporta_convocazioni(squadre, jobs=args.jobs):
+        percorso = os.path.join(args.output, nome)
+        os.makedirs(os.path.dirname(percorso), exist_ok=True)
+        with open(percorso, "wb") as f:
+            f.write(contenuto)
+        print(percorso)
+    return 0
+
+
+def _scrivi_csv(percorso, righe):
+    with open(percorso, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(righe[0]), delimiter=";")
+        writer.writeheader()
+        writer.writerows(righe)
+    print(percorso)
+
+
+def cmd_csv(args):
+    import season_stats
+
+    squadre = _squadre(args)
+    os.makedirs(args.output, exist_ok=True)
+
+    aggregati, giocatori = season_stats.aggregate_club(squadre, jobs=args.jobs)
+    for squadra, aggregate in aggregati.items():
+        righe = season_stats.player_stats_rows(aggregate, season_stats.durata_partita(squadra))
+        if righe:
+            _scrivi_csv(os.path.join(args.output, f"{squadra}_statistiche.csv"), righe)
+
+    righe_societa = season_stats.club_player_rows(giocatori)
+    if len(squadre) > 1 and righe_societa:
+        _scrivi_csv(os.path.join(args.output, "societa_statistiche.csv"), righe_societa)
+    return 0
+
+
+def cmd_watch(args):
+    import watcher
+
+    w = watcher.Watcher(
+        squadre=args.squadre or None,
+        ritardo=watcher.RITARDO if args.ritardo is None else args.ritardo,
+        intervallo=watcher.INTERVALLO_POLLING if args.intervallo is None else args.intervallo,
+        polling=args.polling,
+        avviso=lambda messaggio: print(f"{time.strftime('%H:%M:%S')} {messaggio}", flush=True)
+    ).avvia(riscalda_subito=not args.senza_riallineamento)
+    print(f"In ascolto su {', '.join(watcher.CARTELLE)} ({w.modalita}), Ctrl+C per uscire", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        w.ferma()
+    return 1 if w.errori else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Gestione Squadre Giovanili - report ed export da riga di comando")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    def comando(nome, funzione, descrizione):
+        p = sub.add_parser(nome, help=descrizione)
+        p.add_argument("squadre", nargs="*", help="Squadre (default: tutte)")
+        p.add_argument("--jobs", type=int, default=None, help="Lavori in parallelo")
+        p.set_defaults(funzione=funzione)
+        return p
+
+    p = comando("stats", cmd_stats, "Ricalcola le statistiche di stagione")
+    p.add_argument("--ricalcola", action="store_true", help="Ignora la cache, rielabora tutte le partite e verifica i minuti con il motore vettoriale")
+
+    p = comando("pdf", cmd_pdf, "Genera i report PDF delle partite")
+    p.add_argument("--libretto", action="store_true", help="Un unico PDF per squadra")
+    p.add_argument("--logo", default=os.path.join("static", "logo.png"), help="Logo in testa alle pagine")
+
+    p = comando("excel", cmd_excel, "Esporta le convocazioni in XLSX")
+    p.add_argument("--zip", help="Scrivi un unico archivio ZIP")
+    p.add_argument("--output", default="export", help="Cartella di destinazione")
+
+    p = comando("csv", cmd_csv, "Esporta le statistiche per giocatore in CSV")
+    p.add_argument("--output", default="export", help="Cartella di destinazione")
+
+    p = comando("watch", cmd_watch, "Ricalcola le statistiche quando cambiano i file delle squadre")
+    p.add_argument("--ritardo", type=float, default=None, help="Secondi senza modifiche prima di ricalcolare")
+    p.add_argument("--intervallo", type=float, default=None, help="Secondi tra due scansioni in modalità polling")
+    p.add_argument("--polling", action="store_true", help="Scansione periodica anche se watchdog è installato")
+    p.add_argument("--senza-riallineamento", action="store_true", help="Non aggiornare tutte le squadre all'avvio")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.funzione(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from profilazione import cronometra
+
+# File generati, uno per richiesta distinta: .cache/export/<id>.<estensione>
+dir_export = os.path.join(".cache", "export")
+
+# Cambiare quando cambia il contenuto dei file generati, per non servire export vecchi
+EXPORT_VERSION = 1
+
+# Worker in background: i render PDF/XLSX di più allenatori non bloccano i rerun
+WORKERS = int(os.environ.get("MANAGETEAM_EXPORT_WORKERS", "2"))
+
+# Export più vecchi di così vengono cancellati all'avvio della coda
+MAX_GIORNI = 30
+
+_executor = None
+# Lavori in corso o falliti in questo processo: id -> Future
+_lavori = {}
+_lock = threading.Lock()
+
+
+def _pdf_partita(dati, percorso):
+    from report_pdf import LOGO_PATH, genera_pdf_file
+
+    genera_pdf_file(dati, percorso, LOGO_PATH)
+
+
+def _xlsx_convocazione(dati, percorso):
+    from export_excel import convocazione_xlsx_da_json
+
+    _, contenuto = convocazione_xlsx_da_json(dati)
+    with open(percorso, "wb") as f:
+        f.write(contenuto)
+
+
+def _firma_file(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+def _dipendenze_pdf():
+    from report_pdf import LOGO_PATH
+
+    return _firma_file(LOGO_PATH)
+
+
+def _dipendenze_xlsx():
+    from export_excel import MODELLO_PATH
+
+    return _firma_file(MODELLO_PATH)
+
+
+# Tipo di export -> (funzione che scrive il file, estensione, file da cui dipende il risultato)
+TIPI = {
+    "pdf_partita": (_pdf_partita, ".pdf", _dipendenze_pdf),
+    "xlsx_convocazione": (_xlsx_convocazione, ".xlsx", _dipendenze_xlsx),
+}
+
+
+def get_export_path(id_lavoro):
+    tipo = id_lavoro.split("-", 1)[0]
+    return os.path.join(dir_export, f"{id_lavoro}{TIPI[tipo][1]}")
+
+
+def id_lavoro(tipo, dati):
+    """
+    Id of an export request: same type, data and template give the same id
+
+    Args:
+        tipo (str): Key of TIPI
+        dati (dict): Match or convocation data
+
+    Returns:
+        str: "<tipo>-<sha256 prefix>"
+    """
+    impronta = json.dumps(
+        [EXPORT_VERSION, tipo, TIPI[tipo][2](), dati], sort_keys=True, ensure_ascii=False, default=str
+    )
+    return f"{tipo}-{hashlib.sha256(impronta.encode('utf-8')).hexdigest()[:32]}"
+
+
+def pulisci(max_giorni=MAX_GIORNI):
+    """Delete exports older than max_giorni days; returns the number of files removed"""
+    if not os.path.isdir(dir_export):
+        return 0
+    limite = time.time() - max_giorni * 86400
+    rimossi = 0
+    with os.scandir(dir_export) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < limite:
+                os.remove(entry.path)
+                rimossi += 1
+    return rimossi
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        pulisci()
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="export")
+    return _executor
+
+
+def _copia(percorso, copie):
+    for copia in copie:
+        os.makedirs(os.path.dirname(copia) or ".", exist_ok=True)
+        shutil.copyfile(percorso, copia)
+
+
+@cronometra()
+def _esegui(tipo, dati, percorso, copie):
+    # Scrittura su file temporaneo e rename: chi legge vede solo file completi
+    os.makedirs(dir_export, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dir_export, prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        TIPI[tipo][0](dati, tmp_path)
+        os.replace(tmp_path, percorso)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _copia(percorso, copie)
+    return percorso
+
+
+def accoda(tipo, dati, copie=()):
+    """
+    Queue an export and return immediately
+
+    A request identical to one already generated (the file is in the cache)
+    or still running is not rendered again. A failed request is retried.
+
+    Args:
+        tipo (str): "pdf_partita" or "xlsx_convocazione"
+        dati (dict): Match or convocation data, same format as the saved JSON
+        copie (iterable): Extra paths where the finished file is copied
+
+    Returns:
+        str: Job id, to pass to stato() and leggi()
+    """
+    lavoro = id_lavoro(tipo, dati)
+    percorso = get_export_path(lavoro)
+    copie = list(copie)
+    with _lock:
+        if os.path.exists(percorso):
+            _copia(percorso, copie)
+            return lavoro
+        future = _lavori.get(lavoro)
+        if future is None or (future.done() and future.exception() is not None):
+            # Copia dei dati: il chiamante può modificarli mentre il lavoro è in coda
+            dati = json.loads(json.dumps(dati, default=str))
+            _lavori[lavoro] = _pool().submit(_esegui, tipo, dati, percorso, copie)
+        elif copie:
+            # Stessa richiesta già in corso: le copie vengono fatte quando finisce
+            def copia_al_termine(future):
+                if future.exception() is None:
+                    _copia(percorso, copie)
+
+            future.add_done_callback(copia_al_termine)
+    return lavoro
+
+
+def stato(lavoro):
+    """
+    Status of a job
+
+    Returns:
+        dict: "stato" ("in_coda", "in_corso", "pronto", "errore" or
+            "sconosciuto"), "percorso" when ready and "errore" on failure
+    """
+    percorso = get_export_path(lavoro)
+    with _lock:
+        future = _lavori.get(lavoro)
+        if future is not None and future.done():
+            errore = future.exception()
+            if errore is not None:
+                return {"stato": "errore", "errore": str(errore)}
+            del _lavori[lavoro]
+    if future is not None and not future.done():
+        return {"stato": "in_corso" if future.running() else "in_coda"}
+    if os.path.exists(percorso):
+        return {"stato": "pronto", "percorso": percorso}
+    return {"stato": "sconosciuto"}
+
+
+def leggi(lavoro):
+    """Content of a finished export"""
+    with open(get_export_path(lavoro), "rb") as f:
+        return f.read()
+
+
+def attendi(lavoro, timeout=None):
+    """Block until a job is finished (for scripts); returns stato(lavoro)"""
+    with _lock:
+        future = _lavori.get(lavoro)
+    if future is not None:
+        try:
+            future.result(timeout)
+        except Exception:
+            pass
+    return stato(lavoro)
@@ -0,0 +1,308 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # backend opzionale
+    pa = None
+
+from anagrafica import chiavi_partita
+from calculate_minutes import analyze_match
+from season_stats import PLAYER_KEYS, TEAM_KEYS, match_contribution
+
+# Percorsi base
+dir_columnar = "columnar"
+dir_partite = "partita"
+dir_convocazioni = "convocazioni"
+
+# Il backend colonnare si attiva con MANAGETEAM_COLUMNAR=1 (richiede pyarrow)
+ENV_FLAG = "MANAGETEAM_COLUMNAR"
+
+if pa is not None:
+    PARTITIONING = ds.partitioning(
+        pa.schema([("squadra", pa.string()), ("stagione", pa.string())]),
+        flavor="hive"
+    )
+
+    EVENT_SCHEMA = pa.schema([
+        ("chiave", pa.string()),
+        ("giornata", pa.int32()),
+        ("avversario", pa.string()),
+        ("tipo", pa.string()),
+        ("giocatore", pa.string()),
+        ("minuto", pa.int32()),
+        ("dettaglio", pa.string()),
+    ])
+
+    APPEARANCE_SCHEMA = pa.schema(
+        [
+            ("chiave", pa.string()),
+            ("giornata", pa.int32()),
+            ("avversario", pa.string()),
+            ("giocatore", pa.string()),
+        ]
+        + [(key, pa.int32()) for key in PLAYER_KEYS]
+        + [("stato", pa.string())]
+    )
+
+
+def disponibile():
+    """True if pyarrow is installed"""
+    return pa is not None
+
+
+def abilitato():
+    """True if the columnar backend is installed and switched on"""
+    return disponibile() and os.environ.get(ENV_FLAG) == "1"
+
+
+def stagione_da_data(data):
+    """
+    Season label for a date (seasons run from July to June)
+
+    Args:
+        data (datetime | date): Match date
+
+    Returns:
+        str: Season label, e.g. "2024-2025"
+    """
+    inizio = data.year if data.month >= 7 else data.year - 1
+    return f"{inizio}-{inizio + 1}"
+
+
+def _table_dir(tabella, squadra, stagione):
+    return os.path.join(dir_columnar, tabella, f"squadra={squadra}", f"stagione={stagione}")
+
+
+def _write_fragment(tabella, squadra, stagione, nome, rows, schema):
+    """Write one parquet fragment per match/convocation, replacing a previous save"""
+    dir_fragment = _table_dir(tabella, squadra, stagione)
+    os.makedirs(dir_fragment, exist_ok=True)
+    path = os.path.join(dir_fragment, f"{nome}.parquet")
+
+    table = pa.Table.from_pylist(rows, schema=schema)
+    # I file che iniziano con "." vengono ignorati dalle scansioni del dataset
+    tmp_path = os.path.join(dir_fragment, f".{nome}.parquet.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _intero(valore):
+    # Minuti mancanti o non numerici (calculate_minutes li tollera): evento senza minuto
+    try:
+        return int(float(valore))
+    except (TypeError, ValueError):
+        return None
+
+
+def append_match(squadra, dati_partita, data, chiave):
+    """
+    Append a saved match to the event and appearance tables
+
+    Args:
+        squadra (str): Squad code
+        dati_partita (dict): Match data, same format as partita/<squadra>/*.json
+        data (datetime): Match date, used for the season partition
+        chiave (str): Match key (JSON file name without extension)
+    """
+    stagione = stagione_da_data(data)
+    giornata = _intero(dati_partita.get("giornata")) or 0
+    avversario = dati_partita.get("squadra", "")
+
+    record = analyze_match(dati_partita)
+    contribution = match_contribution(record, chiavi_partita(dati_partita))
+
+    # Presenze per chiave del registro (vedi anagrafica.chiave_giocatore), come l'aggregato su file
+    appearances = []
+    for giocatore, stats in contribution["giocatori"].items():
+        row = {"chiave": chiave, "giornata": giornata, "avversario": avversario, "giocatore": giocatore}
+        row.update({key: stats[key] for key in PLAYER_KEYS})
+        row["stato"] = record["status"].get(stats["nome"], "")
+        appearances.append(row)
+
+    def evento(tipo, giocatore=None, minuto=None, dettaglio=None):
+        return {
+            "chiave": chiave, "giornata": giornata, "avversario": avversario,
+            "tipo": tipo, "giocatore": giocatore, "minuto": minuto, "dettaglio": dettaglio
+        }
+
+    events = []
+    # giocatore = chi entra, dettaglio = chi esce (stessa convenzione invertita di calculate_minutes)
+    for sub in dati_partita.get("substitutions", []):
+        events.append(evento("sostituzione", sub.get("sub_out"), _intero(sub.get("time_sub")), sub.get("sub_in")))
+    for giocatore in dati_partita.get("ammonizioni", []):
+        if giocatore:
+            events.append(evento("ammonizione", giocatore))
+    for esp in dati_partita.get("espulsioni", []):
+        if isinstance(esp, dict):
+            events.append(evento("espulsione", esp.get("esp_player"), _intero(esp.get("time_esp"))))
+    for giocatore in dati_partita.get("goal", []):
+        events.append(evento("gol", giocatore))
+    for _ in range(record["goals_conceded"]):
+        events.append(evento("gol_subito"))
+
+    _write_fragment("presenze_partita", squadra, stagione, chiave, appearances, APPEARANCE_SCHEMA)
+    _write_fragment("eventi", squadra, stagione, f"partita_{chiave}", events, EVENT_SCHEMA)
+
+
+def append_convocation(squadra, convocazione_data, chiave):
+    """
+    Append a saved convocation to the event table
+
+    Args:
+        squadra (str): Squad code
+        convocazione_data (dict): Convocation data, same format as convocazioni/<squadra>/*.json
+        chiave (str): Convocation key (JSON file name without extension)
+    """
+    data = datetime.strptime(convocazione_data["data_ora_incontro"], "%Y-%m-%dT%H:%M")
+    giornata = int(convocazione_data.get("giornata") or 0)
+    avversario = convocazione_data.get("squadra_avversaria", "")
+
+    events = [
+        {"chiave": chiave, "giornata": giornata, "avversario": avversario,
+         "tipo": "convocato", "giocatore": giocatore, "minuto": None, "dettaglio": None}
+        for giocatore in convocazione_data.get("componenti_squadra", []) if giocatore
+    ]
+    events += [
+        {"chiave": chiave, "giornata": giornata, "avversario": avversario,
+         "tipo": "non_convocato", "giocatore": nome.strip(), "minuto": None, "dettaglio": None}
+        for nome in convocazione_data.get("non_convocati", "").split(",") if nome.strip()
+    ]
+
+    _write_fragment("eventi", squadra, stagione_da_data(data), f"convocazione_{chiave}", events, EVENT_SCHEMA)
+
+
+def _scan(tabella, squadra, stagione=None, columns=None):
+    path = os.path.join(dir_columnar, tabella)
+    if not os.path.isdir(path):
+        return None
+    dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+    filtro = ds.field("squadra") == squadra
+    if stagione:
+        filtro = filtro & (ds.field("stagione") == stagione)
+    return dataset.to_table(columns=columns, filter=filtro)
+
+
+def read_aggregate(squadra, stagione=None):
+    """
+    Season aggregate computed with column scans over the appearance and
+    event tables
+
+    Args:
+        squadra (str): Squad code
+        stagione (str): Optional season label, all seasons if omitted
+
+    Returns:
+        dict: Same shape as season_stats.update_aggregate
+    """
+    aggregate = {
+        "file": {},
+        "giocatori": {},
+        "squadra": {key: 0 for key in TEAM_KEYS},
+        "errori": {},
+    }
+
+    appearances = _scan("presenze_partita", squadra, stagione, ["chiave", "giocatore"] + PLAYER_KEYS)
+    if appearances is None or appearances.num_rows == 0:
+        return aggregate
+
+    chiavi = pc.unique(appearances["chiave"]).to_pylist()
+    aggregate["file"] = {chiave: {} for chiave in chiavi}
+    aggregate["squadra"]["partite"] = len(chiavi)
+    for key in ("gol", "ammonizioni", "espulsioni"):
+        aggregate["squadra"][key] = pc.sum(appearances[key]).as_py() or 0
+
+    grouped = appearances.group_by("giocatore").aggregate(
+        [(key, "sum") for key in PLAYER_KEYS] + [("chiave", "count")]
+    ).to_pydict()
+    for idx, giocatore in enumerate(grouped["giocatore"]):
+        stats = {key: grouped[f"{key}_sum"][idx] for key in PLAYER_KEYS}
+        stats["file"] = grouped["chiave_count"][idx]
+        aggregate["giocatori"][giocatore] = stats
+
+    events = _scan("eventi", squadra, stagione, ["tipo"])
+    if events is not None:
+        aggregate["squadra"]["gol_subiti"] = pc.sum(pc.equal(events["tipo"], "gol_subito")).as_py() or 0
+
+    return aggregate
+
+
+def _data_partita(dir_conv_squadra, giornata, fallback_path):
+    """Match date from the convocation of the same matchday, or the file mtime"""
+    if os.path.isdir(dir_conv_squadra):
+        for nome in os.listdir(dir_conv_squadra):
+            if nome.endswith(".json") and nome.split("_")[0] == str(giornata):
+                try:
+                    with open(os.path.join(dir_conv_squadra, nome), "r") as f:
+                        return datetime.strptime(json.load(f)["data_ora_incontro"], "%Y-%m-%dT%H:%M")
+                except (OSError, ValueError, KeyError):
+                    break
+    return datetime.fromtimestamp(os.path.getmtime(fallback_path))
+
+
+def migrate(squadre=None):
+    """
+    Import the existing partita/ and convocazioni/ JSON trees
+
+    Args:
+        squadre (list): Squad codes to import, all squads found on disk if omitted
+
+    Returns:
+        tuple: (matches imported, convocations imported, errors)
+    """
+    if squadre is None:
+        squadre = sorted(
+            set(os.listdir(dir_partite) if os.path.isdir(dir_partite) else [])
+            | set(os.listdir(dir_convocazioni) if os.path.isdir(dir_convocazioni) else [])
+        )
+
+    n_partite, n_convocazioni, errori = 0, 0, []
+    for squadra in squadre:
+        dir_conv_squadra = os.path.join(dir_convocazioni, squadra)
+        if os.path.isdir(dir_conv_squadra):
+            for nome in sorted(os.listdir(dir_conv_squadra)):
+                if not nome.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(dir_conv_squadra, nome), "r") as f:
+                        append_convocation(squadra, json.load(f), nome[:-5])
+                    n_convocazioni += 1
+                except Exception as e:
+                    errori.append(f"{squadra}/{nome}: {e}")
+
+        dir_partite_squadra = os.path.join(dir_partite, squadra)
+        if os.path.isdir(dir_partite_squadra):
+            for nome in sorted(os.listdir(dir_partite_squadra)):
+                if not nome.endswith(".json"):
+                    continue
+                path = os.path.join(dir_partite_squadra, nome)
+                try:
+                    with open(path, "r") as f:
+                        dati_partita = json.load(f)
+                    data = _data_partita(dir_conv_squadra, dati_partita.get("giornata"), path)
+                    append_match(squadra, dati_partita, data, nome[:-5])
+                    n_partite += 1
+                except Exception as e:
+                    errori.append(f"{squadra}/{nome}: {e}")
+
+    return n_partite, n_convocazioni, errori
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa partite e convocazioni JSON nel backend colonnare")
+    parser.add_argument("squadre", nargs="*", help="Squadre da importare (default: tutte)")
+    args = parser.parse_args()
+
+    if not disponibile():
+        raise SystemExit("pyarrow non installato: pip install pyarrow")
+
+    n_partite, n_convocazioni, errori = migrate(args.squadre or None)
+    print(f"Importate {n_partite} partite e {n_convocazioni} convocazioni in {dir_columnar}/")
+    for errore in errori:
+        print(f"Errore: {errore}")
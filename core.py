@@ -0,0 +1,78 @@
+import os
+
+from file_cache import cached_load
+
+# Percorsi base
+dir_squadre = "squadre"
+dir_presenze = "presenze"
+nomi_squadre = ["PP", "U19", "U18", "U17R", "U17P", "U16R", "U16P", "U15R", "U15P", "U14R", "U14P"]
+
+
+# Crea directory se non esistono
+def prepara_cartelle():
+    os.makedirs(dir_squadre, exist_ok=True)
+    os.makedirs(dir_presenze, exist_ok=True)
+
+def _read_squad_csv(path):
+    import pandas as pd
+
+    return pd.read_csv(path, sep=';')
+
+# Funzione per caricare la squadra (riletta dal disco solo se il file è cambiato)
+def load_squad(squadra):
+    path = os.path.join(dir_squadre, f"{squadra}.csv")
+    if os.path.exists(path):
+        return cached_load(path, _read_squad_csv).copy()
+    else:
+        import pandas as pd
+
+        return pd.DataFrame(columns=["NOME", "COGNOME", "ANNO", "RUOLO"])
+
+# Funzione per salvare la squadra
+def versione_squadra(squadra):
+    """Version of the roster file (see storage.versione), None if missing"""
+    from storage import versione
+
+    return versione(os.path.join(dir_squadre, f"{squadra}.csv"))
+
+
+def save_squad(squadra, df, versione_attesa=None):
+    """
+    Save the roster of a squad and sync the player registry
+
+    Args:
+        squadra (str): Squad code
+        df (pandas.DataFrame): Roster
+        versione_attesa (str): Version the roster was loaded at (see
+            versione_squadra); None overwrites unconditionally
+
+    Returns:
+        str: Version of the roster file after the save
+
+    Raises:
+        storage.ConflittoVersione: The roster was saved by someone else meanwhile
+    """
+    from anagrafica import sincronizza_squadra
+    from storage import lock_squadra, scrivi_csv, versione
+
+    path = os.path.join(dir_squadre, f"{squadra}.csv")
+    # Salvataggio e sincronizzazione sotto lo stesso lock: nessuno riscrive la rosa nel mezzo
+    with lock_squadra(squadra):
+        scrivi_csv(path, df, squadra, versione_attesa)
+        # Assegna l'id ai giocatori nuovi e registra i cambi di nome (può riscrivere il CSV)
+        sincronizza_squadra(squadra)
+        return versione(path)
+
+# Funzione per ottenere descrizione squadra
+def get_squadra_descrizione(codice):
+    if codice == "PP":
+        return "Prima Squadra"
+    elif codice.startswith("U"):
+        livello = ""
+        if codice.endswith("R"):
+            livello = "Regionale"
+        elif codice.endswith("P"):
+            livello = "Provinciale"
+        categoria = codice[1:3]  # U19 -> 19
+        return f"Under {categoria} {livello}".strip()
+    return codice
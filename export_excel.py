@@ -0,0 +1,163 @@
+import json
+import os
+import pickle
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+from file_cache import cached_load
+from profilazione import cronometra
+
+# Percorsi base
+dir_convocazioni = "convocazioni"
+MODELLO_PATH = "Convocazione.xlsx"
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _snapshot_modello(path):
+    """Parse the template once and keep it pickled: unpickling is cheaper than load_workbook"""
+    from openpyxl import load_workbook
+
+    return pickle.dumps(load_workbook(path))
+
+
+def nuovo_da_modello(modello_path=MODELLO_PATH):
+    """
+    Fresh workbook copy of the convocation template
+
+    The template is parsed only when the file changes on disk.
+
+    Raises:
+        FileNotFoundError: If the template is missing
+    """
+    return pickle.loads(cached_load(modello_path, _snapshot_modello))
+
+
+def nome_file_convocazione(squadra_sel, squadra_avversaria):
+    return f"Convocazione_{squadra_sel}_{squadra_avversaria.replace(' ', '_')}.xlsx"
+
+
+@cronometra()
+def convocazione_xlsx(squadra_avversaria, data_incontro, ora_incontro, campo, ora_raduno, convocati, non_convocati, mister, dirigente, modello_path=MODELLO_PATH):
+    """
+    Fill the convocation template
+
+    Returns:
+        bytes: Content of the XLSX file
+    """
+    wb = nuovo_da_modello(modello_path)
+    ws = wb.active
+
+    ws["C10"] = squadra_avversaria
+    ws["C14"] = f"{data_incontro.strftime('%d/%m/%Y')} - {ora_incontro.strftime('%H:%M')}"
+
+    if "," in campo:
+        parte1, parte2 = campo.split(",", 1)
+        ws["C16"] = parte1.strip()
+        ws["C17"] = parte2.strip()
+    else:
+        ws["C16"] = campo.strip()
+        ws["C17"] = ""
+
+    ws["C19"] = ora_raduno
+
+    for idx, giocatore in enumerate(convocati[:22]):
+        ws[f"C{22 + idx}"] = giocatore
+
+    ws["C45"] = non_convocati
+    ws["C50"] = mister
+    ws["C52"] = dirigente
+
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def convocazione_xlsx_da_json(dati, modello_path=MODELLO_PATH):
+    """
+    XLSX of a saved convocation
+
+    Args:
+        dati (dict): Convocation data, same format as convocazioni/<squadra>/*.json
+
+    Returns:
+        tuple: (file name, XLSX bytes)
+    """
+    data_ora = datetime.strptime(dati["data_ora_incontro"], "%Y-%m-%dT%H:%M")
+    contenuto = convocazione_xlsx(
+        squadra_avversaria=dati["squadra_avversaria"],
+        data_incontro=data_ora.date(),
+        ora_incontro=data_ora.time(),
+        campo=dati.get("denominazione_campo", ""),
+        ora_raduno=dati.get("ora_raduno", ""),
+        convocati=[p for p in dati.get("componenti_squadra", []) if p],
+        non_convocati=dati.get("non_convocati", ""),
+        mister=dati.get("nome_mister", ""),
+        dirigente=dati.get("nome_dirigente", ""),
+        modello_path=modello_path
+    )
+    return nome_file_convocazione(dati["squadra"], dati["squadra_avversaria"]), contenuto
+
+
+def _esporta_json(args):
+    path, modello_path = args
+    with open(path, "r") as f:
+        dati = json.load(f)
+    nome_file, contenuto = convocazione_xlsx_da_json(dati, modello_path)
+    return os.path.join(dati["squadra"], nome_file), contenuto
+
+
+def elenco_convocazioni(squadre):
+    """Convocation JSON files of the given squads"""
+    paths = []
+    for squadra in squadre:
+        dir_squadra = os.path.join(dir_convocazioni, squadra)
+        if os.path.isdir(dir_squadra):
+            paths.extend(
+                os.path.join(dir_squadra, f) for f in sorted(os.listdir(dir_squadra)) if f.endswith(".json")
+            )
+    return paths
+
+
+def esporta_convocazioni(squadre, jobs=None, modello_path=MODELLO_PATH):
+    """
+    Export every convocation of the given squads, in parallel worker processes
+
+    Args:
+        squadre (list): Squad codes
+        jobs (int): Worker processes, defaults to the CPU count (1 = no pool);
+            pass 1 from the Streamlit app, forking a multi-threaded server is unsafe
+
+    Yields:
+        tuple: (archive name "<squadra>/<file>.xlsx", XLSX bytes)
+    """
+    lavori = [(path, modello_path) for path in elenco_convocazioni(squadre)]
+    if jobs == 1 or len(lavori) <= 1:
+        for lavoro in lavori:
+            yield _esporta_json(lavoro)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(_esporta_json, lavori)
+
+
+def esporta_convocazioni_zip(squadre, destinazione=None, jobs=None, modello_path=MODELLO_PATH):
+    """
+    Zip archive with every convocation of the given squads
+
+    Args:
+        squadre (list): Squad codes
+        destinazione (str | file): Path or binary file object, in memory if omitted
+        jobs (int): Worker processes
+
+    Returns:
+        bytes | str: Archive bytes when built in memory, otherwise destinazione
+    """
+    target = destinazione if destinazione is not None else BytesIO()
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archivio:
+        for nome, contenuto in esporta_convocazioni(squadre, jobs, modello_path):
+            archivio.writestr(nome, contenuto)
+    if destinazione is None:
+        return target.getvalue()
+    return destinazione
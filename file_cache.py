@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from profilazione import conta, misura
+
+# Numero massimo di file tenuti in memoria
+MAX_ENTRIES = 128
+
+
+class FileCache:
+    """
+    LRU cache of parsed files, keyed on path and validated on mtime/size
+
+    A cached value is reused only while the file on disk still has the same
+    modification time and size; writers should call invalidate() after
+    saving so that same-tick rewrites are never served stale.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, path, loader):
+        """
+        Return the parsed content of path, calling loader(path) on a miss
+
+        Args:
+            path (str): File path
+            loader (callable): Function parsing the file
+
+        Returns:
+            object: Parsed content (shared, callers must not mutate it)
+        """
+        stat = os.stat(path)
+        firma = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == firma:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                conta("file_cache.hit")
+                return entry[1]
+            self.misses += 1
+            conta("file_cache.miss")
+
+        # Solo le letture dal disco vengono cronometrate, per tipo di loader
+        with misura(f"file_cache.{getattr(loader, '__name__', 'loader')}"):
+            value = loader(path)
+
+        with self._lock:
+            self._entries[path] = (firma, value)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, path=None):
+        """Drop one path, or every entry if path is None"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+# Cache condivisa dal processo: sopravvive ai rerun di Streamlit
+_cache = FileCache()
+
+
+def _read_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def cached_load(path, loader):
+    return _cache.get(path, loader)
+
+
+def load_json(path):
+    """Parsed JSON file, re-read only when it changed on disk"""
+    return _cache.get(path, _read_json)
+
+
+def invalidate(path=None):
+    _cache.invalidate(path)
+
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,285 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from anagrafica import ANAGRAFICA_PATH, chiave_giocatore, chiavi_partita, nome_chiave
+from calculate_minutes import analyze_match
+from file_cache import invalidate, load_json
+from profilazione import cronometra
+from season_stats import dir_partite
+from storage import lock_squadra, versione
+
+# Percorsi base: un file per giocatore più un manifesto per squadra
+dir_indice = os.path.join(".cache", "indice")
+
+INDICE_VERSION = 2
+
+
+
+def _lock_indice(squadra):
+    # Lettura-modifica-scrittura del manifesto: la aggiornano sia Streamlit sia il watcher di
+    # cli.py, quindi serve il lock tra processi. Nome separato dal lock della squadra, così un
+    # reindex completo non blocca i salvataggi delle partite
+    return lock_squadra(f"indice_{squadra}")
+
+
+def get_indice_dir(squadra):
+    return os.path.join(dir_indice, squadra)
+
+
+def get_manifesto_path(squadra):
+    return os.path.join(get_indice_dir(squadra), "_manifesto.json")
+
+
+def get_giocatore_path(squadra, chiave):
+    return os.path.join(get_indice_dir(squadra), f"{chiave}.json")
+
+
+def _scrivi(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    invalidate(path)
+
+
+def _leggi(path, default):
+    try:
+        return load_json(path)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def _carica_manifesto(squadra):
+    # Letto senza cache: viene modificato sul posto prima di essere riscritto
+    try:
+        with open(get_manifesto_path(squadra), "r") as f:
+            manifesto = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifesto = None
+    if not manifesto or manifesto.get("versione") != INDICE_VERSION:
+        if manifesto:
+            # Indice di una versione precedente (es. file per nome invece che per id): si ricostruisce
+            shutil.rmtree(get_indice_dir(squadra), ignore_errors=True)
+        return {"versione": INDICE_VERSION, "file": {}, "giocatori": {}}
+    return manifesto
+
+
+def presenze_partita(match_data, nome_file):
+    """
+    One appearance record per player listed in a match
+
+    Args:
+        match_data (dict): Match data
+        nome_file (str): Match file name, used as appearance id
+
+    Returns:
+        dict: Player name -> appearance record (minuti, stato, gol, ...)
+    """
+    record = analyze_match(match_data)
+    summary = record["summary"]
+    formazione = match_data.get("formazione", [])
+    gol = match_data.get("goal", [])
+    minuti_gol = {}
+    for g in match_data.get("goal_dettaglio", []):
+        minuti_gol.setdefault(g.get("giocatore"), []).append(g.get("minuto"))
+    espulsioni = {
+        e.get("esp_player"): e.get("time_esp") for e in match_data.get("espulsioni", []) if isinstance(e, dict)
+    }
+
+    presenze = {}
+    for player, stato in record["detailed_status"].items():
+        if not player:
+            continue
+        presenze[player] = {
+            "partita": nome_file,
+            "giornata": summary.get("giornata"),
+            "avversario": summary.get("squadra"),
+            "home_away": summary.get("home_away"),
+            "risultato": summary.get("risultato"),
+            "titolare": player in formazione[0:11],
+            "minuti": max(record["minutes"].get(player, 0), 0),
+            "stato": stato,
+            "gol": gol.count(player),
+            "minuti_gol": minuti_gol.get(player, []),
+            "ammonizioni": match_data.get("ammonizioni", []).count(player),
+            "minuto_espulsione": espulsioni.get(player),
+        }
+    return presenze
+
+
+def _aggiorna(squadra, manifesto, cambiati, rimossi):
+    """
+    Rewrite only the player files touched by the given matches
+
+    Args:
+        cambiati (dict): Match file name -> (path, mtime_ns, size) to (re)index
+        rimossi (iterable): Match file names to drop
+    """
+    # Per ogni giocatore coinvolto: partite da togliere e presenze da aggiungere
+    da_togliere = {}
+    da_aggiungere = {}
+    nomi = {}
+
+    for nome_file in list(rimossi) + list(cambiati):
+        voce = manifesto["file"].pop(nome_file, None)
+        if voce:
+            for chiave in voce["giocatori"]:
+                da_togliere.setdefault(chiave, set()).add(nome_file)
+
+    for nome_file, (path, mtime, size) in cambiati.items():
+        try:
+            match_data = load_json(path)
+            presenze = presenze_partita(match_data, nome_file)
+            id_salvati = chiavi_partita(match_data)
+            errore = None
+        except Exception as e:
+            presenze, id_salvati, errore = {}, {}, str(e)
+        chiavi = []
+        for player, presenza in presenze.items():
+            # Un file per id del registro: un giocatore rinominato resta nella stessa scheda
+            chiave = id_salvati.get(player) or chiave_giocatore(player)
+            if not chiave:
+                continue
+            chiavi.append(chiave)
+            nomi.setdefault(chiave, nome_chiave(chiave, player))
+            da_aggiungere.setdefault(chiave, {})[nome_file] = presenza
+        manifesto["file"][nome_file] = {
+            "mtime": mtime, "size": size, "giocatori": chiavi, "errore": errore,
+            "senza_id": any(player not in id_salvati for player in presenze),
+        }
+
+    for chiave in set(da_togliere) | set(da_aggiungere):
+        path = get_giocatore_path(squadra, chiave)
+        scheda = _leggi(path, None) or {"nome": nomi.get(chiave, chiave), "presenze": {}}
+        scheda = {"nome": nomi.get(chiave, scheda["nome"]), "presenze": dict(scheda["presenze"])}
+        for nome_file in da_togliere.get(chiave, ()):
+            scheda["presenze"].pop(nome_file, None)
+        scheda["presenze"].update(da_aggiungere.get(chiave, {}))
+
+        if scheda["presenze"]:
+            _scrivi(path, scheda)
+            manifesto["giocatori"][chiave] = scheda["nome"]
+        else:
+            if os.path.exists(path):
+                os.remove(path)
+                invalidate(path)
+            manifesto["giocatori"].pop(chiave, None)
+
+    _scrivi(get_manifesto_path(squadra), manifesto)
+
+
+def aggiorna_partita(squadra, nome_file):
+    """
+    Update the index after a match file was saved or deleted
+
+    Only the players listed in the old and new version of the match are
+    rewritten.
+
+    Args:
+        squadra (str): Squad code
+        nome_file (str): Match file name in partita/<squadra>/
+    """
+    path = os.path.join(dir_partite, squadra, nome_file)
+    with _lock_indice(squadra):
+        manifesto = _carica_manifesto(squadra)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            _aggiorna(squadra, manifesto, {nome_file: (path, stat.st_mtime_ns, stat.st_size)}, [])
+        else:
+            _aggiorna(squadra, manifesto, {}, [nome_file])
+
+
+@cronometra()
+def sincronizza(squadra):
+    """
+    Bring the index of a squad up to date with the match files on disk
+
+    Files are compared by mtime/size; only new, changed or removed matches
+    are read, plus matches without stored ids when the player registry
+    changed. Catches matches edited outside the app.
+
+    Returns:
+        dict: Manifest with "file" (match file -> indexed players) and
+            "giocatori" (player key -> display name)
+    """
+    dir_squadra = os.path.join(dir_partite, squadra)
+    correnti = {}
+    if os.path.isdir(dir_squadra):
+        with os.scandir(dir_squadra) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    correnti[entry.name] = (entry.path, stat.st_mtime_ns, stat.st_size)
+
+    anagrafica = versione(ANAGRAFICA_PATH)
+    with _lock_indice(squadra):
+        manifesto = _carica_manifesto(squadra)
+        registro_cambiato = manifesto.get("anagrafica") != anagrafica
+        rimossi = [nome for nome in manifesto["file"] if nome not in correnti]
+        cambiati = {
+            nome: valori for nome, valori in correnti.items()
+            if nome not in manifesto["file"]
+            or (manifesto["file"][nome]["mtime"], manifesto["file"][nome]["size"]) != valori[1:]
+            or (registro_cambiato and manifesto["file"][nome].get("senza_id"))
+        }
+        if rimossi or cambiati or registro_cambiato or not os.path.exists(get_manifesto_path(squadra)):
+            manifesto["anagrafica"] = anagrafica
+            _aggiorna(squadra, manifesto, cambiati, rimossi)
+        return manifesto
+
+
+def elenco_giocatori(squadra):
+    """
+    Indexed players of a squad
+
+    Returns:
+        dict: Player key (see anagrafica.chiave_giocatore) -> display name, sorted by name
+    """
+    giocatori = _leggi(get_manifesto_path(squadra), {}).get("giocatori", {})
+    # Nome attuale del registro: un giocatore rinominato compare col nome nuovo
+    giocatori = {chiave: nome_chiave(chiave, nome) for chiave, nome in giocatori.items()}
+    return dict(sorted(giocatori.items(), key=lambda item: item[1].casefold()))
+
+
+def presenze_giocatore(squadra, nome):
+    """
+    All appearances of one player, reading only that player's index file
+
+    Args:
+        squadra (str): Squad code
+        nome (str): Player name (any spelling) or key from elenco_giocatori
+
+    Returns:
+        list: Appearance records sorted by giornata
+    """
+    chiave = nome if os.path.exists(get_giocatore_path(squadra, nome)) else chiave_giocatore(nome)
+    scheda = _leggi(get_giocatore_path(squadra, chiave), None)
+    if not scheda:
+        return []
+
+    def ordine(presenza):
+        try:
+            return (0, int(presenza.get("giornata")))
+        except (TypeError, ValueError):
+            return (1, presenza["partita"])
+
+    return sorted(scheda["presenze"].values(), key=ordine)
+
+
+if __name__ == "__main__":
+    # Uso: python indice_giocatori.py [SQUADRA ...] - ricostruisce l'indice delle squadre
+    from core import nomi_squadre
+
+    for squadra in sys.argv[1:] or nomi_squadre:
+        manifesto = sincronizza(squadra)
+        print(f"{squadra}: {len(manifesto['file'])} partite, {len(manifesto['giocatori'])} giocatori")
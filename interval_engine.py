@@ -0,0 +1,248 @@
+import argparse
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from file_cache import load_json
+from season_stats import durata_partita
+
+# Durata usata da calculate_player_minutes quando la categoria non è nota
+DEFAULT_DURATION = 80
+
+
+def match_duration(match_data, squadra=None):
+    """
+    Full duration of a match: category duration plus recovery time
+
+    Args:
+        match_data (dict): Match data
+        squadra (str): Squad code (e.g. "U16P"); unknown or missing codes
+            fall back to DEFAULT_DURATION
+
+    Returns:
+        int: Duration in minutes
+    """
+    base = durata_partita(squadra) if squadra else 0
+    return (base or DEFAULT_DURATION) + match_data.get('recupero', 0)
+
+
+def _match_events(match_data):
+    """
+    Substitution and expulsion events in time order
+
+    Returns:
+        list: (minute, kind, player) with kind "off", "on" or "expelled";
+            at the same minute players go off before others come on
+    """
+    events = []
+    for idx, sub in enumerate(match_data.get('substitutions', [])):
+        time_sub = sub.get('time_sub')
+        if time_sub is None:
+            continue
+        # Stessa convenzione di calculate_minutes: 'sub_out' entra, 'sub_in' esce
+        if sub.get('sub_in'):
+            events.append((int(time_sub), 0, idx, "off", sub['sub_in']))
+        if sub.get('sub_out'):
+            events.append((int(time_sub), 1, idx, "on", sub['sub_out']))
+
+    for idx, expulsion in enumerate(match_data.get('espulsioni', [])):
+        # Le espulsioni salvate come semplice nome non hanno minuto
+        if isinstance(expulsion, dict) and 'esp_player' in expulsion and 'time_esp' in expulsion:
+            events.append((int(expulsion['time_esp']), 0, idx, "expelled", expulsion['esp_player']))
+
+    events.sort(key=lambda e: (e[0], e[1], e[2]))
+    return [(minute, kind, player) for minute, _, _, kind, player in events]
+
+
+class MatchIntervals:
+    """
+    On-pitch intervals of every player in one match, with indexes for queries
+
+    Unlike calculate_player_minutes, every substitution is kept: a player can
+    come on, go off and come back. Intervals are half-open [start, end), in
+    minutes from kick-off. Substitutions that do not match the state of the
+    pitch (e.g. a player going off who is not on) are ignored.
+
+    Args:
+        match_data (dict): Match data
+        duration (int): Full duration including recovery, see match_duration
+    """
+
+    def __init__(self, match_data, duration):
+        self.duration = duration
+        formazione = match_data.get('formazione', [])
+        self.players = list(dict.fromkeys(p for p in formazione if p))
+        self.intervals = {player: [] for player in self.players}
+
+        on_since = {p: 0 for p in formazione[0:11] if p}
+        expelled = set()
+        for minute, kind, player in _match_events(match_data):
+            minute = min(max(minute, 0), duration)
+            if kind == "on":
+                if player not in on_since and player not in expelled:
+                    on_since[player] = minute
+                    self.intervals.setdefault(player, [])
+                    if player not in self.players:
+                        self.players.append(player)
+            else:
+                start = on_since.pop(player, None)
+                if start is not None and minute > start:
+                    self.intervals[player].append((start, minute))
+                if kind == "expelled":
+                    expelled.add(player)
+        for player, start in on_since.items():
+            if duration > start:
+                self.intervals[player].append((start, duration))
+
+        self._starts = {p: [s for s, _ in iv] for p, iv in self.intervals.items()}
+        self._build_segments()
+
+        self.goals_for = sorted(
+            g['minuto'] for g in match_data.get('goal_dettaglio', []) if g.get('minuto') is not None
+        )
+        self.goals_against = sorted(
+            g['minuto'] for g in match_data.get('goal_subiti_dettaglio', []) if g.get('minuto') is not None
+        )
+
+    def _build_segments(self):
+        # Indice a segmenti: tra due confini consecutivi l'insieme dei giocatori in campo non cambia
+        bounds = {0, self.duration}
+        for intervals in self.intervals.values():
+            for start, end in intervals:
+                bounds.add(start)
+                bounds.add(end)
+        self._bounds = sorted(bounds)
+
+        delta = {}
+        for player, intervals in self.intervals.items():
+            for start, end in intervals:
+                delta.setdefault(start, []).append((player, True))
+                delta.setdefault(end, []).append((player, False))
+
+        on = set()
+        self._segments = []
+        for bound in self._bounds[:-1]:
+            for player, entering in delta.get(bound, []):
+                if entering:
+                    on.add(player)
+                else:
+                    on.discard(player)
+            self._segments.append(frozenset(on))
+
+    def segments(self):
+        """
+        Stretches of the match with the same players on the pitch
+
+        Returns:
+            list: (start, end, players) tuples covering [0, duration) in order
+        """
+        return [
+            (start, end, players)
+            for start, end, players in zip(self._bounds[:-1], self._bounds[1:], self._segments)
+        ]
+
+    def on_pitch_at(self, minute):
+        """
+        Players on the pitch at a given minute, O(log n)
+
+        Args:
+            minute (float): Minute from kick-off; a player coming on at minute m
+                is on at m, one going off at m is not. The final whistle counts
+                as the last segment.
+
+        Returns:
+            frozenset: Player names
+        """
+        if minute < 0 or minute > self.duration or not self._segments:
+            return frozenset()
+        idx = min(bisect_right(self._bounds, minute) - 1, len(self._segments) - 1)
+        return self._segments[idx]
+
+    def is_on_pitch(self, player, minute):
+        """True if the player is on the pitch at the given minute, O(log k)"""
+        starts = self._starts.get(player)
+        if not starts:
+            return False
+        idx = bisect_right(starts, minute) - 1
+        if idx < 0:
+            return False
+        start, end = self.intervals[player][idx]
+        return start <= minute < end or minute == end == self.duration
+
+    def minutes(self):
+        """
+        Minutes played by every player in the formation
+
+        Returns:
+            dict: Dictionary mapping player names to minutes played
+        """
+        return {p: sum(end - start for start, end in self.intervals[p]) for p in self.players}
+
+    def goals_while_on(self, player):
+        """
+        Goals scored and conceded while the player was on the pitch
+
+        Only goals with a minute (goal_dettaglio / goal_subiti_dettaglio,
+        written by the live mode) are counted.
+
+        Returns:
+            tuple: (goals scored, goals conceded)
+        """
+        scored = conceded = 0
+        for start, end in self.intervals.get(player, []):
+            # Il gol al fischio finale conta per chi è in campo al termine
+            if end == self.duration:
+                scored += bisect_right(self.goals_for, end) - bisect_left(self.goals_for, start)
+                conceded += bisect_right(self.goals_against, end) - bisect_left(self.goals_against, start)
+            else:
+                scored += bisect_left(self.goals_for, end) - bisect_left(self.goals_for, start)
+                conceded += bisect_left(self.goals_against, end) - bisect_left(self.goals_against, start)
+        return scored, conceded
+
+    def occupancy(self):
+        """
+        Per-minute occupancy matrix
+
+        Returns:
+            tuple: (players, matrix) where matrix is a bool NumPy array of shape
+                (len(players), duration) and matrix[i, m] is True if players[i]
+                was on the pitch during minute [m, m + 1)
+        """
+        matrix = np.zeros((len(self.players), self.duration), dtype=bool)
+        for i, player in enumerate(self.players):
+            for start, end in self.intervals[player]:
+                matrix[i, start:end] = True
+        return self.players, matrix
+
+
+def match_intervals(match_data, squadra=None):
+    """
+    Build the interval index of a match with the duration of its category
+
+    Args:
+        match_data (dict): Match data
+        squadra (str): Squad code, used for the regular duration
+
+    Returns:
+        MatchIntervals: Index of the match
+    """
+    return MatchIntervals(match_data, match_duration(match_data, squadra))
+
+
+def main(file_paths, squadra=None):
+    for file_path in file_paths:
+        match_data = load_json(file_path)
+        index = match_intervals(match_data, squadra)
+        minutes = index.minutes()
+        print(f"\n{file_path} ({index.duration}')")
+        for player in index.players:
+            intervals = ", ".join(f"{start}-{end}" for start, end in index.intervals[player]) or "-"
+            print(f"{player:<30} {minutes[player]:>3}'  {intervals}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intervalli in campo e minuti giocati per ogni partita")
+    parser.add_argument("squadra", help="Squadra, per la durata regolamentare della categoria")
+    parser.add_argument("partite", nargs="+", help="File JSON delle partite (es. partita/U16P/1_AVVERSARIO.json)")
+    args = parser.parse_args()
+    main(args.partite, args.squadra)
@@ -0,0 +1,66 @@
+import streamlit as st
+
+NUM_SLOT = 20
+
+
+def _aggiorna_slot(chiave, i, widget_key):
+    st.session_state[chiave][i] = st.session_state[widget_key]
+
+
+def _aggiungi_giocatore(chiave, giocatore):
+    slot = st.session_state[chiave]
+    if giocatore in slot or "" not in slot:
+        return
+    slot[slot.index("")] = giocatore
+
+
+@st.fragment
+def editor_formazione(chiave, giocatori, prefisso, titolo_disponibili, titolo_slot, dopo=None):
+    """
+    Player picker with one button per free player and NUM_SLOT numbered slots
+
+    Runs as a Streamlit fragment: picking a player reruns only this widget,
+    not the whole app.py script. State changes happen in widget callbacks,
+    before the fragment is drawn again, so no st.rerun() is needed.
+
+    Args:
+        chiave (str): Session state key holding the list of slots ("" = empty)
+        giocatori (list): Players that can be picked, in display order
+        prefisso (str): Prefix for widget keys, unique per section
+        titolo_disponibili (str): Heading of the free players column
+        titolo_slot (str): Heading of the slots column
+        dopo (callable): Optional function called with the slots at the end
+            of the fragment, to draw widgets that depend on the selection
+    """
+    slot = st.session_state[chiave]
+    occupati = set(p for p in slot if p)
+    # Calcolati una volta sola: ogni slot aggiunge al più il proprio giocatore
+    liberi = [g for g in giocatori if g not in occupati]
+
+    col_disponibili, col_slot = st.columns([1, 1])
+
+    with col_disponibili:
+        st.markdown(f"**{titolo_disponibili}**")
+        for giocatore in liberi:
+            st.button(giocatore, key=f"{prefisso}_disp_{giocatore}", on_click=_aggiungi_giocatore, args=(chiave, giocatore))
+
+    with col_slot:
+        st.markdown(f"**{titolo_slot}**")
+        for i, current_player in enumerate(slot):
+            opzioni = [""] + ([current_player] if current_player else []) + liberi
+            widget_key = f"{prefisso}_slot_{i}"
+            st.session_state[widget_key] = current_player
+
+            cols = st.columns([0.1, 0.9])
+            with cols[0]:
+                st.markdown(f"**{i+1}.**")
+            with cols[1]:
+                st.selectbox(
+                    "", options=opzioni,
+                    key=widget_key,
+                    label_visibility="collapsed",
+                    on_change=_aggiorna_slot, args=(chiave, i, widget_key)
+                )
+
+    if dopo is not None:
+        dopo(slot)
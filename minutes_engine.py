@@ -0,0 +1,132 @@
+import numpy as np
+
+# Colonne della tabella colonnare: una riga per giocatore in formazione per partita
+COLUMNS = ["match", "player", "starter", "sub_in", "sub_out", "expulsion", "duration"]
+
+
+def build_match_table(matches, base_duration=80):
+    """
+    Turn N matches into columnar arrays, one row per player-match
+
+    Missing sub-in, sub-out and expulsion minutes are NaN. The substitution
+    fields follow the same inverted convention as calculate_player_minutes
+    ('sub_out' is the player coming on, 'sub_in' the one going off).
+
+    Args:
+        matches (iterable): Match data dictionaries
+        base_duration (int): Regular duration, recovery time is added per match
+
+    Returns:
+        dict: 'players' (list of names, indexed by the 'player' column) plus
+            one NumPy array per column in COLUMNS
+    """
+    player_index = {}
+    players = []
+    rows = {column: [] for column in COLUMNS}
+
+    for match_idx, match_data in enumerate(matches):
+        if not match_data:
+            continue
+
+        formazione = match_data.get('formazione', [])
+        starters = set(p for p in formazione[0:11] if p)
+        duration = base_duration + match_data.get('recupero', 0)
+
+        sub_in_times = {}
+        sub_out_times = {}
+        for sub in match_data.get('substitutions', []):
+            sub_in_player = sub.get('sub_out')  # Invertito come in calculate_minutes
+            sub_out_player = sub.get('sub_in')
+            time_sub = sub.get('time_sub')
+            if sub_in_player:
+                sub_in_times[sub_in_player] = time_sub
+            if sub_out_player:
+                sub_out_times[sub_out_player] = time_sub
+
+        expulsion_times = {}
+        for expulsion in match_data.get('espulsioni', []):
+            if isinstance(expulsion, dict) and 'esp_player' in expulsion and 'time_esp' in expulsion:
+                expulsion_times[expulsion['esp_player']] = expulsion['time_esp']
+
+        for player in dict.fromkeys(p for p in formazione if p):
+            if player not in player_index:
+                player_index[player] = len(players)
+                players.append(player)
+
+            rows["match"].append(match_idx)
+            rows["player"].append(player_index[player])
+            rows["starter"].append(player in starters)
+            rows["sub_in"].append(sub_in_times.get(player, np.nan))
+            rows["sub_out"].append(sub_out_times.get(player, np.nan))
+            rows["expulsion"].append(expulsion_times.get(player, np.nan))
+            rows["duration"].append(duration)
+
+    table = {
+        "players": players,
+        "match": np.asarray(rows["match"], dtype=np.int64),
+        "player": np.asarray(rows["player"], dtype=np.int64),
+        "starter": np.asarray(rows["starter"], dtype=bool),
+        "duration": np.asarray(rows["duration"], dtype=np.float64),
+    }
+    for column in ("sub_in", "sub_out", "expulsion"):
+        table[column] = np.asarray(rows[column], dtype=np.float64)
+    return table
+
+
+def compute_minutes(table):
+    """
+    Minutes played for every row of a match table
+
+    Equivalent to Regola 1-6 of calculate_player_minutes: a player is on the
+    pitch from kick-off (starters) or from the sub-in minute, until the
+    earliest of sub-out and expulsion, or until the end of the match.
+
+    Args:
+        table (dict): Table returned by build_match_table
+
+    Returns:
+        numpy.ndarray: Minutes per row (int64)
+    """
+    end = np.fmin(table["sub_out"], table["expulsion"])
+    end = np.where(np.isnan(end), table["duration"], end)
+
+    start = np.where(table["starter"], 0.0, table["sub_in"])
+    on_pitch = table["starter"] | ~np.isnan(table["sub_in"])
+
+    minutes = np.where(on_pitch, end - np.nan_to_num(start), 0.0)
+    return minutes.astype(np.int64)
+
+
+def season_minutes(matches, base_duration=80):
+    """
+    Total minutes per player over a batch of matches
+
+    Args:
+        matches (iterable): Match data dictionaries
+        base_duration (int): Regular duration, recovery time is added per match
+
+    Returns:
+        dict: Dictionary mapping player names to total minutes played
+    """
+    table = build_match_table(matches, base_duration)
+    minutes = compute_minutes(table)
+    totals = np.bincount(table["player"], weights=minutes, minlength=len(table["players"]))
+    return {player: int(total) for player, total in zip(table["players"], totals)}
+
+
+def match_minutes(table, minutes):
+    """
+    Split per-row minutes back into one dictionary per match
+
+    Args:
+        table (dict): Table returned by build_match_table
+        minutes (numpy.ndarray): Output of compute_minutes
+
+    Returns:
+        dict: Match index -> {player name: minutes}
+    """
+    per_match = {}
+    players = table["players"]
+    for match_idx, player_idx, value in zip(table["match"].tolist(), table["player"].tolist(), minutes.tolist()):
+        per_match.setdefault(match_idx, {})[players[player_idx]] = value
+    return per_match
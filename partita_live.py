@@ -0,0 +1,372 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from calculate_minutes import minutes_for_player
+from season_stats import durata_partita
+from storage import lock_squadra, scrivi_json
+
+# Percorsi base
+dir_partite = "partita"
+
+TIPI_EVENTO = ["inizio", "gol", "gol_subito", "sostituzione", "ammonizione", "espulsione", "annulla", "fine"]
+
+# Stati già letti in questo processo, aggiornati leggendo solo le righe nuove del log
+_stati = {}
+_lock = threading.Lock()
+
+
+def get_log_path(squadra, nome):
+    """Event log of a live match: partita/<squadra>/live/<nome>.jsonl"""
+    return os.path.join(dir_partite, squadra, "live", f"{nome}.jsonl")
+
+
+def get_match_path(squadra, nome):
+    return os.path.join(dir_partite, squadra, f"{nome}.json")
+
+
+def _squadra_del_log(path):
+    # partita/<squadra>/live/<nome>.jsonl
+    return os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+
+
+def _nuovo_stato():
+    return {
+        "offset": 0,
+        "inode": None,
+        "seq": 0,
+        "eventi": [],
+        "annullati": set(),
+        "dati": None,
+        "in_campo": set(),
+        "sub_in": {},
+        "sub_out": {},
+        "espulsione": {},
+        "minuti": {},
+        "chiusa": False,
+    }
+
+
+def _durata(stato):
+    # Stessa durata usata da calculate_player_minutes
+    return 80 + stato["dati"].get("recupero", 0)
+
+
+def _ricalcola_minuti(stato, giocatori):
+    formazione = stato["dati"]["formazione"]
+    titolari = formazione[0:11]
+    durata = _durata(stato)
+    for giocatore in giocatori:
+        if giocatore and giocatore in formazione:
+            stato["minuti"][giocatore] = minutes_for_player(
+                giocatore, giocatore in titolari, stato["sub_in"], stato["sub_out"], stato["espulsione"], durata
+            )
+
+
+def _aggiorna_risultato(dati):
+    dati["risultato"] = f"{len(dati['goal_dettaglio'])}-{len(dati['goal_subiti_dettaglio'])}"
+
+
+def _applica(stato, evento):
+    """
+    Fold one event into the state, recomputing only the minutes it affects
+
+    Args:
+        stato (dict): State built by _nuovo_stato
+        evento (dict): Event read from the log
+    """
+    stato["seq"] = max(stato["seq"], evento.get("seq", 0))
+    stato["eventi"].append(evento)
+    tipo = evento["tipo"]
+
+    if tipo == "annulla":
+        stato["annullati"].add(evento["evento"])
+        _ricostruisci(stato)
+        return
+    if evento.get("seq") in stato["annullati"]:
+        return
+
+    if tipo == "inizio":
+        formazione = list(evento["formazione"])
+        stato["dati"] = {
+            "giornata": evento["giornata"],
+            "squadra": evento["squadra"],
+            "home_away": evento["home_away"],
+            "risultato": "0-0",
+            "recupero": 0,
+            "formazione": formazione,
+            "substitutions": [],
+            "ammonizioni": [],
+            "espulsioni": [],
+            "goal": [],
+            "goal_dettaglio": [],
+            "goal_subiti_dettaglio": [],
+            "non_convocati": [],
+        }
+        stato["in_campo"] = set(p for p in formazione[0:11] if p)
+        _ricalcola_minuti(stato, formazione)
+        return
+
+    dati = stato["dati"]
+    if dati is None:
+        return
+    minuto = evento.get("minuto")
+
+    if tipo == "gol":
+        dati["goal"].append(evento["giocatore"])
+        dati["goal_dettaglio"].append({"giocatore": evento["giocatore"], "minuto": minuto})
+        _aggiorna_risultato(dati)
+    elif tipo == "gol_subito":
+        dati["goal_subiti_dettaglio"].append({"minuto": minuto})
+        _aggiorna_risultato(dati)
+    elif tipo == "sostituzione":
+        entra, esce = evento["entra"], evento["esce"]
+        # Stessa convenzione dei file salvati: 'sub_out' entra in campo, 'sub_in' esce
+        dati["substitutions"].append({"sub_in": esce, "sub_out": entra, "time_sub": minuto})
+        stato["sub_in"][entra] = minuto
+        stato["sub_out"][esce] = minuto
+        stato["in_campo"].discard(esce)
+        stato["in_campo"].add(entra)
+        _ricalcola_minuti(stato, [entra, esce])
+    elif tipo == "ammonizione":
+        dati["ammonizioni"].append(evento["giocatore"])
+    elif tipo == "espulsione":
+        giocatore = evento["giocatore"]
+        dati["espulsioni"].append({"esp_player": giocatore, "time_esp": minuto})
+        stato["espulsione"][giocatore] = minuto
+        stato["in_campo"].discard(giocatore)
+        _ricalcola_minuti(stato, [giocatore])
+    elif tipo == "fine":
+        dati["recupero"] = evento.get("recupero", 0)
+        dati["non_convocati"] = evento.get("non_convocati", [])
+        stato["chiusa"] = True
+        # Il recupero cambia la durata: ricalcola tutti
+        _ricalcola_minuti(stato, dati["formazione"])
+
+
+def _ricostruisci(stato):
+    """Refold the events already in memory, after an undo (no disk read)"""
+    eventi, annullati = stato["eventi"], stato["annullati"]
+    nuovo = _nuovo_stato()
+    nuovo["annullati"] = annullati
+    for evento in eventi:
+        if evento["tipo"] == "annulla":
+            nuovo["eventi"].append(evento)
+            nuovo["seq"] = max(nuovo["seq"], evento["seq"])
+        else:
+            _applica(nuovo, evento)
+    nuovo["offset"], nuovo["inode"] = stato["offset"], stato["inode"]
+    stato.clear()
+    stato.update(nuovo)
+
+
+def _leggi_nuovi_eventi(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _stati.pop(path, None)
+        return None
+
+    stato = _stati.get(path)
+    # File sostituito o troncato: si riparte da capo
+    if stato is None or stato["inode"] != st.st_ino or st.st_size < stato["offset"]:
+        stato = _nuovo_stato()
+        stato["inode"] = st.st_ino
+        _stati[path] = stato
+
+    if st.st_size > stato["offset"]:
+        with open(path, "rb") as f:
+            f.seek(stato["offset"])
+            blocco = f.read()
+        # Una riga senza "\n" finale è una scrittura non ancora completa: la si legge al prossimo giro
+        ultima = blocco.rfind(b"\n")
+        if ultima >= 0:
+            for riga in blocco[:ultima].splitlines():
+                if riga.strip():
+                    _applica(stato, json.loads(riga))
+            stato["offset"] += ultima + 1
+    return stato
+
+
+def stato_partita(path):
+    """
+    Current state of a live match, reading only the log lines not seen yet
+
+    Args:
+        path (str): Path of the event log
+
+    Returns:
+        dict | None: State with 'dati' (same format as partita/<squadra>/*.json
+            plus 'goal_dettaglio' and 'goal_subiti_dettaglio'), 'minuti',
+            'in_campo', 'eventi', 'annullati' and 'chiusa'; None if the log
+            does not exist
+    """
+    with _lock:
+        return _leggi_nuovi_eventi(path)
+
+
+def _valida(stato, evento):
+    tipo = evento["tipo"]
+    if tipo not in TIPI_EVENTO:
+        raise ValueError(f"Tipo di evento sconosciuto: {tipo}")
+    if tipo == "inizio":
+        if stato is not None and stato["dati"] is not None:
+            raise ValueError("Partita già iniziata")
+        return
+    if stato is None or stato["dati"] is None:
+        raise ValueError("Partita non ancora iniziata")
+    if stato["chiusa"]:
+        raise ValueError("Partita già chiusa")
+
+    if "minuto" in evento and (not isinstance(evento["minuto"], int) or evento["minuto"] < 0):
+        raise ValueError(f"Minuto non valido: {evento['minuto']}")
+
+    formazione = stato["dati"]["formazione"]
+    if tipo == "gol":
+        if evento["giocatore"] != "autogol" and evento["giocatore"] not in stato["in_campo"]:
+            raise ValueError(f"{evento['giocatore']} non è in campo")
+    elif tipo == "sostituzione":
+        if evento["esce"] not in stato["in_campo"]:
+            raise ValueError(f"{evento['esce']} non è in campo")
+        entra = evento["entra"]
+        if entra not in formazione or entra in stato["in_campo"] or entra in stato["espulsione"]:
+            raise ValueError(f"{entra} non è disponibile in panchina")
+        # I minuti (calculate_player_minutes) tengono un solo ingresso e una sola uscita per giocatore:
+        # un rientro sovrascriverebbe la sostituzione precedente
+        if entra in stato["sub_out"]:
+            raise ValueError(f"{entra} è già stato sostituito e non può rientrare")
+    elif tipo in ("ammonizione", "espulsione"):
+        if evento["giocatore"] not in formazione:
+            raise ValueError(f"{evento['giocatore']} non è in distinta")
+        if tipo == "espulsione" and evento["giocatore"] in stato["espulsione"]:
+            raise ValueError(f"{evento['giocatore']} è già stato espulso")
+    elif tipo == "annulla":
+        bersaglio = next((e for e in stato["eventi"] if e.get("seq") == evento["evento"]), None)
+        if bersaglio is None or bersaglio["tipo"] in ("inizio", "annulla", "fine") or evento["evento"] in stato["annullati"]:
+            raise ValueError(f"Evento {evento['evento']} non annullabile")
+
+
+def registra_evento(path, tipo, **campi):
+    """
+    Append one event to the log of a live match
+
+    The line is appended and flushed to disk; the match document is never
+    rewritten while the match is in progress.
+
+    Args:
+        path (str): Path of the event log
+        tipo (str): One of TIPI_EVENTO
+        **campi: Event fields (e.g. giocatore, minuto, entra, esce)
+
+    Returns:
+        dict: Updated state (see stato_partita)
+
+    Raises:
+        ValueError: If the event is not consistent with the match so far
+    """
+    # Il lock della squadra serializza anche gli eventi registrati da altri processi
+    with _lock, lock_squadra(_squadra_del_log(path)):
+        stato = _leggi_nuovi_eventi(path)
+        evento = {"tipo": tipo, **campi}
+        _valida(stato, evento)
+        return _accoda(path, stato, evento)
+
+
+def _accoda(path, stato, evento):
+    # Da chiamare con _lock e il lock della squadra, dopo _valida
+    evento["seq"] = (stato["seq"] if stato else 0) + 1
+    evento["ts"] = datetime.now().isoformat(timespec="seconds")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(evento, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    return _leggi_nuovi_eventi(path)
+
+
+def inizia_partita(path, giornata, squadra, home_away, formazione):
+    return registra_evento(path, "inizio", giornata=giornata, squadra=squadra, home_away=home_away, formazione=list(formazione))
+
+
+def chiudi_partita(path, path_json, recupero, non_convocati, versione_attesa=None):
+    """
+    Close a live match and write its document once, derived from the log
+
+    The document is written before the "fine" event is logged: if the save
+    fails (e.g. ConflittoVersione) the match stays open and can be closed
+    again.
+
+    Args:
+        path (str): Path of the event log
+        path_json (str): Destination match file (partita/<squadra>/<nome>.json)
+        recupero (int): Recovery minutes
+        non_convocati (list): [{"giocatore": ..., "motivo": ...}]
+        versione_attesa (str): Version of path_json loaded by the caller,
+            see storage.scrittura_atomica
+
+    Returns:
+        tuple: (match data as written to path_json, version of the written file)
+
+    Raises:
+        ValueError: If the match is not started or already closed
+        ConflittoVersione: path_json changed since versione_attesa was read
+    """
+    from anagrafica import aggiungi_id_partita
+
+    squadra = _squadra_del_log(path)
+    with _lock, lock_squadra(squadra):
+        stato = _leggi_nuovi_eventi(path)
+        evento = {"tipo": "fine", "recupero": recupero, "non_convocati": non_convocati}
+        _valida(stato, evento)
+
+        # Copia: lo stato in cache resta quello ricavato dal solo registro
+        dati = json.loads(json.dumps(stato["dati"]))
+        dati["recupero"] = recupero
+        dati["non_convocati"] = [dict(voce) for voce in non_convocati]
+        aggiungi_id_partita(dati)
+
+        nuova = scrivi_json(path_json, dati, squadra, versione_attesa, indent=2)
+        _accoda(path, stato, evento)
+    return dati, nuova
+
+
+def minuto_corrente(stato, squadra, adesso=None):
+    """
+    Minutes elapsed since kick-off, capped at the regular duration of the
+    squad's category (default for new events)
+
+    Args:
+        stato (dict): State returned by stato_partita
+        squadra (str): Squad code (e.g. "U16P")
+        adesso (datetime): Current time, default now
+    """
+    inizio = next((e for e in stato["eventi"] if e["tipo"] == "inizio"), None)
+    if inizio is None:
+        return 0
+    adesso = adesso or datetime.now()
+    trascorsi = int((adesso - datetime.fromisoformat(inizio["ts"])).total_seconds() // 60)
+    durata = (durata_partita(squadra) or 80) + stato["dati"].get("recupero", 0)
+    return max(0, min(trascorsi, durata))
+
+
+def timeline(stato):
+    """
+    Match events in minute order, undone events excluded
+
+    Returns:
+        list: Rows with 'seq', 'minuto', 'evento' and 'dettaglio'
+    """
+    righe = []
+    for evento in stato["eventi"]:
+        tipo = evento["tipo"]
+        if tipo in ("inizio", "annulla", "fine") or evento["seq"] in stato["annullati"]:
+            continue
+        if tipo == "sostituzione":
+            dettaglio = f"{evento['entra']} ⇄ {evento['esce']}"
+        else:
+            dettaglio = evento.get("giocatore", "")
+        righe.append({"seq": evento["seq"], "minuto": evento.get("minuto"), "evento": tipo, "dettaglio": dettaglio})
+    return sorted(righe, key=lambda r: (r["minuto"], r["seq"]))
@@ -0,0 +1,112 @@
+import base64
+
+import numpy as np
+
+# Codici presenza: l'indice nella lista è il valore salvato nella matrice
+CODICI = ["", "P", "AI", "MS", "ML", "I", "MP"]
+_INDICE_CODICI = {codice: idx for idx, codice in enumerate(CODICI)}
+_ARRAY_CODICI = np.array(CODICI, dtype=object)
+
+FORMATO = 2
+
+
+def codice_to_int(codice):
+    """
+    Small-integer value of an attendance code
+
+    Args:
+        codice (str): One of CODICI, None/NaN are treated as empty
+
+    Returns:
+        int: Index of the code in CODICI
+    """
+    if codice is None or codice != codice:  # None o NaN
+        return 0
+    try:
+        return _INDICE_CODICI[codice]
+    except KeyError:
+        raise ValueError(f"Codice presenza non valido: {codice!r}")
+
+
+def codifica_mese(dati_mese):
+    """
+    Encode a month stored as nested dicts into a players x days matrix
+
+    Args:
+        dati_mese (dict): {"dd/mm": {player: code}}
+
+    Returns:
+        tuple: (giocatori, giorni, matrice) with matrice a uint8 array
+    """
+    giorni = list(dati_mese)
+    giocatori = list(dict.fromkeys(g for giorno in giorni for g in dati_mese[giorno]))
+    indice_giocatori = {g: idx for idx, g in enumerate(giocatori)}
+
+    matrice = np.zeros((len(giocatori), len(giorni)), dtype=np.uint8)
+    for col, giorno in enumerate(giorni):
+        for giocatore, codice in dati_mese[giorno].items():
+            matrice[indice_giocatori[giocatore], col] = codice_to_int(codice)
+    return giocatori, giorni, matrice
+
+
+def decodifica_mese(giocatori, giorni, matrice):
+    """Inverse of codifica_mese: {"dd/mm": {player: code}}"""
+    valori = _ARRAY_CODICI[matrice]
+    return {
+        giorno: {giocatore: valori[riga, col] for riga, giocatore in enumerate(giocatori)}
+        for col, giorno in enumerate(giorni)
+    }
+
+
+def codifica_dataframe(df):
+    """
+    Encode the DataFrame edited in st.data_editor (players x days)
+
+    Returns:
+        tuple: (giocatori, giorni, matrice)
+    """
+    import pandas as pd
+
+    valori = df.to_numpy(dtype=object)
+    pieni = ~pd.isna(valori)
+    matrice = np.zeros(valori.shape, dtype=np.uint8)
+    for codice in set(valori[pieni].tolist()):
+        idx = codice_to_int(codice)
+        if idx:
+            matrice[pieni & (valori == codice)] = idx
+
+    giocatori = [str(g) for g in df.index]
+    giorni = [str(c) for c in df.columns]
+    return giocatori, giorni, matrice
+
+
+def decodifica_dataframe(giocatori, giorni, matrice):
+    """DataFrame (players x days) with string codes, as consumed by st.data_editor"""
+    import pandas as pd
+
+    return pd.DataFrame(_ARRAY_CODICI[matrice], index=giocatori, columns=giorni)
+
+
+def to_json(giocatori, giorni, matrice):
+    """On-disk form: index tables stored once, cells as base64 bytes"""
+    return {
+        "formato": FORMATO,
+        "giocatori": list(giocatori),
+        "giorni": list(giorni),
+        "celle": base64.b64encode(np.ascontiguousarray(matrice, dtype=np.uint8).tobytes()).decode("ascii"),
+    }
+
+
+def from_json(dati):
+    """
+    Read either the compact form or a legacy {"dd/mm": {player: code}} month
+
+    Returns:
+        tuple: (giocatori, giorni, matrice)
+    """
+    if dati.get("formato") == FORMATO:
+        giocatori = dati["giocatori"]
+        giorni = dati["giorni"]
+        matrice = np.frombuffer(base64.b64decode(dati["celle"]), dtype=np.uint8)
+        return giocatori, giorni, matrice.reshape(len(giocatori), len(giorni))
+    return codifica_mese(dati)
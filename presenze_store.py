@@ -0,0 +1,170 @@
+import json
+import os
+
+from file_cache import cached_load, load_json
+from presenze_matrice import codifica_mese, decodifica_mese, from_json, to_json
+from profilazione import cronometra
+from storage import NUOVO, ConflittoVersione, scrivi_json, versione
+
+# Percorsi base: presenze/<squadra>/<AAAA-MM>.json, un file per mese in
+# formato compatto (vedi presenze_matrice)
+dir_presenze = "presenze"
+
+
+def get_presenze_dir(squadra):
+    return os.path.join(dir_presenze, squadra)
+
+
+def get_presenze_mese_path(squadra, chiave_mese):
+    return os.path.join(get_presenze_dir(squadra), f"{chiave_mese}.json")
+
+
+def get_presenze_legacy_path(squadra):
+    """Single-file archive used before per-month storage (presenze/<squadra>.json)"""
+    return os.path.join(dir_presenze, f"{squadra}.json")
+
+
+def versione_mese(squadra, chiave_mese):
+    """Version of a saved month (see storage.versione), None if never saved"""
+    return versione(get_presenze_mese_path(squadra, chiave_mese))
+
+
+def _leggi_matrice(path):
+    with open(path, "r") as f:
+        dati = json.load(f)
+    return (*from_json(dati), dati.get("id_giocatori"))
+
+
+@cronometra()
+def load_matrice_mese(squadra, chiave_mese, con_id=False):
+    """
+    Attendance of a single month as an encoded matrix
+
+    Args:
+        squadra (str): Squad code
+        chiave_mese (str): Month key, e.g. "2025-06"
+        con_id (bool): Also return the registry ids stored with the rows
+
+    Returns:
+        tuple: (giocatori, giorni, matrice), plus id_giocatori (None for
+            months saved without ids) if con_id; None if the month was never saved
+    """
+    path = get_presenze_mese_path(squadra, chiave_mese)
+    if os.path.exists(path):
+        encoded = cached_load(path, _leggi_matrice)
+    else:
+        # Mese non ancora migrato: leggi l'archivio unico
+        legacy_path = get_presenze_legacy_path(squadra)
+        dati_mese = load_json(legacy_path).get(chiave_mese) if os.path.exists(legacy_path) else None
+        if dati_mese is None:
+            return None
+        encoded = (*codifica_mese(dati_mese), None)
+    return encoded if con_id else encoded[:3]
+
+
+@cronometra()
+def save_matrice_mese(squadra, chiave_mese, giocatori, giorni, matrice, versione_attesa=None):
+    """
+    Save one month atomically, without touching the other months
+
+    Args:
+        squadra (str): Squad code
+        chiave_mese (str): Month key, e.g. "2025-06"
+        giocatori (list): Row labels
+        giorni (list): Column labels ("dd/mm")
+        matrice (numpy.ndarray): uint8 codes, see presenze_matrice.CODICI
+        versione_attesa (str): Version the month was loaded at (see versione_mese);
+            None overwrites unconditionally
+
+    Returns:
+        str: Version of the saved month
+
+    Raises:
+        storage.ConflittoVersione: The month was saved by someone else after versione_attesa
+    """
+    from anagrafica import ids
+
+    dati = to_json(giocatori, giorni, matrice)
+    # Id del registro giocatori allineati alle righe, per i join tra squadre e stagioni
+    dati["id_giocatori"] = ids(dati["giocatori"])
+    return scrivi_json(
+        get_presenze_mese_path(squadra, chiave_mese), dati, squadra, versione_attesa, separators=(",", ":")
+    )
+
+
+def load_presenze_mese(squadra, chiave_mese):
+    """
+    Attendance of a single month as nested dicts
+
+    Returns:
+        dict: {"dd/mm": {player: code}} or None if the month was never saved
+    """
+    encoded = load_matrice_mese(squadra, chiave_mese)
+    if encoded is None:
+        return None
+    return decodifica_mese(*encoded)
+
+
+def save_presenze_mese(squadra, chiave_mese, dati_mese, versione_attesa=None):
+    """Save one month given as {"dd/mm": {player: code}}, see save_matrice_mese"""
+    return save_matrice_mese(squadra, chiave_mese, *codifica_mese(dati_mese), versione_attesa=versione_attesa)
+
+
+def elenco_mesi(squadra):
+    """Sorted month keys with saved attendance"""
+    mesi = set()
+    directory = get_presenze_dir(squadra)
+    if os.path.isdir(directory):
+        mesi.update(f[:-5] for f in os.listdir(directory) if f.endswith(".json"))
+
+    legacy_path = get_presenze_legacy_path(squadra)
+    if os.path.exists(legacy_path):
+        mesi.update(load_json(legacy_path).keys())
+    return sorted(mesi)
+
+
+def load_presenze(squadra):
+    """
+    Attendance of every saved month
+
+    Returns:
+        dict: {chiave_mese: {"dd/mm": {player: code}}}
+    """
+    return {chiave_mese: load_presenze_mese(squadra, chiave_mese) for chiave_mese in elenco_mesi(squadra)}
+
+
+def migra_presenze(squadra):
+    """
+    Split the legacy presenze/<squadra>.json into per-month files
+
+    Months already saved in the new layout are left untouched. The legacy
+    file is kept; it is only read for months missing from the new layout.
+
+    Returns:
+        int: Number of months written
+    """
+    legacy_path = get_presenze_legacy_path(squadra)
+    if not os.path.exists(legacy_path):
+        return 0
+
+    scritti = 0
+    for chiave_mese, dati_mese in load_json(legacy_path).items():
+        if os.path.exists(get_presenze_mese_path(squadra, chiave_mese)):
+            continue
+        try:
+            # NUOVO: un mese salvato dall'app durante la migrazione non viene sovrascritto
+            save_presenze_mese(squadra, chiave_mese, dati_mese, versione_attesa=NUOVO)
+            scritti += 1
+        except ConflittoVersione:
+            pass
+    return scritti
+
+
+if __name__ == "__main__":
+    import sys
+
+    squadre = sys.argv[1:] or sorted(
+        f[:-5] for f in os.listdir(dir_presenze) if f.endswith(".json")
+    )
+    for squadra in squadre:
+        print(f"{squadra}: {migra_presenze(squadra)} mesi migrati")
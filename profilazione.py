@@ -0,0 +1,178 @@
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+
+# Profilazione attiva solo con MANAGETEAM_PROFILING=1: quando è spenta cronometra() restituisce
+# la funzione originale e misura() un contesto vuoto condiviso. Il pannello dell'app resta
+# comunque riservato all'amministratore (MANAGETEAM_ADMIN_TOKEN, vedi app.amministratore)
+ABILITATO = os.environ.get("MANAGETEAM_PROFILING") == "1"
+
+# Rerun completati tenuti in memoria per il pannello e l'export
+MAX_RERUN = 50
+
+# Rerun in corso del thread: Streamlit esegue lo script di ogni sessione nel proprio thread
+_locale = threading.local()
+_storico = deque(maxlen=MAX_RERUN)
+# Numero progressivo dei rerun: ogni sessione può nascondere quelli precedenti senza toccare lo storico
+_progressivo = itertools.count(1)
+# Totali dall'avvio del processo: nome -> [chiamate, secondi]
+_totali = {}
+_lock = threading.Lock()
+_NULLO = nullcontext()
+
+
+def _registra(nome, secondi):
+    rerun = getattr(_locale, "rerun", None)
+    if rerun is not None:
+        voce = rerun["tempi"].setdefault(nome, [0, 0.0])
+        voce[0] += 1
+        voce[1] += secondi
+    with _lock:
+        voce = _totali.setdefault(nome, [0, 0.0])
+        voce[0] += 1
+        voce[1] += secondi
+
+
+class _Misura:
+    __slots__ = ("nome", "inizio")
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self.inizio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _registra(self.nome, time.perf_counter() - self.inizio)
+        return False
+
+
+def misura(nome):
+    """
+    Context manager timing a block under the given name
+
+    Example:
+        with misura("grafico: radar"):
+            fig = go.Figure(...)
+    """
+    return _Misura(nome) if ABILITATO else _NULLO
+
+
+def cronometra(nome=None):
+    """
+    Decorator timing every call of a function
+
+    Applied at import time: with profiling disabled the function is returned
+    unchanged, so instrumented hot paths cost nothing.
+
+    Args:
+        nome (str): Name in the reports, default "<module>.<function>"
+    """
+    def decoratore(funzione):
+        if not ABILITATO:
+            return funzione
+        etichetta = nome or f"{funzione.__module__}.{funzione.__qualname__}"
+
+        @functools.wraps(funzione)
+        def avvolta(*args, **kwargs):
+            inizio = time.perf_counter()
+            try:
+                return funzione(*args, **kwargs)
+            finally:
+                _registra(etichetta, time.perf_counter() - inizio)
+
+        return avvolta
+
+    return decoratore
+
+
+def conta(nome, n=1):
+    """Increment a counter of the current rerun (no-op when profiling is disabled)"""
+    if not ABILITATO:
+        return
+    rerun = getattr(_locale, "rerun", None)
+    if rerun is not None:
+        rerun["contatori"][nome] = rerun["contatori"].get(nome, 0) + n
+
+
+def inizia_rerun():
+    """Start collecting timings for a new run of the script in this thread"""
+    if ABILITATO:
+        _locale.rerun = {"inizio": time.perf_counter(), "ts": datetime.now().isoformat(timespec="seconds"),
+                         "tempi": {}, "contatori": {}}
+
+
+def fine_rerun(etichetta=""):
+    """
+    Close the current rerun and add it to the history
+
+    Args:
+        etichetta (str): Page or section that was drawn
+
+    Returns:
+        dict: The rerun record ("n", "ts", "etichetta", "totale", "tempi",
+            "contatori") or None if no rerun was started
+    """
+    rerun = getattr(_locale, "rerun", None)
+    if rerun is None:
+        return None
+    _locale.rerun = None
+    record = {
+        "n": next(_progressivo),
+        "ts": rerun["ts"],
+        "etichetta": etichetta,
+        "totale": round(time.perf_counter() - rerun["inizio"], 6),
+        "tempi": {nome: {"chiamate": c, "secondi": round(s, 6)} for nome, (c, s) in rerun["tempi"].items()},
+        "contatori": rerun["contatori"],
+    }
+    with _lock:
+        _storico.append(record)
+    return record
+
+
+def storico(dopo=0):
+    """
+    Completed reruns, oldest first
+
+    Args:
+        dopo (int): Only reruns with a progressive number greater than this
+    """
+    with _lock:
+        return [r for r in _storico if r["n"] > dopo]
+
+
+def totali():
+    """Calls and seconds per name since the process started, slowest first"""
+    with _lock:
+        voci = [(nome, c, s) for nome, (c, s) in _totali.items()]
+    voci.sort(key=lambda v: v[2], reverse=True)
+    return {nome: {"chiamate": c, "secondi": round(s, 6)} for nome, c, s in voci}
+
+
+def esporta_json():
+    """
+    Profiling data as a JSON string, to compare deployments
+
+    Returns:
+        str: JSON with host info, file cache statistics, process totals and
+            the recent reruns
+    """
+    from file_cache import cache_stats
+
+    dati = {
+        "esportato": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "pid": os.getpid(),
+        "file_cache": cache_stats(),
+        "totali": totali(),
+        "rerun": storico(),
+    }
+    return json.dumps(dati, indent=2, ensure_ascii=False)
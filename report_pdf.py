@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from profilazione import cronometra
+
+# Percorsi base
+dir_partite = "partita"
+dir_report = "report"
+
+# Stesso logo mostrato dall'app
+LOGO_PATH = os.path.join("static", "logo.png")
+
+# Loghi già decodificati in questo processo (uno per worker nei batch)
+_loghi = {}
+
+
+def carica_logo(logo_path):
+    """Decoded logo, read from disk only the first time; None if missing or unreadable"""
+    if logo_path not in _loghi:
+        logo = None
+        if os.path.exists(logo_path):
+            try:
+                logo = ImageReader(logo_path)
+            except Exception as e:
+                print("Errore caricamento logo:", e)
+        _loghi[logo_path] = logo
+    return _loghi[logo_path]
+
+
+def _intestazione(c, logo):
+    """Draw the page header; defined once per canvas as a reusable form"""
+    if logo is None:
+        return
+    if not getattr(c, "_intestazione_definita", False):
+        width, height = A4
+        c.beginForm("intestazione")
+        c.drawImage(logo, 40, height - 100, width=80, preserveAspectRatio=True, mask='auto')
+        c.endForm()
+        c._intestazione_definita = True
+    c.doForm("intestazione")
+
+
+def righe_partita(dati):
+    """
+    Text lines of a match report, without touching any canvas
+
+    Args:
+        dati (dict): Match data, same format as partita/<squadra>/*.json
+
+    Returns:
+        list: (text, gap, bold) tuples
+
+    Raises:
+        KeyError, TypeError: If the match data is malformed
+    """
+    righe = []
+
+    def scrivi_riga(testo, gap=16, bold=False):
+        righe.append((testo, gap, bold))
+
+    scrivi_riga(f"📄 REPORT PARTITA", bold=True)
+    scrivi_riga(f"Giornata: {dati['giornata']} - Squadra: {dati['squadra']}")
+    scrivi_riga(f"In casa: {dati['home_away']} - Risultato: {dati['risultato']} - Recupero: {dati['recupero']} min")
+    scrivi_riga("-" * 90)
+
+    scrivi_riga("🧤 Formazione:", bold=True)
+    for i, giocatore in enumerate(dati["formazione"], 1):
+        ruolo = "Titolare" if i <= 11 else "Panchina"
+        scrivi_riga(f"{i}. {giocatore} ({ruolo})")
+    scrivi_riga("-" * 90)
+
+    if dati["substitutions"]:
+        scrivi_riga("🔁 Sostituzioni:", bold=True)
+        for s in dati["substitutions"]:
+            scrivi_riga(f"Min {s['time_sub']}: {s['sub_out']} → {s['sub_in']}")
+        scrivi_riga("-" * 90)
+
+    if dati["goal"]:
+        scrivi_riga("⚽ Gol:", bold=True)
+        for i, g in enumerate(dati["goal"], 1):
+            scrivi_riga(f"{i}. {g}")
+        scrivi_riga("-" * 90)
+
+    if dati["ammonizioni"]:
+        scrivi_riga("🟨 Ammoniti:", bold=True)
+        for a in dati["ammonizioni"]:
+            scrivi_riga(f"- {a}")
+        scrivi_riga("-" * 90)
+
+    if dati["espulsioni"]:
+        scrivi_riga("🟥 Espulsioni:", bold=True)
+        for e in dati["espulsioni"]:
+            scrivi_riga(f"- {e['esp_player']} al minuto {e['time_esp']}")
+        scrivi_riga("-" * 90)
+
+    if dati["non_convocati"]:
+        scrivi_riga("🚫 Non convocati:", bold=True)
+        for nc in dati["non_convocati"]:
+            scrivi_riga(f"- {nc['giocatore']} ({nc['motivo']})")
+        scrivi_riga("-" * 90)
+
+    return righe
+
+
+def disegna_partita(c, dati, logo=None, righe=None):
+    """
+    Draw the report of one match on a canvas, starting on the current page
+
+    Args:
+        c (canvas.Canvas): Target canvas
+        dati (dict): Match data, same format as partita/<squadra>/*.json
+        logo (ImageReader): Decoded logo, see carica_logo
+        righe (list): Lines already built with righe_partita(dati)
+    """
+    # Le righe vengono preparate prima di disegnare: dati malformati non lasciano pagine a metà
+    righe = righe if righe is not None else righe_partita(dati)
+    width, height = A4
+    y = height - 50
+
+    # Inserisci logo in alto a sinistra se esiste
+    _intestazione(c, logo)
+
+    y -= 100  # Spazio sotto al logo
+
+    for testo, gap, bold in righe:
+        if y < 100:
+            c.showPage()
+            y = height - 50
+        if bold:
+            c.setFont("Helvetica-Bold", 11)
+        else:
+            c.setFont("Helvetica", 10)
+        c.drawString(50, y, testo)
+        y -= gap
+
+    c.showPage()
+
+
+@cronometra()
+def genera_pdf_partita(dati, logo_path=LOGO_PATH):
+    """Report of one match as an in-memory PDF (used by the download button)"""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    disegna_partita(c, dati, carica_logo(logo_path))
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def genera_pdf_file(dati, percorso, logo_path=LOGO_PATH):
+    """Report of one match written straight to percorso"""
+    c = canvas.Canvas(percorso, pagesize=A4)
+    disegna_partita(c, dati, carica_logo(logo_path))
+    c.save()
+    return percorso
+
+
+def elenco_partite(squadra):
+    """Match files of a squad, ordered by matchday"""
+    dir_squadra = os.path.join(dir_partite, squadra)
+    if not os.path.isdir(dir_squadra):
+        return []
+
+    def estrai_numero(file):
+        try:
+            return int(file.split("_")[0])
+        except ValueError:
+            return 0
+
+    nomi = sorted((f for f in os.listdir(dir_squadra) if f.endswith(".json")), key=estrai_numero)
+    return [os.path.join(dir_squadra, f) for f in nomi]
+
+
+def _genera_da_json(args):
+    path, percorso, logo_path = args
+    with open(path, "r") as f:
+        return genera_pdf_file(json.load(f), percorso, logo_path)
+
+
+@cronometra()
+def genera_pdf_stagione(squadra, dir_output=None, jobs=None, logo_path=LOGO_PATH):
+    """
+    One PDF per match of a squad, generated in parallel worker processes
+
+    Args:
+        squadra (str): Squad code
+        dir_output (str): Output directory, report/<squadra> by default
+        jobs (int): Worker processes, defaults to the CPU count
+        logo_path (str): Logo drawn in the header
+
+    Returns:
+        list: Paths of the generated PDF files
+    """
+    dir_output = dir_output or os.path.join(dir_report, squadra)
+    os.makedirs(dir_output, exist_ok=True)
+
+    lavori = [
+        (path, os.path.join(dir_output, os.path.basename(path).replace(".json", ".pdf")), logo_path)
+        for path in elenco_partite(squadra)
+    ]
+    if not lavori:
+        return []
+    if jobs == 1:
+        return [_genera_da_json(lavoro) for lavoro in lavori]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_genera_da_json, lavori))
+
+
+@cronometra()
+def genera_libretto_stagione(squadra, percorso=None, logo_path=LOGO_PATH):
+    """
+    Every match of a squad merged into a single PDF booklet
+
+    The header is defined once as a form and reused on every match.
+    Unreadable or malformed match files are skipped and reported.
+
+    Returns:
+        tuple: (path of the booklet, None if the squad has no readable
+            matches; errors as file name -> error message)
+    """
+    partite = elenco_partite(squadra)
+    errori = {}
+    leggibili = []
+    for path in partite:
+        try:
+            with open(path, "r") as f:
+                dati = json.load(f)
+            leggibili.append((dati, righe_partita(dati)))
+        except Exception as e:
+            errori[os.path.basename(path)] = str(e)
+    if not leggibili:
+        return None, errori
+
+    percorso = percorso or os.path.join(dir_report, f"{squadra}_stagione.pdf")
+    os.makedirs(os.path.dirname(percorso) or ".", exist_ok=True)
+
+    c = canvas.Canvas(percorso, pagesize=A4)
+    logo = carica_logo(logo_path)
+    for dati, righe in leggibili:
+        disegna_partita(c, dati, logo, righe)
+    c.save()
+    return percorso, errori
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera i report PDF delle partite di una stagione")
+    parser.add_argument("squadra")
+    parser.add_argument("--libretto", action="store_true", help="Un unico PDF con tutte le partite")
+    parser.add_argument("--jobs", type=int, default=None, help="Processi in parallelo")
+    parser.add_argument("--logo", default=LOGO_PATH)
+    args = parser.parse_args()
+
+    if args.libretto:
+        percorso, errori = genera_libretto_stagione(args.squadra, logo_path=args.logo)
+        for nome, errore in errori.items():
+            print(f"Errore {nome}: {errore}", file=sys.stderr)
+        print(percorso)
+    else:
+        for percorso in genera_pdf_stagione(args.squadra, jobs=args.jobs, logo_path=args.logo):
+            print(percorso)
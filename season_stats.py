@@ -0,0 +1,435 @@
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from calculate_minutes import analyze_match
+from profilazione import cronometra
+from storage import versione
+
+# Percorsi base
+dir_partite = "partita"
+dir_cache_stats = os.path.join(".cache", "stats")
+
+CACHE_VERSION = 2
+
+PLAYER_KEYS = ["minuti", "partite", "titolari", "subentri", "sostituzioni", "gol", "ammonizioni", "espulsioni"]
+TEAM_KEYS = ["partite", "gol", "ammonizioni", "espulsioni", "gol_subiti"]
+
+# Aggregati già caricati in questo processo (Streamlit riesegue lo script, non reimporta il modulo):
+# squadra -> (versione del file in .cache/stats, aggregato). Se il file viene riscritto da un altro
+# processo (es. il watcher di cli.py) l'aggregato viene riletto dal disco invece di essere ricalcolato
+_aggregati = {}
+_lock_aggregati = {}
+_lock_registro = threading.Lock()
+
+
+def durata_partita(squadra):
+    """
+    Regular match duration for a squad category
+
+    Args:
+        squadra (str): Squad code (e.g. "U16P")
+
+    Returns:
+        int: Duration in minutes, 0 if the category is unknown
+    """
+    if squadra in ["PP", "U19", "U18"] or squadra.startswith("U17"):
+        return 90
+    elif squadra.startswith("U16"):
+        return 80
+    elif squadra.startswith("U15") or squadra.startswith("U14"):
+        return 70
+    return 0
+
+
+def get_cache_path(squadra):
+    return os.path.join(dir_cache_stats, f"{squadra}.json")
+
+
+def _empty_aggregate():
+    return {
+        "versione": CACHE_VERSION,
+        "file": {},
+        "giocatori": {},
+        "squadra": {key: 0 for key in TEAM_KEYS},
+    }
+
+
+def process_match_file(path):
+    """
+    Compute the contribution of a single match file to the season totals
+
+    Args:
+        path (str): Path to the match JSON file
+
+    Returns:
+        dict: Per-player and team counters for this match
+    """
+    from anagrafica import chiavi_partita
+
+    with open(path, 'r') as f:
+        match_data = json.load(f)
+
+    chiavi = chiavi_partita(match_data)
+    record = analyze_match(match_data)
+    contribution = match_contribution(record, chiavi)
+    # Nomi senza id salvato: la chiave dipende dal registro, vanno rielaborati se cambia
+    contribution["senza_id"] = any(player not in chiavi for player in record["detailed_status"] if player)
+    return contribution
+
+
+def match_contribution(record, chiavi=None):
+    """
+    Turn an analyze_match record into season counters
+
+    Players are keyed by registry id (see anagrafica.chiave_giocatore), so
+    every spelling of a player adds to the same totals.
+
+    Args:
+        record (dict): Record returned by calculate_minutes.analyze_match
+        chiavi (dict): Name -> key from the ids stored in the match (see
+            anagrafica.chiavi_partita); other names are resolved by name
+
+    Returns:
+        dict: Per-player (by key, with the name as written under "nome")
+            and team counters for this match
+    """
+    from anagrafica import chiave_giocatore
+
+    chiavi = chiavi or {}
+    player_minutes = record["minutes"]
+
+    team = {key: 0 for key in TEAM_KEYS}
+    team["partite"] = 1
+    team["gol_subiti"] = record["goals_conceded"]
+
+    players = {}
+    for player, status_parts in record["detailed_status"].items():
+        stats = {key: 0 for key in PLAYER_KEYS}
+
+        if player in player_minutes:
+            stats["minuti"] = player_minutes[player]
+            if player_minutes[player] > 0:
+                stats["partite"] = 1
+
+        if "Titolare" in status_parts:
+            stats["titolari"] = 1
+        if "Sostituito" in status_parts:
+            stats["sostituzioni"] = 1
+        if "Subentrato" in status_parts:
+            stats["subentri"] = 1
+        if "Ammonito" in status_parts:
+            stats["ammonizioni"] = 1
+            team["ammonizioni"] += 1
+        if "Espulso" in status_parts:
+            stats["espulsioni"] = 1
+            team["espulsioni"] += 1
+        if "Gol" in status_parts:
+            stats["gol"] = 1
+            team["gol"] += 1
+
+        stats["nome"] = player
+        chiave = chiavi.get(player) or chiave_giocatore(player)
+        if chiave in players:
+            # Stesso giocatore scritto in due modi nella stessa partita
+            for key in PLAYER_KEYS:
+                players[chiave][key] += stats[key]
+        else:
+            players[chiave] = stats
+
+    return {"giocatori": players, "squadra": team}
+
+
+def _fold(aggregate, contribution, sign):
+    """Add (sign=1) or remove (sign=-1) a match contribution from the totals"""
+    for key in TEAM_KEYS:
+        aggregate["squadra"][key] += sign * contribution["squadra"].get(key, 0)
+
+    totals = aggregate["giocatori"]
+    for player, stats in contribution["giocatori"].items():
+        if player not in totals:
+            totals[player] = {key: 0 for key in PLAYER_KEYS}
+            totals[player]["file"] = 0
+        if sign > 0 and stats.get("nome"):
+            totals[player]["nome"] = stats["nome"]
+        for key in PLAYER_KEYS:
+            totals[player][key] += sign * stats.get(key, 0)
+        totals[player]["file"] += sign
+
+        # Il giocatore compariva solo nelle partite rimosse
+        if totals[player]["file"] <= 0:
+            del totals[player]
+
+
+def _load_cached(squadra):
+    path = get_cache_path(squadra)
+    token = versione(path)
+    if squadra in _aggregati and _aggregati[squadra][0] == token:
+        return _aggregati[squadra]
+
+    if token is not None:
+        try:
+            with open(path, "r") as f:
+                aggregate = json.load(f)
+            if aggregate.get("versione") == CACHE_VERSION:
+                return token, aggregate
+        except (OSError, ValueError):
+            pass
+    return None, _empty_aggregate()
+
+
+def _save_cached(squadra, aggregate):
+    path = get_cache_path(squadra)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(aggregate, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return versione(path)
+
+
+def _copia(aggregate):
+    # Copia dei totali: chi sta leggendo l'aggregato precedente (un'altra sessione) non lo vede cambiare
+    return {
+        **aggregate,
+        "file": dict(aggregate["file"]),
+        "giocatori": {player: dict(stats) for player, stats in aggregate["giocatori"].items()},
+        "squadra": dict(aggregate["squadra"]),
+    }
+
+
+def _lock_squadra(squadra):
+    with _lock_registro:
+        return _lock_aggregati.setdefault(squadra, threading.Lock())
+
+
+@cronometra()
+def update_aggregate(squadra):
+    """
+    Bring the persisted season aggregate of a squad up to date
+
+    Only match files that were added, changed (mtime/size) or removed since
+    the last call are reprocessed, plus files without stored ids when the
+    player registry changed; their contribution is folded into a copy
+    of the running totals, so a returned aggregate never changes afterwards.
+    Safe to call from several threads (the file watcher runs it in the
+    background).
+
+    Args:
+        squadra (str): Squad code
+
+    Returns:
+        dict: Aggregate with "giocatori" (player key -> totals, see
+            match_contribution), "squadra"
+            (team totals) and "errori" (file name -> error message)
+    """
+    from anagrafica import ANAGRAFICA_PATH
+
+    dir_squadra = os.path.join(dir_partite, squadra)
+    with _lock_squadra(squadra):
+        token, aggregate = _load_cached(squadra)
+        anagrafica = versione(ANAGRAFICA_PATH)
+
+        correnti = {}
+        if os.path.isdir(dir_squadra):
+            with os.scandir(dir_squadra) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        correnti[entry.name] = (entry.path, stat.st_mtime_ns, stat.st_size)
+
+        rimossi = [
+            nome for nome, voce in aggregate["file"].items()
+            if nome not in correnti or (voce["mtime"], voce["size"]) != correnti[nome][1:]
+            or (voce.get("senza_id") and aggregate.get("anagrafica") != anagrafica)
+        ]
+        nuovi = [nome for nome in correnti if nome not in aggregate["file"] or nome in rimossi]
+
+        if rimossi or nuovi or token is None or aggregate.get("anagrafica") != anagrafica:
+            aggregate = _copia(aggregate)
+            aggregate["anagrafica"] = anagrafica
+            for nome in rimossi:
+                _fold(aggregate, aggregate["file"].pop(nome), -1)
+
+            for nome in nuovi:
+                path, mtime, size = correnti[nome]
+                try:
+                    voce = process_match_file(path)
+                    voce["errore"] = None
+                except Exception as e:
+                    voce = {"giocatori": {}, "squadra": {}, "errore": str(e)}
+                voce["mtime"] = mtime
+                voce["size"] = size
+                _fold(aggregate, voce, 1)
+                aggregate["file"][nome] = voce
+
+            aggregate["errori"] = {
+                nome: voce["errore"] for nome, voce in aggregate["file"].items() if voce.get("errore")
+            }
+            token = _save_cached(squadra, aggregate)
+        elif "errori" not in aggregate:
+            aggregate["errori"] = {
+                nome: voce["errore"] for nome, voce in aggregate["file"].items() if voce.get("errore")
+            }
+        _aggregati[squadra] = (token, aggregate)
+    return aggregate
+
+
+def verifica_minuti(squadra, aggregate):
+    """
+    Cross-check the minutes of an aggregate against the vectorized engine
+
+    The match files of the aggregate are recomputed in a single batch with
+    minutes_engine, so a full rebuild also validates calculate_player_minutes
+    on the whole season.
+
+    Args:
+        squadra (str): Squad code
+        aggregate (dict): Aggregate returned by update_aggregate
+
+    Returns:
+        list[str]: One message per file and player whose minutes differ
+    """
+    import minutes_engine
+    from anagrafica import chiave_giocatore, chiavi_partita
+
+    nomi_file, partite = [], []
+    for nome, voce in aggregate["file"].items():
+        if voce.get("errore"):
+            continue
+        try:
+            with open(os.path.join(dir_partite, squadra, nome), 'r') as f:
+                partite.append(json.load(f))
+        except (OSError, ValueError):
+            # Cambiato o rimosso dopo il calcolo: sarà ricontrollato al prossimo ricalcolo
+            continue
+        nomi_file.append(nome)
+
+    table = minutes_engine.build_match_table(partite)
+    per_partita = minutes_engine.match_minutes(table, minutes_engine.compute_minutes(table))
+
+    differenze = []
+    for idx, nome in enumerate(nomi_file):
+        chiavi = chiavi_partita(partite[idx])
+        attesi = {}
+        for player, minuti in per_partita.get(idx, {}).items():
+            chiave = chiavi.get(player) or chiave_giocatore(player)
+            attesi[chiave] = attesi.get(chiave, 0) + minuti
+        for chiave, stats in aggregate["file"][nome]["giocatori"].items():
+            if stats["minuti"] != attesi.get(chiave, 0):
+                differenze.append(
+                    f"{nome}: {stats['nome']} {stats['minuti']} minuti, motore vettoriale {attesi.get(chiave, 0)}"
+                )
+    return differenze
+
+
+@cronometra()
+def player_stats_rows(aggregate, durata):
+    """
+    Build the per-player table shown in Reportistica
+
+    Args:
+        aggregate (dict): Aggregate returned by update_aggregate
+        durata (int): Regular match duration for the squad
+
+    Returns:
+        list: One dict per player, sorted by minutes played (descending)
+    """
+    from anagrafica import nome_chiave
+
+    player_stats = []
+    for player, stats in aggregate["giocatori"].items():
+        partite = stats["partite"]
+        player_stats.append({
+            'Giocatore': nome_chiave(player, stats.get("nome")),
+            'Partite': partite,
+            'Minuti': stats["minuti"],
+            'Minuti Disponibili': partite * durata,
+            'Media Minuti': round(stats["minuti"] / partite, 1) if partite > 0 else 0,
+            'Titolari': stats["titolari"],
+            'Subentri': stats["subentri"],
+            'Sostituzioni': stats["sostituzioni"],
+            'Gol': stats["gol"],
+            'Ammonizioni': stats["ammonizioni"],
+            'Espulsioni': stats["espulsioni"]
+        })
+
+    return sorted(player_stats, key=lambda x: x['Minuti'], reverse=True)
+
+
+def normalizza_nome(nome):
+    """
+    Key used to recognise the same player across squads
+
+    Case, extra spaces and name/surname order are ignored, so
+    "FERRAUTI Matteo " and "Matteo  FERRAUTI" give the same key.
+    """
+    return " ".join(sorted(nome.casefold().split()))
+
+
+@cronometra()
+def aggregate_club(squadre, jobs=None):
+    """
+    Update the aggregates of several squads concurrently and merge players
+
+    Args:
+        squadre (list): Squad codes
+        jobs (int): Worker threads, defaults to one per squad
+
+    Returns:
+        tuple: (aggregati, giocatori) where aggregati maps each squad to its
+            update_aggregate result and giocatori maps the player key (see
+            anagrafica.chiave_giocatore, the same in every squad) to merged
+            totals with the list of squads under "squadre"
+    """
+    from anagrafica import nome_chiave
+
+    with ThreadPoolExecutor(max_workers=jobs or max(len(squadre), 1)) as executor:
+        aggregati = dict(zip(squadre, executor.map(update_aggregate, squadre)))
+
+    giocatori = {}
+    for squadra, aggregate in aggregati.items():
+        for chiave, stats in aggregate["giocatori"].items():
+            if chiave not in giocatori:
+                giocatori[chiave] = {key: 0 for key in PLAYER_KEYS}
+                giocatori[chiave]["nome"] = nome_chiave(chiave, stats.get("nome"))
+                giocatori[chiave]["squadre"] = []
+            merged = giocatori[chiave]
+            for key in PLAYER_KEYS:
+                merged[key] += stats[key]
+            if squadra not in merged["squadre"]:
+                merged["squadre"].append(squadra)
+
+    return aggregati, giocatori
+
+
+def club_player_rows(giocatori):
+    """
+    Build the merged per-player table of the club report
+
+    Args:
+        giocatori (dict): Merged players returned by aggregate_club
+
+    Returns:
+        list: One dict per player, sorted by minutes played (descending)
+    """
+    rows = []
+    for stats in giocatori.values():
+        partite = stats["partite"]
+        rows.append({
+            'Giocatore': stats["nome"],
+            'Squadre': ", ".join(stats["squadre"]),
+            'Partite': partite,
+            'Minuti': stats["minuti"],
+            'Media Minuti': round(stats["minuti"] / partite, 1) if partite > 0 else 0,
+            'Titolari': stats["titolari"],
+            'Subentri': stats["subentri"],
+            'Sostituzioni': stats["sostituzioni"],
+            'Gol': stats["gol"],
+            'Ammonizioni': stats["ammonizioni"],
+            'Espulsioni': stats["espulsioni"]
+        })
+
+    return sorted(rows, key=lambda x: x['Minuti'], reverse=True)
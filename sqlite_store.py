@@ -0,0 +1,755 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from core import dir_squadre, nomi_squadre
+
+# Backend SQLite opzionale (MANAGETEAM_BACKEND=sqlite): copia indicizzata e normalizzata dei
+# file JSON/CSV, aggiornata a ogni salvataggio (vedi storage.scrittura_atomica). I file restano
+# la fonte dei dati: il database si può sempre ricostruire con l'importazione.
+ENV_BACKEND = "MANAGETEAM_BACKEND"
+DB_PATH = "manageteam.db"
+
+# Cambiare quando cambia lo schema: il database viene ricreato e reimportato
+SCHEMA_VERSION = 3
+
+dir_partite = "partita"
+dir_convocazioni = "convocazioni"
+dir_presenze = "presenze"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    chiave TEXT PRIMARY KEY,
+    valore TEXT
+);
+CREATE TABLE IF NOT EXISTS file (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS giocatori (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    anno INTEGER
+);
+CREATE TABLE IF NOT EXISTS rosa (
+    squadra TEXT NOT NULL,
+    riga INTEGER NOT NULL,
+    giocatore_id INTEGER,
+    nome TEXT,
+    cognome TEXT,
+    anno INTEGER,
+    ruolo TEXT,
+    PRIMARY KEY (squadra, riga)
+);
+CREATE INDEX IF NOT EXISTS rosa_giocatore ON rosa (giocatore_id);
+
+CREATE TABLE IF NOT EXISTS convocazioni (
+    id INTEGER PRIMARY KEY,
+    squadra TEXT NOT NULL,
+    chiave TEXT NOT NULL,
+    giornata INTEGER,
+    avversario TEXT,
+    data_ora TEXT,
+    documento TEXT NOT NULL,
+    UNIQUE (squadra, chiave)
+);
+CREATE INDEX IF NOT EXISTS convocazioni_giornata ON convocazioni (squadra, giornata);
+CREATE INDEX IF NOT EXISTS convocazioni_data ON convocazioni (squadra, data_ora);
+
+CREATE TABLE IF NOT EXISTS convocati (
+    convocazione_id INTEGER NOT NULL REFERENCES convocazioni (id) ON DELETE CASCADE,
+    posizione INTEGER NOT NULL,
+    giocatore TEXT NOT NULL,
+    giocatore_id INTEGER,
+    convocato INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS convocati_convocazione ON convocati (convocazione_id);
+CREATE INDEX IF NOT EXISTS convocati_giocatore ON convocati (giocatore_id);
+
+CREATE TABLE IF NOT EXISTS partite (
+    id INTEGER PRIMARY KEY,
+    squadra TEXT NOT NULL,
+    chiave TEXT NOT NULL,
+    giornata INTEGER,
+    avversario TEXT,
+    home_away TEXT,
+    risultato TEXT,
+    gol_subiti INTEGER,
+    data TEXT,
+    errore TEXT,
+    documento TEXT NOT NULL,
+    UNIQUE (squadra, chiave)
+);
+CREATE INDEX IF NOT EXISTS partite_giornata ON partite (squadra, giornata);
+CREATE INDEX IF NOT EXISTS partite_data ON partite (squadra, data);
+
+CREATE TABLE IF NOT EXISTS presenze_partita (
+    partita_id INTEGER NOT NULL REFERENCES partite (id) ON DELETE CASCADE,
+    giocatore TEXT NOT NULL,
+    giocatore_id INTEGER,
+    chiave_giocatore TEXT NOT NULL,
+    minuti INTEGER NOT NULL,
+    partite INTEGER NOT NULL,
+    titolari INTEGER NOT NULL,
+    subentri INTEGER NOT NULL,
+    sostituzioni INTEGER NOT NULL,
+    gol INTEGER NOT NULL,
+    ammonizioni INTEGER NOT NULL,
+    espulsioni INTEGER NOT NULL,
+    reti INTEGER NOT NULL,
+    minuti_gol TEXT,
+    minuto_espulsione INTEGER,
+    stato TEXT
+);
+CREATE INDEX IF NOT EXISTS presenze_partita_partita ON presenze_partita (partita_id);
+CREATE INDEX IF NOT EXISTS presenze_partita_giocatore ON presenze_partita (giocatore_id);
+CREATE INDEX IF NOT EXISTS presenze_partita_chiave ON presenze_partita (chiave_giocatore);
+
+CREATE TABLE IF NOT EXISTS presenze (
+    squadra TEXT NOT NULL,
+    data TEXT NOT NULL,
+    riga INTEGER NOT NULL,
+    giocatore TEXT NOT NULL,
+    giocatore_id INTEGER,
+    codice TEXT NOT NULL,
+    PRIMARY KEY (squadra, data, giocatore)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS presenze_giocatore ON presenze (giocatore_id, data);
+"""
+
+# Statement preparati una volta e riusati (cache degli statement di sqlite3)
+SQL_ELIMINA_CONVOCAZIONE = "DELETE FROM convocazioni WHERE squadra = ? AND chiave = ?"
+SQL_CONVOCAZIONE = (
+    "INSERT INTO convocazioni (squadra, chiave, giornata, avversario, data_ora, documento) VALUES (?, ?, ?, ?, ?, ?)"
+)
+SQL_CONVOCATO = (
+    "INSERT INTO convocati (convocazione_id, posizione, giocatore, giocatore_id, convocato) VALUES (?, ?, ?, ?, ?)"
+)
+SQL_DATA_PARTITE = "UPDATE partite SET data = ? WHERE squadra = ? AND giornata = ?"
+SQL_ELIMINA_PARTITA = "DELETE FROM partite WHERE squadra = ? AND chiave = ?"
+SQL_PARTITA = (
+    "INSERT INTO partite (squadra, chiave, giornata, avversario, home_away, risultato, gol_subiti, data, errore, documento) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, "
+    "(SELECT data_ora FROM convocazioni WHERE squadra = ? AND giornata = ? ORDER BY chiave LIMIT 1), ?, ?)"
+)
+SQL_PRESENZA_PARTITA = (
+    "INSERT INTO presenze_partita (partita_id, giocatore, giocatore_id, chiave_giocatore, minuti, partite, titolari, "
+    "subentri, sostituzioni, gol, ammonizioni, espulsioni, reti, minuti_gol, minuto_espulsione, stato) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_ELIMINA_MESE = "DELETE FROM presenze WHERE squadra = ? AND data BETWEEN ? AND ?"
+SQL_PRESENZA = "INSERT INTO presenze (squadra, data, riga, giocatore, giocatore_id, codice) VALUES (?, ?, ?, ?, ?, ?)"
+SQL_ELIMINA_ROSA = "DELETE FROM rosa WHERE squadra = ?"
+SQL_ROSA = "INSERT INTO rosa (squadra, riga, giocatore_id, nome, cognome, anno, ruolo) VALUES (?, ?, ?, ?, ?, ?, ?)"
+SQL_GIOCATORE = "INSERT OR REPLACE INTO giocatori (id, nome, anno) VALUES (?, ?, ?)"
+SQL_FILE = "INSERT OR REPLACE INTO file (path, mtime_ns, size) VALUES (?, ?, ?)"
+SQL_ELIMINA_FILE = "DELETE FROM file WHERE path = ?"
+
+# Ordine di registrazione: le partite prendono la data dalle convocazioni
+ORDINE_TIPI = ["anagrafica", "rosa", "presenze", "convocazione", "partita"]
+
+# Una connessione per thread: Streamlit esegue ogni sessione nel proprio thread
+_locale = threading.local()
+_lock_import = threading.Lock()
+# Database già riallineato ai file in questo processo (vedi riallinea)
+_riallineato = set()
+
+
+def abilitato():
+    """True if the SQLite backend is switched on (MANAGETEAM_BACKEND=sqlite)"""
+    return os.environ.get(ENV_BACKEND) == "sqlite"
+
+
+def _apri(path):
+    conn = sqlite3.connect(path, timeout=30, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    versione = conn.execute("PRAGMA user_version").fetchone()[0]
+    if versione == SCHEMA_VERSION:
+        # Caso comune (ogni rerun di Streamlit apre una connessione nel suo thread): solo letture
+        return conn
+    if versione != 0:
+        conn.close()
+        for suffisso in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffisso):
+                os.remove(path + suffisso)
+        return _apri(path)
+    # WAL: le letture non aspettano le scritture di altri processi (impostazione salvata nel file)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def _connessione():
+    path = os.path.abspath(DB_PATH)
+    aperta = getattr(_locale, "connessione", None)
+    if aperta is None or aperta[0] != path:
+        aperta = _locale.connessione = (path, _apri(path))
+    return aperta[1]
+
+
+def _importato(conn):
+    return conn.execute("SELECT 1 FROM meta WHERE chiave = 'importato'").fetchone() is not None
+
+
+def connessione():
+    """
+    Connection of the current thread, importing the files the first time
+
+    The first call of each process also re-registers the files changed
+    while no process was running (see riallinea).
+
+    Returns:
+        sqlite3.Connection: Rows are sqlite3.Row
+    """
+    conn = _connessione()
+    path = os.path.abspath(DB_PATH)
+    if path not in _riallineato:
+        with _lock_import:
+            if path not in _riallineato:
+                if _importato(conn):
+                    riallinea()
+                else:
+                    importa()
+                _riallineato.add(path)
+    return conn
+
+
+@contextmanager
+def _transazione(conn):
+    # BEGIN IMMEDIATE: i file vengono letti dopo aver preso il lock di scrittura del database,
+    # così un salvataggio successivo viene sempre registrato dopo questa transazione
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def chiudi():
+    """Close the connection of the current thread"""
+    aperta = getattr(_locale, "connessione", None)
+    if aperta is not None:
+        aperta[1].close()
+        _locale.connessione = None
+
+
+def _intero(valore):
+    try:
+        return int(float(valore))
+    except (TypeError, ValueError):
+        return None
+
+
+def _classifica(path):
+    """(tipo, squadra, chiave) of a data file, tipo None if the file is not mirrored"""
+    parti = os.path.normpath(os.path.relpath(os.path.abspath(path))).split(os.sep)
+    nome, estensione = os.path.splitext(parti[-1])
+    if len(parti) == 3 and estensione == ".json":
+        tipo = {dir_convocazioni: "convocazione", dir_partite: "partita", dir_presenze: "presenze"}.get(parti[0])
+        if tipo:
+            return tipo, parti[1], nome
+    if len(parti) == 2 and parti[0] == dir_squadre:
+        if estensione == ".csv":
+            return "rosa", nome, nome
+        if parti[1] == "anagrafica.json":
+            return "anagrafica", None, None
+    return None, None, None
+
+
+def _registra_convocazione(conn, squadra, chiave, dati):
+    from anagrafica import ids
+
+    conn.execute(SQL_ELIMINA_CONVOCAZIONE, (squadra, chiave))
+    if dati is None:
+        return
+    giornata = _intero(dati.get("giornata"))
+    cur = conn.execute(SQL_CONVOCAZIONE, (
+        squadra, chiave, giornata, dati.get("squadra_avversaria"), dati.get("data_ora_incontro"),
+        json.dumps(dati, ensure_ascii=False)
+    ))
+    convocati = [g for g in dati.get("componenti_squadra", []) if g]
+    non_convocati = [n.strip() for n in dati.get("non_convocati", "").split(",") if n.strip()]
+    # Id salvati nella convocazione (vedi anagrafica.aggiungi_id_convocazione); il registro se mancano
+    salvati = dict(zip(dati.get("componenti_squadra", []), dati.get("componenti_squadra_id", [])))
+    salvati.update(zip(non_convocati, dati.get("non_convocati_id", [])))
+    id_giocatori = [
+        salvati[nome] if salvati.get(nome) is not None else id_registro
+        for nome, id_registro in zip(convocati + non_convocati, ids(convocati + non_convocati))
+    ]
+    conn.executemany(SQL_CONVOCATO, [
+        (cur.lastrowid, posizione, nome, id_giocatore, int(posizione < len(convocati)))
+        for posizione, (nome, id_giocatore) in enumerate(zip(convocati + non_convocati, id_giocatori))
+    ])
+    # La data delle partite viene dalla convocazione della stessa giornata
+    conn.execute(SQL_DATA_PARTITE, (dati.get("data_ora_incontro"), squadra, giornata))
+
+
+def _registra_partita(conn, squadra, chiave, dati):
+    from anagrafica import chiavi_partita
+    from calculate_minutes import analyze_match
+    from indice_giocatori import presenze_partita
+    from season_stats import match_contribution
+
+    conn.execute(SQL_ELIMINA_PARTITA, (squadra, chiave))
+    if dati is None:
+        return
+    giornata = _intero(dati.get("giornata"))
+    righe, errore, gol_subiti = [], None, None
+    try:
+        # Giocatori per chiave del registro (id salvati nel file), come season_stats e indice_giocatori
+        contributo = match_contribution(analyze_match(dati), chiavi_partita(dati))
+        schede = presenze_partita(dati, f"{chiave}.json")
+        gol_subiti = contributo["squadra"]["gol_subiti"]
+        for chiave_giocatore, stats in contributo["giocatori"].items():
+            nome = stats["nome"]
+            if not chiave_giocatore or not nome:
+                continue
+            scheda = schede.get(nome, {})
+            id_giocatore = int(chiave_giocatore) if chiave_giocatore.isdigit() else None
+            righe.append((
+                nome, id_giocatore, chiave_giocatore, stats["minuti"], stats["partite"], stats["titolari"],
+                stats["subentri"], stats["sostituzioni"], stats["gol"], stats["ammonizioni"], stats["espulsioni"],
+                scheda.get("gol", 0), json.dumps(scheda.get("minuti_gol", [])), scheda.get("minuto_espulsione"),
+                json.dumps(scheda.get("stato", []), ensure_ascii=False)
+            ))
+    except Exception as e:
+        errore = str(e)
+
+    cur = conn.execute(SQL_PARTITA, (
+        squadra, chiave, giornata, dati.get("squadra"), dati.get("home_away"), dati.get("risultato"), gol_subiti,
+        squadra, giornata, errore, json.dumps(dati, ensure_ascii=False)
+    ))
+    conn.executemany(SQL_PRESENZA_PARTITA, [(cur.lastrowid,) + riga for riga in righe])
+
+
+def _registra_presenze(conn, squadra, chiave_mese, encoded):
+    from anagrafica import ids
+    from presenze_matrice import decodifica_mese
+
+    conn.execute(SQL_ELIMINA_MESE, (squadra, f"{chiave_mese}-01", f"{chiave_mese}-31"))
+    if encoded is None:
+        return
+    giocatori_mese, giorni, matrice, id_salvati = encoded
+    dati_mese = decodifica_mese(giocatori_mese, giorni, matrice)
+    giocatori = list(dict.fromkeys(g for giorno in dati_mese.values() for g in giorno))
+    # Id salvati nel mese (vedi presenze_store.save_matrice_mese); il registro per i mesi senza id
+    if id_salvati and len(id_salvati) == len(giocatori_mese):
+        id_giocatori = dict(zip(giocatori_mese, id_salvati))
+    else:
+        id_giocatori = dict(zip(giocatori, ids(giocatori)))
+    riga = {nome: i for i, nome in enumerate(giocatori)}
+    conn.executemany(SQL_PRESENZA, [
+        (squadra, f"{chiave_mese}-{giorno[:2]}", riga[nome], nome, id_giocatori.get(nome), codice or "")
+        for giorno, codici in dati_mese.items()
+        for nome, codice in codici.items()
+    ])
+
+
+def _registra_rosa(conn, squadra, righe):
+    conn.execute(SQL_ELIMINA_ROSA, (squadra,))
+    conn.executemany(SQL_ROSA, [
+        (squadra, i, _intero(r.get("ID")), r.get("NOME"), r.get("COGNOME"), _intero(r.get("ANNO")), r.get("RUOLO"))
+        for i, r in enumerate(righe or [])
+    ])
+
+
+def _registra_anagrafica(conn):
+    from anagrafica import carica
+
+    conn.executemany(SQL_GIOCATORE, [
+        (int(id_str), giocatore["nome"], giocatore.get("anno"))
+        for id_str, giocatore in carica()["giocatori"].items()
+    ])
+
+
+def _leggi_rosa(path):
+    try:
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f, delimiter=";"))
+    except FileNotFoundError:
+        return None
+
+
+def _leggi_documento(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _leggi_mese(path):
+    from presenze_matrice import from_json
+
+    dati = _leggi_documento(path)
+    return (*from_json(dati), dati.get("id_giocatori")) if dati is not None else None
+
+
+def _relativo(path):
+    return os.path.normpath(os.path.relpath(os.path.abspath(path)))
+
+
+def _firma(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _segna(conn, path, firma):
+    # Firma del file letto: riallinea registra di nuovo solo i file cambiati dopo
+    if firma is None:
+        conn.execute(SQL_ELIMINA_FILE, (_relativo(path),))
+    else:
+        conn.execute(SQL_FILE, (_relativo(path),) + firma)
+
+
+def _registra(conn, tipo, squadra, chiave, path):
+    # Firma presa prima della lettura: una modifica successiva risulta sempre cambiata
+    firma = _firma(path)
+    if tipo == "convocazione":
+        _registra_convocazione(conn, squadra, chiave, _leggi_documento(path))
+    elif tipo == "partita":
+        _registra_partita(conn, squadra, chiave, _leggi_documento(path))
+    elif tipo == "presenze":
+        _registra_presenze(conn, squadra, chiave, _leggi_mese(path))
+    elif tipo == "rosa":
+        _registra_rosa(conn, squadra, _leggi_rosa(path))
+    elif tipo == "anagrafica":
+        _registra_anagrafica(conn)
+    _segna(conn, path, firma)
+
+
+def registra(path):
+    """
+    Copy a saved (or deleted) data file into the database
+
+    Called after every atomic write and by the file watcher. The file is
+    read back inside the write transaction, so the database always ends up
+    with the content of the last save.
+
+    Args:
+        path (str): Path of a roster, attendance, convocation or match file
+
+    Returns:
+        bool: False if the path is not a data file of the backend
+    """
+    tipo, squadra, chiave = _classifica(path)
+    if tipo is None:
+        return False
+    with _transazione(connessione()) as conn:
+        _registra(conn, tipo, squadra, chiave, path)
+    return True
+
+
+def importa(squadre=None):
+    """
+    Import rosters, attendance, convocations and matches, one transaction per squad
+
+    Files already imported are replaced, so the import can be run again at
+    any time to rebuild the database.
+
+    Args:
+        squadre (list): Squad codes, default all
+
+    Returns:
+        dict: Number of rows per kind of file
+    """
+    from presenze_store import elenco_mesi, get_presenze_mese_path, load_matrice_mese
+
+    conn = _connessione()
+    conteggi = {"rose": 0, "mesi_presenze": 0, "convocazioni": 0, "partite": 0}
+    with _transazione(conn):
+        from anagrafica import ANAGRAFICA_PATH
+
+        _registra(conn, "anagrafica", None, None, ANAGRAFICA_PATH)
+    for squadra in squadre or nomi_squadre:
+        with _transazione(conn):
+            path_rosa = os.path.join(dir_squadre, f"{squadra}.csv")
+            if os.path.exists(path_rosa):
+                _registra(conn, "rosa", squadra, squadra, path_rosa)
+                conteggi["rose"] += 1
+            # Anche i mesi ancora nel vecchio file unico (vedi presenze_store.migra_presenze)
+            for chiave_mese in elenco_mesi(squadra):
+                path_mese = get_presenze_mese_path(squadra, chiave_mese)
+                firma = _firma(path_mese)
+                _registra_presenze(conn, squadra, chiave_mese, load_matrice_mese(squadra, chiave_mese, con_id=True))
+                if firma is not None:
+                    _segna(conn, path_mese, firma)
+                conteggi["mesi_presenze"] += 1
+            # Prima le convocazioni: le partite ne prendono la data
+            for directory, tipo, chiave_conteggio in (
+                (dir_convocazioni, "convocazione", "convocazioni"), (dir_partite, "partita", "partite")
+            ):
+                dir_squadra = os.path.join(directory, squadra)
+                if not os.path.isdir(dir_squadra):
+                    continue
+                for nome in sorted(os.listdir(dir_squadra)):
+                    if nome.endswith(".json"):
+                        _registra(conn, tipo, squadra, nome[:-5], os.path.join(dir_squadra, nome))
+                        conteggi[chiave_conteggio] += 1
+    with _transazione(conn):
+        conn.execute("INSERT OR REPLACE INTO meta (chiave, valore) VALUES ('importato', datetime('now'))")
+    return conteggi
+
+
+def _file_dati(squadre):
+    """Data files the database mirrors, for the given squads plus the player registry"""
+    from anagrafica import ANAGRAFICA_PATH
+
+    paths = [ANAGRAFICA_PATH] if os.path.exists(ANAGRAFICA_PATH) else []
+    for squadra in squadre:
+        path_rosa = os.path.join(dir_squadre, f"{squadra}.csv")
+        if os.path.exists(path_rosa):
+            paths.append(path_rosa)
+        for directory in (dir_presenze, dir_convocazioni, dir_partite):
+            dir_squadra = os.path.join(directory, squadra)
+            if os.path.isdir(dir_squadra):
+                paths.extend(
+                    os.path.join(dir_squadra, nome) for nome in sorted(os.listdir(dir_squadra)) if nome.endswith(".json")
+                )
+    return paths
+
+
+def riallinea(squadre=None):
+    """
+    Re-register the files changed, added or deleted since they were last
+    copied into the database (e.g. synced from another laptop while the app
+    was stopped), comparing mtime and size
+
+    Args:
+        squadre (list): Squad codes, default all
+
+    Returns:
+        int: Number of files registered again
+    """
+    squadre = squadre or nomi_squadre
+    conn = _connessione()
+    registrate = {r["path"]: (r["mtime_ns"], r["size"]) for r in conn.execute("SELECT path, mtime_ns, size FROM file")}
+    cambiati = {}
+    for path in _file_dati(squadre):
+        relativo = _relativo(path)
+        if registrate.pop(relativo, None) != _firma(path):
+            cambiati[relativo] = path
+    # File registrati che non esistono più (solo delle squadre richieste)
+    for relativo in registrate:
+        tipo, squadra, _ = _classifica(relativo)
+        if tipo is not None and (squadra is None or squadra in squadre):
+            cambiati[relativo] = relativo
+
+    da_registrare = [(_classifica(path), path) for path in cambiati.values()]
+    da_registrare = [(voce, path) for voce, path in da_registrare if voce[0] is not None]
+    da_registrare.sort(key=lambda item: ORDINE_TIPI.index(item[0][0]))
+    if da_registrare:
+        with _transazione(conn):
+            for (tipo, squadra, chiave), path in da_registrare:
+                _registra(conn, tipo, squadra, chiave, path)
+    return len(da_registrare)
+
+
+def elenco_convocazioni(squadra):
+    """File names of a squad's convocations, by giornata"""
+    righe = connessione().execute(
+        "SELECT chiave FROM convocazioni WHERE squadra = ? ORDER BY giornata, chiave", (squadra,)
+    )
+    return [f"{r['chiave']}.json" for r in righe]
+
+
+def _documento(tabella, squadra, nome_file):
+    chiave = nome_file[:-5] if nome_file.endswith(".json") else nome_file
+    riga = connessione().execute(
+        f"SELECT documento FROM {tabella} WHERE squadra = ? AND chiave = ?", (squadra, chiave)
+    ).fetchone()
+    return json.loads(riga["documento"]) if riga else None
+
+
+def carica_convocazione(squadra, nome_file):
+    """Convocation document as saved in convocazioni/<squadra>/<nome_file>, None if missing"""
+    return _documento("convocazioni", squadra, nome_file)
+
+
+def carica_partita(squadra, nome_file):
+    """Match document as saved in partita/<squadra>/<nome_file>, None if missing"""
+    return _documento("partite", squadra, nome_file)
+
+
+def load_presenze_mese(squadra, chiave_mese):
+    """
+    Attendance of a single month, same format as presenze_store.load_presenze_mese
+
+    Returns:
+        dict: {"dd/mm": {player: code}} or None if the month was never saved
+    """
+    righe = connessione().execute(
+        "SELECT data, giocatore, codice FROM presenze WHERE squadra = ? AND data BETWEEN ? AND ? ORDER BY data, riga",
+        (squadra, f"{chiave_mese}-01", f"{chiave_mese}-31")
+    ).fetchall()
+    if not righe:
+        return None
+    dati_mese = {}
+    for r in righe:
+        dati_mese.setdefault(f"{r['data'][8:10]}/{r['data'][5:7]}", {})[r["giocatore"]] = r["codice"]
+    return dati_mese
+
+
+def load_squad(squadra):
+    """Roster as a DataFrame, same columns as core.load_squad"""
+    import pandas as pd
+
+    righe = connessione().execute(
+        "SELECT nome, cognome, anno, ruolo, giocatore_id FROM rosa WHERE squadra = ? ORDER BY riga", (squadra,)
+    ).fetchall()
+    colonne = ["NOME", "COGNOME", "ANNO", "RUOLO"]
+    if not righe:
+        return pd.DataFrame(columns=colonne)
+    df = pd.DataFrame([tuple(r) for r in righe], columns=colonne + ["ID"])
+    return df if df["ID"].notna().any() else df[colonne]
+
+
+def elenco_giocatori(squadra):
+    """
+    Players appearing in a squad's matches, same format as indice_giocatori.elenco_giocatori
+
+    Returns:
+        dict: Player key -> display name (registry name, else the spelling of
+            the latest match), sorted by name
+    """
+    from anagrafica import nome_chiave
+
+    righe = connessione().execute(
+        "SELECT pp.chiave_giocatore, pp.giocatore, MAX(p.giornata) FROM presenze_partita pp "
+        "JOIN partite p ON p.id = pp.partita_id WHERE p.squadra = ? GROUP BY pp.chiave_giocatore",
+        (squadra,)
+    )
+    giocatori = {r["chiave_giocatore"]: nome_chiave(r["chiave_giocatore"], r["giocatore"]) for r in righe}
+    return dict(sorted(giocatori.items(), key=lambda item: item[1].casefold()))
+
+
+def presenze_giocatore(squadra, chiave):
+    """
+    All appearances of one player in a squad, same records as indice_giocatori.presenze_giocatore
+
+    Args:
+        squadra (str): Squad code
+        chiave (str): Player key from elenco_giocatori
+
+    Returns:
+        list: Appearance records sorted by giornata
+    """
+    righe = connessione().execute(
+        "SELECT p.chiave, p.giornata, p.avversario, p.home_away, p.risultato, pp.titolari, pp.minuti, pp.stato, "
+        "pp.reti, pp.minuti_gol, pp.ammonizioni, pp.minuto_espulsione FROM presenze_partita pp "
+        "JOIN partite p ON p.id = pp.partita_id WHERE p.squadra = ? AND pp.chiave_giocatore = ? "
+        "ORDER BY p.giornata IS NULL, p.giornata, p.chiave",
+        (squadra, chiave)
+    )
+    return [
+        {
+            "partita": f"{r['chiave']}.json",
+            "giornata": r["giornata"],
+            "avversario": r["avversario"],
+            "home_away": r["home_away"],
+            "risultato": r["risultato"],
+            "titolare": bool(r["titolari"]),
+            "minuti": max(r["minuti"], 0),
+            "stato": json.loads(r["stato"]),
+            "gol": r["reti"],
+            "minuti_gol": json.loads(r["minuti_gol"]),
+            "ammonizioni": r["ammonizioni"],
+            "minuto_espulsione": r["minuto_espulsione"],
+        }
+        for r in righe
+    ]
+
+
+def partite_giocatore(id_giocatore):
+    """
+    Every match of a player across squads and seasons, by date
+
+    Args:
+        id_giocatore (int): Player id (see anagrafica)
+
+    Returns:
+        list: Dictionaries with squadra, partita, giornata, avversario, data,
+            minuti, gol (goals scored) and stato
+    """
+    righe = connessione().execute(
+        "SELECT p.squadra, p.chiave, p.giornata, p.avversario, p.data, pp.minuti, pp.reti, pp.stato "
+        "FROM presenze_partita pp JOIN partite p ON p.id = pp.partita_id WHERE pp.giocatore_id = ? "
+        "ORDER BY p.data IS NULL, p.data, p.squadra, p.giornata",
+        (id_giocatore,)
+    )
+    return [
+        {
+            "squadra": r["squadra"], "partita": f"{r['chiave']}.json", "giornata": r["giornata"],
+            "avversario": r["avversario"], "data": r["data"], "minuti": max(r["minuti"], 0), "gol": r["reti"],
+            "stato": json.loads(r["stato"]),
+        }
+        for r in righe
+    ]
+
+
+def read_aggregate(squadra):
+    """
+    Season aggregate computed with indexed queries
+
+    Returns:
+        dict: Same shape as season_stats.update_aggregate
+    """
+    from season_stats import PLAYER_KEYS, TEAM_KEYS
+
+    conn = connessione()
+    aggregate = {"file": {}, "giocatori": {}, "squadra": {key: 0 for key in TEAM_KEYS}, "errori": {}}
+    for r in conn.execute("SELECT chiave, errore, gol_subiti FROM partite WHERE squadra = ?", (squadra,)):
+        nome = f"{r['chiave']}.json"
+        if r["errore"]:
+            aggregate["file"][nome] = {"errore": r["errore"]}
+            aggregate["errori"][nome] = r["errore"]
+        else:
+            aggregate["file"][nome] = {}
+            aggregate["squadra"]["partite"] += 1
+            aggregate["squadra"]["gol_subiti"] += r["gol_subiti"] or 0
+
+    # Raggruppati per chiave del registro: un giocatore rinominato resta una riga sola
+    somme = ", ".join(f"SUM(pp.{key})" for key in PLAYER_KEYS)
+    righe = conn.execute(
+        f"SELECT pp.chiave_giocatore, MAX(pp.giocatore), {somme}, COUNT(*) FROM presenze_partita pp "
+        "JOIN partite p ON p.id = pp.partita_id WHERE p.squadra = ? GROUP BY pp.chiave_giocatore",
+        (squadra,)
+    )
+    for r in righe:
+        stats = dict(zip(PLAYER_KEYS, tuple(r)[2:-1]))
+        stats["file"] = r[-1]
+        stats["nome"] = r[1]
+        aggregate["giocatori"][r[0]] = stats
+        for key in ("gol", "ammonizioni", "espulsioni"):
+            aggregate["squadra"][key] += stats[key]
+    return aggregate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa rose, presenze, convocazioni e partite nel database SQLite")
+    parser.add_argument("squadre", nargs="*", help="Squadre da importare (default: tutte)")
+    parser.add_argument("--ricrea", action="store_true", help="Cancella il database prima di importare")
+    args = parser.parse_args()
+
+    if args.ricrea:
+        for suffisso in ("", "-wal", "-shm"):
+            if os.path.exists(DB_PATH + suffisso):
+                os.remove(DB_PATH + suffisso)
+    conteggi = importa(args.squadre or None)
+    print(
+        f"Importate in {DB_PATH}: {conteggi['rose']} rose, {conteggi['mesi_presenze']} mesi di presenze, "
+        f"{conteggi['convocazioni']} convocazioni, {conteggi['partite']} partite"
+    )
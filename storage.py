@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from file_cache import invalidate
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo il lock tra thread dello stesso processo
+    fcntl = None
+
+# File di lock per squadra, condivisi tra processi (più istanze di Streamlit, CLI, watcher)
+dir_lock = os.path.join(".cache", "lock")
+
+# Lock dei file che non appartengono a una squadra
+LOCK_COMUNE = "comune"
+
+# versione_attesa=NUOVO: il salvataggio crea il file e fallisce se nel frattempo qualcuno l'ha creato
+NUOVO = ""
+
+# Permessi dei file nuovi: mkstemp crea il temporaneo con 0600, va riportato a quelli di open()
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_lock_thread = {}
+_lock_registro = threading.Lock()
+# Lock già tenuti dal thread corrente: lock_squadra è rientrante
+_tenuti = threading.local()
+
+
+class ConflittoVersione(Exception):
+    """The file changed on disk since it was loaded: the save was rejected"""
+
+    def __init__(self, path, attesa, trovata):
+        super().__init__(f"{path} è stato modificato da un altro utente dopo il caricamento")
+        self.path = path
+        self.attesa = attesa
+        self.trovata = trovata
+
+
+def versione(path):
+    """
+    Version token of a file, None if it does not exist
+
+    Every write replaces the file with a new inode, so the token changes on
+    every save even within the same mtime tick.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _token(stat)
+
+
+def _token(stat):
+    return f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def leggi_json(path):
+    """
+    Parsed JSON and the version it was read at, without taking any lock
+
+    Writers replace files atomically, so a reader always sees a complete
+    file: the old one or the new one.
+
+    Returns:
+        tuple: (dati, versione); (None, None) if the file does not exist
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            token = _token(os.fstat(f.fileno()))
+            return json.load(f), token
+    except FileNotFoundError:
+        return None, None
+
+
+@contextmanager
+def lock_squadra(squadra):
+    """
+    Exclusive lock on a squad's files, across threads and processes
+
+    Only writers take it; readers never block. Re-entrant: hold it around a
+    read-modify-write and call the write functions inside.
+
+    Args:
+        squadra (str): Squad code, or any name for shared files (e.g. "anagrafica")
+    """
+    tenuti = _tenuti.__dict__.setdefault("nomi", set())
+    if squadra in tenuti:
+        yield
+        return
+
+    with _lock_registro:
+        lock = _lock_thread.setdefault(squadra, threading.Lock())
+    with lock:
+        tenuti.add(squadra)
+        try:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(dir_lock, exist_ok=True)
+            with open(os.path.join(dir_lock, f"{squadra}.lock"), "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            tenuti.discard(squadra)
+
+
+def _controlla(path, versione_attesa):
+    if versione_attesa is None:
+        return
+    trovata = versione(path)
+    if trovata != (versione_attesa or None):
+        raise ConflittoVersione(path, versione_attesa, trovata)
+
+
+def _permessi(path):
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def scrittura_atomica(path, scrivi, squadra=None, versione_attesa=None, binario=False):
+    """
+    Write a file through a temp file in the same directory and a rename
+
+    The new file keeps the permissions of the one it replaces; a new file
+    gets the usual 0666 minus umask.
+
+    Args:
+        path (str): Destination
+        scrivi (callable): Called with the open temp file, writes the content
+        squadra (str): Lock held while checking and replacing (see
+            lock_squadra); files of no squad share LOCK_COMUNE
+        versione_attesa (str): Version the caller loaded (see versione/leggi_json);
+            None skips the check, NUOVO requires the file not to exist
+        binario (bool): Open the temp file in binary mode
+
+    Returns:
+        str: Version of the written file
+
+    Raises:
+        ConflittoVersione: The file changed since versione_attesa was read
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        # Il contenuto viene preparato fuori dal lock: il lock copre solo controllo e rename
+        with os.fdopen(fd, "wb" if binario else "w", **({} if binario else {"encoding": "utf-8", "newline": ""})) as f:
+            scrivi(f)
+            f.flush()
+            os.fsync(f.fileno())
+        with lock_squadra(squadra or LOCK_COMUNE):
+            _controlla(path, versione_attesa)
+            # Il file sostituito mantiene i permessi (cartelle condivise o sincronizzate)
+            os.chmod(tmp_path, _permessi(path))
+            os.replace(tmp_path, path)
+            nuova = versione(path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    invalidate(path)
+    # Backend SQLite opzionale: copia indicizzata del file appena salvato
+    if os.environ.get("MANAGETEAM_BACKEND") == "sqlite":
+        import sqlite_store
+
+        sqlite_store.registra(path)
+    return nuova
+
+
+def scrivi_json(path, dati, squadra=None, versione_attesa=None, **kwargs):
+    """
+    Atomic JSON write, see scrittura_atomica
+
+    Extra keyword arguments go to json.dump (default: ensure_ascii=False).
+
+    Returns:
+        str: Version of the written file
+    """
+    kwargs.setdefault("ensure_ascii", False)
+    return scrittura_atomica(path, lambda f: json.dump(dati, f, **kwargs), squadra, versione_attesa)
+
+
+def scrivi_csv(path, df, squadra=None, versione_attesa=None):
+    """Atomic write of a DataFrame as a ';'-separated roster CSV, see scrittura_atomica"""
+    return scrittura_atomica(path, lambda f: df.to_csv(f, sep=";", index=False), squadra, versione_attesa)
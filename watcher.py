@@ -0,0 +1,322 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # dipendenza opzionale: senza watchdog le cartelle vengono controllate a intervalli
+    Observer = None
+    FileSystemEventHandler = object
+
+from core import dir_squadre, nomi_squadre
+
+# Cartelle dei dati osservate; i file copiati a mano (o sincronizzati da un altro portatile)
+# vengono rielaborati in background, così la prima apertura di Reportistica è già veloce
+dir_partite = "partita"
+dir_convocazioni = "convocazioni"
+dir_presenze = "presenze"
+CARTELLE = (dir_partite, dir_convocazioni, dir_presenze, dir_squadre)
+
+# Secondi senza nuove modifiche a una squadra prima di ricalcolare: una copia di molti file
+# produce un solo ricalcolo
+RITARDO = float(os.environ.get("MANAGETEAM_WATCH_RITARDO", "2"))
+
+# Intervallo tra due scansioni quando watchdog non è installato
+INTERVALLO_POLLING = float(os.environ.get("MANAGETEAM_WATCH_INTERVALLO", "5"))
+
+# Voce in attesa che riallinea tutte le squadre (primo passaggio all'avvio)
+TUTTE = "*"
+
+# Watcher di questo processo (vedi avvia)
+_watcher = None
+_lock_avvio = threading.Lock()
+
+
+def classifica(path, radice="."):
+    """
+    Data folder and squad of a changed file
+
+    Temporary files of atomic writes, live match logs and files outside
+    the data folders are ignored.
+
+    Args:
+        path (str): Changed file
+        radice (str): Directory holding the data folders
+
+    Returns:
+        tuple: (cartella, squadra) or None; squadra is None for the player
+            registry (squadre/anagrafica.json)
+    """
+    parti = os.path.relpath(os.path.abspath(path), os.path.abspath(radice)).split(os.sep)
+    nome = parti[-1]
+    if nome.startswith(".") or parti[0] not in CARTELLE:
+        return None
+    if parti[0] == dir_squadre and len(parti) == 2:
+        if nome == "anagrafica.json":
+            return dir_squadre, None
+        return (dir_squadre, nome[:-4]) if nome.endswith(".csv") else None
+    if not nome.endswith(".json"):
+        return None
+    if len(parti) == 3:
+        return parti[0], parti[1]
+    if parti[0] == dir_presenze and len(parti) == 2:
+        # Archivio presenze nel vecchio formato, un file per squadra
+        return dir_presenze, nome[:-5]
+    return None
+
+
+def ricalcola(squadra, cartelle, percorsi):
+    """
+    Recompute the derived data of one squad after its files changed
+
+    Season aggregate and player index are persisted under .cache, where
+    every process (Streamlit sessions, CLI) picks them up; the formation and
+    attendance analyses are kept warm in this process.
+
+    Args:
+        squadra (str): Squad code, None for registry changes
+        cartelle (set): Data folders that changed
+        percorsi (set): Changed files
+    """
+    if os.environ.get("MANAGETEAM_BACKEND") == "sqlite":
+        import sqlite_store
+
+        for path in sorted(percorsi):
+            sqlite_store.registra(path)
+
+    if squadra is None:
+        return
+    if dir_partite in cartelle:
+        import analisi_formazioni
+        import indice_giocatori
+        import season_stats
+
+        season_stats.update_aggregate(squadra)
+        indice_giocatori.sincronizza(squadra)
+        analisi_formazioni.analizza_squadra(squadra)
+    if dir_presenze in cartelle:
+        import analisi_presenze
+
+        analisi_presenze.carica_archivio(squadra)
+
+
+def riscalda(squadra):
+    """
+    Bring the persisted aggregates of a squad up to date (first pass after
+    start), including the SQLite copy when that backend is on
+    """
+    import indice_giocatori
+    import season_stats
+
+    if os.environ.get("MANAGETEAM_BACKEND") == "sqlite":
+        import sqlite_store
+
+        # File cambiati mentre l'app era ferma (es. sincronizzati da un altro portatile)
+        sqlite_store.riallinea([squadra])
+    season_stats.update_aggregate(squadra)
+    indice_giocatori.sincronizza(squadra)
+
+
+class _Eventi(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        self.watcher.segnala(event.src_path)
+        # Rename del salvataggio atomico: conta il file di destinazione
+        destinazione = getattr(event, "dest_path", None)
+        if destinazione:
+            self.watcher.segnala(destinazione)
+
+
+class Watcher:
+    """
+    Background watcher over the data folders
+
+    Changes are grouped per squad and handled once the squad has been quiet
+    for `ritardo` seconds, one squad at a time in a single worker thread.
+    Uses watchdog (inotify on Linux) when installed, otherwise scans the
+    folders every `intervallo` seconds. The app's modules use paths relative
+    to the working directory, so radice must be the working directory.
+
+    Args:
+        radice (str): Directory holding the data folders
+        squadre (list): Squads to follow, default all
+        ritardo (float): Debounce delay in seconds
+        intervallo (float): Polling interval in seconds
+        polling (bool): Scan even if watchdog is installed
+        azione (callable): Called as azione(squadra, cartelle, percorsi), default ricalcola
+        avviso (callable): Called with a message after every recompute or error
+    """
+
+    def __init__(self, radice=".", squadre=None, ritardo=RITARDO, intervallo=INTERVALLO_POLLING,
+                 polling=False, azione=ricalcola, avviso=None):
+        self.radice = os.path.abspath(radice)
+        self.squadre = set(squadre or nomi_squadre)
+        self.ritardo = ritardo
+        self.intervallo = intervallo
+        self.modalita = "polling" if polling or Observer is None else "watchdog"
+        self.azione = azione
+        self.avviso = avviso
+        # squadra -> [istante dell'ultima modifica, cartelle, percorsi]
+        self._in_attesa = {}
+        self._condizione = threading.Condition()
+        self._fermo = threading.Event()
+        self._thread = []
+        self._observer = None
+        self.ricalcoli = 0
+        self.ultimo = None
+        self.errori = []
+
+    def segnala(self, path):
+        """Record a changed file; the recompute happens after the debounce delay"""
+        trovato = classifica(path, self.radice)
+        if trovato is None:
+            return
+        cartella, squadra = trovato
+        if squadra is not None and squadra not in self.squadre:
+            return
+        with self._condizione:
+            voce = self._in_attesa.setdefault(squadra, [0.0, set(), set()])
+            voce[0] = time.monotonic()
+            voce[1].add(cartella)
+            voce[2].add(os.path.abspath(path))
+            self._condizione.notify()
+
+    def _prossima(self):
+        # Squadra più vecchia rimasta ferma almeno self.ritardo secondi, o il tempo da aspettare
+        adesso = time.monotonic()
+        pronte = [(t, s) for s, (t, _, _) in self._in_attesa.items() if adesso - t >= self.ritardo]
+        if pronte:
+            _, squadra = min(pronte, key=lambda v: v[0])
+            _, cartelle, percorsi = self._in_attesa.pop(squadra)
+            return (squadra, cartelle, percorsi), None
+        if self._in_attesa:
+            return None, min(self.ritardo - (adesso - t) for t, _, _ in self._in_attesa.values())
+        return None, None
+
+    def _lavora(self):
+        while not self._fermo.is_set():
+            with self._condizione:
+                lavoro, attesa = self._prossima()
+                if lavoro is None:
+                    self._condizione.wait(attesa)
+                    continue
+            squadra, cartelle, percorsi = lavoro
+            inizio = time.perf_counter()
+            try:
+                if squadra == TUTTE:
+                    for s in sorted(self.squadre):
+                        riscalda(s)
+                    messaggio = f"aggiornate {len(self.squadre)} squadre"
+                else:
+                    self.azione(squadra, cartelle, percorsi)
+                    messaggio = f"{squadra or 'anagrafica'}: {', '.join(sorted(cartelle))} ({len(percorsi)} file)"
+                self.ricalcoli += 1
+                self.ultimo = datetime.now().isoformat(timespec="seconds")
+                self._avvisa(f"{messaggio} in {time.perf_counter() - inizio:.2f}s")
+            except Exception as e:
+                self.errori = (self.errori + [f"{squadra}: {e}"])[-20:]
+                self._avvisa(f"Errore {squadra}: {e}")
+
+    def _avvisa(self, messaggio):
+        if self.avviso:
+            self.avviso(messaggio)
+
+    def _scansione(self):
+        stato = {}
+        for cartella in CARTELLE:
+            base = os.path.join(self.radice, cartella)
+            for directory, sottocartelle, file in os.walk(base):
+                # I registri live vengono scritti evento per evento: conta solo la partita chiusa
+                sottocartelle[:] = [d for d in sottocartelle if d != "live" and not d.startswith(".")]
+                for nome in file:
+                    path = os.path.join(directory, nome)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    stato[path] = (st.st_mtime_ns, st.st_size)
+        return stato
+
+    def _polling(self):
+        precedente = self._scansione()
+        while not self._fermo.wait(self.intervallo):
+            corrente = self._scansione()
+            for path in corrente.keys() | precedente.keys():
+                if corrente.get(path) != precedente.get(path):
+                    self.segnala(path)
+            precedente = corrente
+
+    def avvia(self, riscalda_subito=True):
+        """
+        Start watching in daemon threads
+
+        Args:
+            riscalda_subito (bool): First bring every squad's aggregates up to
+                date, for files changed while nothing was watching
+        """
+        if riscalda_subito:
+            with self._condizione:
+                self._in_attesa[TUTTE] = [0.0, set(), set()]
+        if self.modalita == "watchdog":
+            self._observer = Observer()
+            gestore = _Eventi(self)
+            for cartella in CARTELLE:
+                base = os.path.join(self.radice, cartella)
+                os.makedirs(base, exist_ok=True)
+                self._observer.schedule(gestore, base, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        else:
+            self._thread.append(threading.Thread(target=self._polling, name="watcher-polling", daemon=True))
+        self._thread.append(threading.Thread(target=self._lavora, name="watcher", daemon=True))
+        for thread in self._thread:
+            thread.start()
+        return self
+
+    def ferma(self):
+        self._fermo.set()
+        with self._condizione:
+            self._condizione.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._thread:
+            thread.join()
+
+    def stato(self):
+        """Mode, pending squads, recomputes done, last recompute time and recent errors"""
+        with self._condizione:
+            in_attesa = sorted(str(s) for s in self._in_attesa)
+        return {
+            "modalita": self.modalita,
+            "in_attesa": in_attesa,
+            "ricalcoli": self.ricalcoli,
+            "ultimo": self.ultimo,
+            "errori": list(self.errori),
+        }
+
+
+def avvia(radice=".", avviso=None):
+    """
+    Start the watcher of this process once (Streamlit reruns the script, the
+    module stays imported); later calls return the running watcher
+
+    Returns:
+        Watcher: The running watcher
+    """
+    global _watcher
+    with _lock_avvio:
+        if _watcher is None:
+            _watcher = Watcher(radice, avviso=avviso).avvia()
+    return _watcher
+
+
+def attivo():
+    """The watcher started by avvia in this process, or None"""
+    return _watcher